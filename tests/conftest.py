@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -36,4 +38,22 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
+    'tests.fixtures.fixture_query_budget',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_caches():
+    from core.test_runner import isolated_caches
+
+    with isolated_caches():
+        yield
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup):
+    from posts import view_counter
+
+    view_counter.reset()
+    yield
+    view_counter.reset()
@@ -0,0 +1,121 @@
+"""Проверка бюджетов запросов представлений (core.query_budget).
+
+Фикстура query_budget_data создает набор данных размером с живой сайт,
+assert_query_budget открывает страницу при холодном кэше и падает, если
+представление сделало больше запросов, чем разрешено его бюджетом.
+Бюджет — состав запросов по замыслу, а не замер: данные здесь не
+обязаны задействовать каждое слагаемое (у поста может не быть группы). В
+сообщении — запросы, сгруппированные по месту вызова. В конце прогона
+печатается сводка по всем проверенным представлениям.
+"""
+import random
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import resolve
+
+from core.query_budget import QueryLog, budget_for
+
+USERS = 50
+GROUPS = 10
+POSTS = 1000
+COMMENTS = 2000
+FOLLOWS_PER_USER = 10
+THREAD_REPLIES = 30
+
+_results = {}
+
+
+@pytest.fixture
+def query_budget_data(django_user_model):
+    from posts import tags, threads
+    from posts.models import Comment, Follow, Group, Post, Tag
+
+    rnd = random.Random(0)
+    django_user_model.objects.bulk_create(
+        django_user_model(username=f'user{i}', first_name=f'Имя{i}')
+        for i in range(USERS)
+    )
+    users = list(django_user_model.objects.order_by('id'))
+    Group.objects.bulk_create(
+        Group(title=f'Группа {i}', slug=f'group-{i}', description='-')
+        for i in range(GROUPS)
+    )
+    groups = list(Group.objects.order_by('id')) + [None]
+    Post.objects.bulk_create(
+        Post(text=f'Пост {i} #тег{i % GROUPS}', author=rnd.choice(users),
+             group=rnd.choice(groups))
+        for i in range(POSTS)
+    )
+    posts = list(Post.objects.order_by('id'))
+    tags.index(posts, fresh=True)
+    Comment.objects.bulk_create(
+        Comment(text=f'Комментарий {i}', author=rnd.choice(users),
+                post=rnd.choice(posts))
+        for i in range(COMMENTS)
+    )
+    threads.rebuild(Comment.objects.all())
+    Follow.objects.bulk_create(
+        Follow(user=user, author=author)
+        for user in users
+        for author in rnd.sample(users, FOLLOWS_PER_USER)
+        if author != user
+    )
+    post = Post.objects.filter(author=users[0]).first()
+    comment = Comment.objects.create(text='Обсуждение', author=users[1],
+                                     post=post)
+    for i in range(THREAD_REPLIES):
+        Comment.objects.create(text=f'Ответ {i}', author=rnd.choice(users),
+                               post=post, parent=rnd.choice(
+                                   [comment, *comment.replies.all()]))
+    followed = set(Follow.objects.filter(user=users[0]).values_list(
+        'author_id', flat=True))
+    return {
+        'user': users[0],
+        'author': next(user for user in users[1:] if user.id not in followed),
+        'followed': next(user for user in users if user.id in followed),
+        'group': groups[0],
+        'tag': Tag.objects.first(),
+        'post': post,
+        'comment': comment,
+    }
+
+
+@pytest.fixture
+def assert_query_budget():
+    def check(client, url, data=None):
+        from posts import view_counter
+
+        view = resolve(url).func
+        limit = budget_for(view)
+        assert limit is not None, (
+            f'Задайте бюджет запросов для `{url}` декоратором query_budget'
+        )
+        cache.clear()
+        # Сброс просмотров по таймеру не должен попасть в замер
+        view_counter.flush()
+        who = 'user' if settings.SESSION_COOKIE_NAME in client.cookies else 'гость'
+        with QueryLog() as log:
+            if data is None:
+                response = client.get(url)
+            else:
+                response = client.post(url, data)
+        assert response.status_code in (200, 302), (
+            f'`{url}` ответила {response.status_code}'
+        )
+        _results[f'{url} ({who})'] = (len(log), limit)
+        assert len(log) <= limit, (
+            f'`{url}`: {len(log)} запросов при бюджете {limit}\n'
+            f'{log.report()}'
+        )
+        return log
+    return check
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section('бюджеты запросов')
+    for page, (count, limit) in sorted(_results.items()):
+        terminalreporter.write_line(f'{count:>4} / {limit:<4} {page}')
@@ -0,0 +1,126 @@
+import pytest
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from core.query_budget import budget_for
+
+BUDGETED_NAMESPACES = ('posts', 'users', 'about')
+# Представления Django из users.urls: их код не наш
+FOREIGN_VIEW_MODULES = ('django.',)
+
+
+def _views(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+class TestQueryBudgets:
+
+    def test_every_view_has_budget(self):
+        resolver = get_resolver()
+        missing = []
+        for namespace in BUDGETED_NAMESPACES:
+            _, sub_resolver = resolver.namespace_dict[namespace]
+            for pattern in _views(sub_resolver.url_patterns):
+                view = getattr(pattern.callback, 'view_class',
+                               pattern.callback)
+                if view.__module__.startswith(FOREIGN_VIEW_MODULES):
+                    continue
+                if budget_for(pattern.callback) is None:
+                    missing.append(f'{namespace}:{pattern.name}')
+        assert not missing, (
+            f'Задайте бюджет запросов декоратором query_budget: {missing}'
+        )
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('name, kwargs', [
+        ('posts:index', {}),
+        ('posts:group_list', {'slug': 'group'}),
+        ('posts:profile', {'username': 'user'}),
+        ('posts:post_detail', {'post_id': 'post'}),
+        ('posts:comment_thread',
+         {'post_id': 'post', 'comment_id': 'comment'}),
+        ('posts:tag_feed', {'name': 'tag'}),
+        ('posts:trending', {}),
+        ('about:author', {}),
+        ('about:tech', {}),
+        ('users:signup', {}),
+    ])
+    def test_guest_pages(self, client, query_budget_data,
+                         assert_query_budget, name, kwargs):
+        url = reverse(name, kwargs=self.resolve_kwargs(
+            kwargs, query_budget_data))
+        assert_query_budget(client, url)
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('name, kwargs', [
+        ('posts:index', {}),
+        ('posts:profile', {'username': 'user'}),
+        ('posts:post_detail', {'post_id': 'post'}),
+        ('posts:comment_thread',
+         {'post_id': 'post', 'comment_id': 'comment'}),
+        ('posts:post_create', {}),
+        ('posts:post_edit', {'post_id': 'post'}),
+        ('posts:post_history', {'post_id': 'post'}),
+        ('posts:follow_index', {}),
+        ('posts:mentions', {}),
+        ('posts:drafts', {}),
+        ('posts:trending', {}),
+        ('posts:profile_follow', {'username': 'author'}),
+        ('posts:profile_unfollow', {'username': 'followed'}),
+    ])
+    def test_user_pages(self, client, query_budget_data,
+                        assert_query_budget, name, kwargs):
+        client.force_login(query_budget_data['user'])
+        url = reverse(name, kwargs=self.resolve_kwargs(
+            kwargs, query_budget_data))
+        assert_query_budget(client, url)
+
+    @pytest.mark.django_db
+    def test_add_comment(self, client, query_budget_data,
+                         assert_query_budget):
+        client.force_login(query_budget_data['user'])
+        url = reverse('posts:add_comment',
+                      kwargs={'post_id': query_budget_data['post'].id})
+        assert_query_budget(client, url, {'text': 'Комментарий'})
+
+    @pytest.mark.django_db
+    def test_add_reply(self, client, query_budget_data, assert_query_budget):
+        client.force_login(query_budget_data['user'])
+        url = reverse('posts:add_reply', kwargs={
+            'post_id': query_budget_data['post'].id,
+            'parent_id': query_budget_data['comment'].id})
+        assert_query_budget(client, url, {'text': 'Ответ'})
+
+    @pytest.mark.django_db
+    def test_post_revision(self, client, query_budget_data,
+                           assert_query_budget):
+        post = query_budget_data['post']
+        for i in range(12):
+            post.text = f'{post.text} правка {i}'
+            post.save()
+        client.force_login(query_budget_data['user'])
+        url = reverse('posts:post_revision',
+                      kwargs={'post_id': post.id, 'number': 12})
+        assert_query_budget(client, url)
+
+    @pytest.mark.django_db
+    def test_follow_bulk(self, client, query_budget_data,
+                         assert_query_budget):
+        client.force_login(query_budget_data['user'])
+        usernames = ' '.join(query_budget_data[name].username
+                             for name in ('author', 'followed'))
+        assert_query_budget(client, reverse('posts:follow_bulk'),
+                            {'usernames': usernames})
+
+    @staticmethod
+    def resolve_kwargs(kwargs, data):
+        attrs = {'group': 'slug', 'user': 'username', 'author': 'username',
+                 'followed': 'username', 'post': 'id', 'tag': 'name',
+                 'comment': 'id'}
+        return {
+            key: getattr(data[value], attrs[value])
+            for key, value in kwargs.items()
+        }
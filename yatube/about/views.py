@@ -1,9 +1,13 @@
 from django.views.generic.base import TemplateView
 
+from core.query_budget import query_budget
 
+
+@query_budget(0)
 class AboutAuthor(TemplateView):
     template_name = 'about/author.html'
 
 
+@query_budget(0)
 class AboutTech(TemplateView):
     template_name = 'about/tech.html'
@@ -0,0 +1,37 @@
+from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .models import QueuedEmail, RequestProfile
+
+
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'subject', 'recipients', 'status', 'attempts',
+                    'next_try_at')
+    search_fields = ('subject', 'recipients')
+    list_filter = ('status',)
+    exclude = ('message',)
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'path', 'user', 'duration', 'created', 'download')
+    search_fields = ('path', 'user')
+    exclude = ('stats',)
+    readonly_fields = ('path', 'user', 'duration', 'created', 'summary',
+                       'download')
+
+    def download(self, obj):
+        url = reverse('profile_download', kwargs={'pk': obj.pk})
+        return format_html('<a href="{}">.prof</a>', url)
+
+    download.short_description = 'Скачать'
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
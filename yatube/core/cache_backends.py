@@ -0,0 +1,379 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим бэкендом.
+
+L1 — упорядоченный словарь в памяти процесса с ограничением по байтам и
+коротким временем жизни (L1_TIMEOUT). Как и у LocMemCache, он общий для
+всех потоков процесса с одинаковым LOCATION. L2 — общий для всех
+процессов кэш из settings.CACHES (OPTIONS['L2']), например файловый или
+memcached. Запись и удаление идут в L2, затем обновляют свой L1.
+
+Чтобы другие процессы не отдавали из L1 старое значение, каждая запись
+добавляется в журнал инвалидаций в L2: счетчик журнала и ключи-слоты
+с номерами. Процесс не чаще раза в SYNC_INTERVAL секунд дочитывает
+журнал и выбрасывает из L1 перечисленные там ключи. Если журнал успел
+истечь или отстал больше чем на LOG_SIZE записей, L1 очищается целиком.
+Таким образом, значение в L1 устаревает не дольше, чем на SYNC_INTERVAL.
+
+Журнал опирается на атомарные add и incr в L2. У memcached и redis они
+есть, для файлового кэша на одной машине — SharedFileCache.
+"""
+import os
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+LOG_COUNTER_KEY = 'tiered:log'
+# Признак очистки всего кэша в журнале
+CLEAR_ALL = '*'
+
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class TierStats:
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+class LocalTier:
+    """L1 одного процесса: LRU с ограничением по байтам и TTL.
+
+    generation растет при каждом изменении. Значение, прочитанное из L2,
+    кладется в L1 через fill(), только если за время чтения L1 не
+    менялся: иначе оно могло устареть, пока его читали.
+    """
+
+    def __init__(self, max_bytes: int, timeout: float):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.lock = threading.RLock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.generation = 0
+        self.synced_at = 0.0
+        self.log_position = None
+        self.stats = TierStats()
+        self.l2_stats = TierStats()
+
+    def get(self, key) -> Optional[bytes]:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            data, expires = item
+            if expires <= time.monotonic():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def _pop(self, key) -> None:
+        item = self.entries.pop(key, None)
+        if item is not None:
+            self.bytes -= len(item[0]) + len(key)
+
+    def _store(self, key, value, timeout) -> None:
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        size = len(data) + len(key)
+        ttl = self.timeout if timeout is None else min(timeout, self.timeout)
+        with self.lock:
+            self._pop(key)
+            if size > self.max_bytes or ttl <= 0:
+                return
+            self.entries[key] = (data, time.monotonic() + ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+
+    def set(self, key, value, timeout) -> None:
+        with self.lock:
+            self.generation += 1
+            self._store(key, value, timeout)
+
+    def fill(self, key, value, generation: int) -> None:
+        with self.lock:
+            if self.generation == generation:
+                self._store(key, value, None)
+
+    def delete(self, key) -> None:
+        with self.lock:
+            self.generation += 1
+            self._pop(key)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.bytes = 0
+
+
+class TieredCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options['L2']
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        self.log_size = options.get('LOG_SIZE', 1000)
+        self.log_timeout = options.get('LOG_TIMEOUT', 60 * 5)
+        with _local_tiers_lock:
+            if location not in _local_tiers:
+                _local_tiers[location] = LocalTier(
+                    options.get('MAX_BYTES', 32 * 1024 * 1024),
+                    options.get('L1_TIMEOUT', 5))
+            self.l1 = _local_tiers[location]
+
+    @property
+    def l2(self) -> BaseCache:
+        return caches[self.l2_alias]
+
+    # Журнал инвалидаций
+
+    def _log_key(self, position: int) -> str:
+        return f'{LOG_COUNTER_KEY}:{position}'
+
+    def _publish(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        l2 = self.l2
+        l2.add(LOG_COUNTER_KEY, 0, None)
+        try:
+            position = l2.incr(LOG_COUNTER_KEY)
+        except ValueError:
+            position = 1
+            l2.set(LOG_COUNTER_KEY, position, None)
+        l2.set(self._log_key(position), keys, self.log_timeout)
+        with self.l1.lock:
+            # Свою запись перечитывать не нужно
+            if self.l1.log_position == position - 1:
+                self.l1.log_position = position
+
+    def _sync(self) -> None:
+        now = time.monotonic()
+        with self.l1.lock:
+            if now - self.l1.synced_at < self.sync_interval:
+                return
+            self.l1.synced_at = now
+
+        position = self.l2.get(LOG_COUNTER_KEY, 0)
+        with self.l1.lock:
+            last = self.l1.log_position
+            self.l1.log_position = position
+        if last is None or position == last:
+            return
+        if position < last or position - last > self.log_size:
+            self.l1.clear()
+            return
+
+        log_keys = [self._log_key(i) for i in range(last + 1, position + 1)]
+        found = self.l2.get_many(log_keys)
+        if len(found) < len(log_keys):
+            # Часть журнала истекла, какие ключи менялись — неизвестно
+            self.l1.clear()
+            return
+        for keys in found.values():
+            if CLEAR_ALL in keys:
+                self.l1.clear()
+                return
+            for key in keys:
+                self.l1.delete(key)
+
+    # API кэша. В L2 уходят исходные key и version, поэтому ключи там
+    # те же, что у обычного кэша; L1 и журнал работают с полными ключами.
+
+    def _timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_key(key, version=version)
+        self._sync()
+        data = self.l1.get(full_key)
+        if data is not None:
+            self.l1.stats.hits += 1
+            return pickle.loads(data)
+        self.l1.stats.misses += 1
+
+        generation = self.l1.generation
+        value = self.l2.get(key, version=version)
+        if value is None:
+            self.l1.l2_stats.misses += 1
+            return default
+        self.l1.l2_stats.hits += 1
+        self.l1.fill(full_key, value, generation)
+        return value
+
+    def get_many(self, keys, version=None) -> Dict:
+        self._sync()
+        result = {}
+        missing = []
+        for key in keys:
+            data = self.l1.get(self.make_key(key, version=version))
+            if data is None:
+                missing.append(key)
+            else:
+                result[key] = pickle.loads(data)
+        self.l1.stats.hits += len(result)
+        self.l1.stats.misses += len(missing)
+
+        if missing:
+            generation = self.l1.generation
+            found = self.l2.get_many(missing, version=version)
+            self.l1.l2_stats.hits += len(found)
+            self.l1.l2_stats.misses += len(missing) - len(found)
+            for key, value in found.items():
+                self.l1.fill(self.make_key(key, version=version), value,
+                             generation)
+            result.update(found)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        full_key = self.make_key(key, version=version)
+        self.l2.set(key, value, timeout, version=version)
+        self.l1.set(full_key, value, timeout)
+        self._publish([full_key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        failed = self.l2.set_many(data, timeout, version=version)
+        full_keys = []
+        for key, value in data.items():
+            full_key = self.make_key(key, version=version)
+            self.l1.set(full_key, value, timeout)
+            full_keys.append(full_key)
+        self._publish(full_keys)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        if not self.l2.add(key, value, timeout, version=version):
+            return False
+        full_key = self.make_key(key, version=version)
+        self.l1.set(full_key, value, timeout)
+        self._publish([full_key])
+        return True
+
+    def delete(self, key, version=None):
+        full_key = self.make_key(key, version=version)
+        self.l2.delete(key, version=version)
+        self.l1.delete(full_key)
+        self._publish([full_key])
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return
+        self.l2.delete_many(keys, version=version)
+        full_keys = [self.make_key(key, version=version) for key in keys]
+        for full_key in full_keys:
+            self.l1.delete(full_key)
+        self._publish(full_keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        full_key = self.make_key(key, version=version)
+        self.l1.delete(full_key)
+        self._publish([full_key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, self._timeout(timeout), version=version)
+
+    def clear(self):
+        self.l2.clear()
+        self.l1.clear()
+        # Журнал в L2 стерт вместе со всем остальным
+        with self.l1.lock:
+            self.l1.log_position = 0
+        self._publish([CLEAR_ALL])
+
+    def stats(self) -> dict:
+        with self.l1.lock:
+            l1 = dict(self.l1.stats.as_dict(),
+                      entries=len(self.l1.entries), bytes=self.l1.bytes)
+        return {'l1': l1, 'l2': self.l1.l2_stats.as_dict()}
+
+
+class SharedFileCache(FileBasedCache):
+    """Файловый кэш, общий для процессов одной машины.
+
+    FileBasedCache записывает значение атомарно (временный файл и
+    переименование), но add и incr у него — чтение и запись без
+    блокировки: два процесса могут оба «добавить» ключ или потерять
+    приращение. Здесь они выполняются под блокировкой файла-замка,
+    выбранного по ключу из LOCK_STRIPES. incr сохраняет срок жизни
+    значения.
+
+    Стандартная чистка перебирает каталог при каждой записи, здесь — не
+    чаще раза в CULL_INTERVAL секунд на процесс.
+    """
+    LOCK_STRIPES = 64
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get('OPTIONS', {})
+        self._cull_interval = options.get('CULL_INTERVAL', 60)
+        self._culled_at = 0.0
+
+    @contextmanager
+    def _locked(self, fname: str):
+        stripe = int(os.path.basename(fname)[:8], 16) % self.LOCK_STRIPES
+        self._createdir()
+        # Без суффикса кэша: чистка и clear() замки не трогают
+        with open(os.path.join(self._dir, f'lock-{stripe}'), 'ab') as lock:
+            locks.lock(lock, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked(self._key_to_file(key, version)):
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self._locked(fname):
+            try:
+                with open(fname, 'rb') as f:
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except (FileNotFoundError, EOFError):
+                expiry = 0
+            remaining = None if expiry is None else expiry - time.time()
+            if remaining is not None and remaining <= 0:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            self.set(key, value, remaining, version)
+        return value
+
+    def _cull(self):
+        now = time.monotonic()
+        if now - self._culled_at < self._cull_interval:
+            return
+        self._culled_at = now
+        super()._cull()
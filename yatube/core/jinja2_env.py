@@ -0,0 +1,67 @@
+"""Окружение Jinja2 для шаблонов лент.
+
+Повторяет теги и фильтры, которыми пользуются Django-шаблоны: url,
+static, thumbnail, addclass, date и кэш фрагментов. Год в подвале
+приходит из того же контекст-процессора core.context_processors.year.
+"""
+import logging
+
+from django.core.cache.utils import make_template_fragment_key
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+from jinja2 import Environment
+from markupsafe import Markup
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import DummyImageFile
+from sorl.thumbnail.shortcuts import get_thumbnail
+
+from core import stampede
+from core.templatetags.user_filters import addclass
+
+logger = logging.getLogger('sorl.thumbnail')
+
+
+def url(viewname, *args, **kwargs):
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def thumbnail(file_, geometry, **options):
+    """Аналог {% thumbnail %}: миниатюра или None, если ее нет."""
+    try:
+        if file_:
+            return get_thumbnail(file_, geometry, **options)
+        if sorl_settings.THUMBNAIL_DUMMY:
+            return DummyImageFile(geometry)
+    except Exception:
+        if sorl_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Thumbnail helper failed')
+    return None
+
+
+def date(value, arg=None):
+    return defaultfilters.date(template_localtime(value), arg)
+
+
+def cache_fragment(timeout, fragment_name, *vary_on, caller):
+    """Аналог {% cache %}, ключ совпадает с ключом Django-тега."""
+    key = make_template_fragment_key(fragment_name, vary_on)
+    return Markup(stampede.get_or_set(key, caller, timeout,
+                                      name=fragment_name))
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'url': url,
+        'static': static,
+        'thumbnail': thumbnail,
+        'cache': cache_fragment,
+    })
+    env.filters.update({
+        'addclass': addclass,
+        'date': date,
+    })
+    return env
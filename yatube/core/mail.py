@@ -0,0 +1,126 @@
+"""Отправка почты через очередь.
+
+QueuedEmailBackend не ходит в сеть: он сохраняет письма в QueuedEmail и
+ставит задачу send_queued_mail. Задача забирает созревшие письма
+пачками по EMAIL_QUEUE_BATCH_SIZE и отправляет их через одно соединение
+настоящего бэкенда EMAIL_QUEUE_BACKEND.
+
+Пачка захватывается одним UPDATE: письма получают случайную метку
+воркера, а next_try_at сдвигается на EMAIL_QUEUE_LEASE. Воркер
+отправляет только письма со своей меткой, поэтому два воркера не
+отправят одно письмо дважды. Если воркер упал, письма снова созреют,
+когда истечет захват. Письмо, которое не удалось
+отправить, повторяется с растущей задержкой, а после
+EMAIL_QUEUE_MAX_ATTEMPTS попыток остается в таблице со статусом DEAD.
+"""
+import logging
+import pickle
+import uuid
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from tasks.queue import retry_delay, task
+
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        now = timezone.now()
+        records = []
+        for message in email_messages:
+            # Соединение не сериализуется и при отправке будет другим
+            message.connection = None
+            records.append(QueuedEmail(
+                subject=message.subject[:255],
+                recipients=', '.join(message.recipients()),
+                message=pickle.dumps(message),
+                next_try_at=now,
+            ))
+        if not records:
+            return 0
+
+        QueuedEmail.objects.bulk_create(records)
+        send_queued_mail.delay()
+        return len(records)
+
+
+def _failed(email: QueuedEmail, error: Exception) -> None:
+    email.attempts += 1
+    email.last_error = repr(error)
+    if email.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+        email.status = QueuedEmail.DEAD
+        logger.error('Письмо %s не доставлено: %r', email.pk, error)
+    else:
+        email.next_try_at = timezone.now() + timedelta(
+            seconds=retry_delay(email.attempts))
+    email.save(update_fields=(
+        'attempts', 'last_error', 'status', 'next_try_at'))
+
+
+def _claim() -> List[QueuedEmail]:
+    """Захватывает пачку созревших писем.
+
+    Пустой список — созревших писем нет. Если пачку целиком перехватил
+    другой воркер, берется следующая.
+    """
+    while True:
+        now = timezone.now()
+        due = QueuedEmail.objects.filter(
+            status=QueuedEmail.QUEUED, next_try_at__lte=now)
+        pks = list(due.values_list('pk', flat=True)[
+            :settings.EMAIL_QUEUE_BATCH_SIZE])
+        if not pks:
+            return []
+        claim = uuid.uuid4().hex
+        if due.filter(pk__in=pks).update(
+                claim=claim,
+                next_try_at=now + timedelta(
+                    seconds=settings.EMAIL_QUEUE_LEASE)):
+            return list(QueuedEmail.objects.filter(
+                claim=claim, status=QueuedEmail.QUEUED))
+
+
+@task(queue='mail')
+def send_queued_mail():
+    """Отправляет созревшие письма через одно соединение."""
+    connection = get_connection(settings.EMAIL_QUEUE_BACKEND)
+    # Если соединение не открылось, упадет вся задача и очередь задач
+    # повторит ее позже; письма при этом остаются в очереди.
+    connection.open()
+    retry_at = None
+    try:
+        while True:
+            batch = _claim()
+            if not batch:
+                break
+
+            sent = []
+            for email in batch:
+                try:
+                    if not connection.send_messages(
+                            [pickle.loads(email.message)]):
+                        raise RuntimeError('бэкенд не отправил письмо')
+                except Exception as error:
+                    _failed(email, error)
+                    if email.status == QueuedEmail.QUEUED:
+                        retry_at = min(retry_at or email.next_try_at,
+                                       email.next_try_at)
+                else:
+                    sent.append(email.pk)
+            QueuedEmail.objects.filter(pk__in=sent).update(
+                status=QueuedEmail.SENT, sent_at=timezone.now())
+    finally:
+        connection.close()
+
+    if retry_at is not None:
+        countdown = (retry_at - timezone.now()).total_seconds()
+        send_queued_mail.enqueue(countdown=max(int(countdown), 0))
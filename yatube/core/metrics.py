@@ -0,0 +1,403 @@
+"""Метрики в текстовом формате Prometheus.
+
+Счетчики и гистограммы копятся в памяти процесса. Если задан
+METRICS_DIR, процесс не чаще раза в METRICS_FLUSH_INTERVAL секунд и при
+завершении записывает свои значения в файл metrics-<pid>-<метка>.json в
+этом каталоге, а /metrics суммирует файлы всех процессов, поэтому один
+опрос видит весь сервер. Случайная метка не дает процессу, получившему
+pid завершившегося, затереть его файл.
+
+Файлы процессов, которых уже нет, при опросе переносятся в общий
+metrics-archive.json: счетчики не уменьшаются при перезапуске воркеров,
+а файлы не копятся. Жив ли процесс, проверяется по pid, поэтому
+METRICS_DIR должен быть своим у каждой машины. Без METRICS_DIR /metrics
+показывает только свой процесс.
+
+Значения Gauge не копятся, а вычисляются при опросе.
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache import cache as default_cache
+from django.core.files import locks
+from django.db import connection
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Время ответа, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Число SQL-запросов
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_lock = threading.Lock()
+# (имя, метки, суффикс, le) -> значение с начала работы процесса
+_values = defaultdict(float)
+_pid = os.getpid()
+_tag = uuid.uuid4().hex[:8]
+_last_flush = time.monotonic()
+_registry = {}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _check_pid() -> None:
+    global _pid, _tag
+
+    # Воркер, запущенный fork, унаследовал значения родителя, а они уже
+    # учтены в файле родителя
+    if os.getpid() != _pid:
+        _values.clear()
+        _pid = os.getpid()
+        _tag = uuid.uuid4().hex[:8]
+
+
+def _add(samples: Iterable[tuple]) -> None:
+    with _lock:
+        _check_pid()
+        for key, amount in samples:
+            _values[key] += amount
+        due = (
+            settings.METRICS_DIR
+            and time.monotonic() - _last_flush
+            >= settings.METRICS_FLUSH_INTERVAL
+        )
+    if due:
+        flush()
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str,
+                 labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _registry[name] = self
+
+    def _labels(self, labels: dict) -> Labels:
+        return tuple((name, str(labels[name])) for name in self.labels)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount:
+            _add([((self.name, self._labels(labels), '_total', None),
+                   amount)])
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 labels: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        labels = self._labels(labels)
+        # Хранится число наблюдений в каждой корзине, накопленные
+        # значения le считаются при выводе
+        le = self.buckets[bisect_left(self.buckets, value)]
+        _add([
+            ((self.name, labels, '_bucket', le), 1),
+            ((self.name, labels, '_sum', None), value),
+            ((self.name, labels, '_count', None), 1),
+        ])
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Gauge(Metric):
+    """Значение, которое вычисляет collect() при каждом опросе.
+
+    collect возвращает словарь {кортеж значений меток: значение}.
+    """
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str,
+                 collect: Callable[[], Dict[tuple, float]],
+                 labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+
+# Хранение
+
+PROCESS_FILE = re.compile(r'metrics-(\d+)-[0-9a-f]+\.json')
+ARCHIVE_FILE = 'metrics-archive.json'
+
+
+def _path() -> str:
+    return os.path.join(settings.METRICS_DIR, f'metrics-{_pid}-{_tag}.json')
+
+
+def flush() -> None:
+    """Записывает значения процесса в METRICS_DIR."""
+    global _last_flush
+
+    with _lock:
+        _check_pid()
+        data = [[name, labels, suffix, le, value]
+                for (name, labels, suffix, le), value in _values.items()]
+        _last_flush = time.monotonic()
+    if not settings.METRICS_DIR:
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    _write(_path(), data)
+
+
+def _write(path: str, data: list) -> None:
+    # Запись через временный файл: читатель не увидит файл наполовину
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(data, file)
+    os.replace(f'{path}.tmp', path)
+
+
+def _load(path: str) -> list:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def _merge(merged: Dict[tuple, float], path: str) -> None:
+    for name, labels, suffix, le, value in _load(path):
+        labels = tuple(tuple(pair) for pair in labels)
+        merged[name, labels, suffix, le] += value
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _archive_dead(paths: Iterable[str]) -> None:
+    """Переносит файлы завершившихся процессов в архив."""
+    dead = []
+    for path in paths:
+        match = PROCESS_FILE.fullmatch(os.path.basename(path))
+        if match and not _alive(int(match.group(1))):
+            dead.append(path)
+    if not dead:
+        return
+
+    archive = os.path.join(settings.METRICS_DIR, ARCHIVE_FILE)
+    with open(f'{archive}.lock', 'a') as lock_file:
+        locks.lock(lock_file, locks.LOCK_EX)
+        try:
+            # Файл мог уже перенести опрос в другом процессе
+            dead = [path for path in dead if os.path.exists(path)]
+            if not dead:
+                return
+            merged = defaultdict(float)
+            for path in [archive, *dead]:
+                _merge(merged, path)
+            _write(archive, [[name, labels, suffix, le, value]
+                             for (name, labels, suffix, le), value
+                             in merged.items()])
+            for path in dead:
+                os.remove(path)
+        finally:
+            locks.unlock(lock_file)
+
+
+def collect() -> Dict[tuple, float]:
+    """Значения всех процессов, сложенные по меткам."""
+    if not settings.METRICS_DIR:
+        with _lock:
+            _check_pid()
+            return dict(_values)
+
+    flush()
+    pattern = os.path.join(settings.METRICS_DIR, 'metrics-*.json')
+    _archive_dead(glob.glob(pattern))
+    merged = defaultdict(float)
+    for path in glob.glob(pattern):
+        _merge(merged, path)
+    return merged
+
+
+def reset() -> None:
+    """Обнуляет значения процесса."""
+    with _lock:
+        _values.clear()
+    if settings.METRICS_DIR:
+        try:
+            os.remove(_path())
+        except FileNotFoundError:
+            pass
+
+
+# Текстовый формат
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _sample(name: str, labels: Labels, value: float) -> str:
+    if labels:
+        pairs = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+        name = f'{name}{{{pairs}}}'
+    return f'{name} {_number(value)}'
+
+
+def _histogram_lines(metric: Histogram, samples: dict) -> list:
+    lines = []
+    series = defaultdict(dict)
+    for (suffix, le, labels), value in samples.items():
+        series[labels][suffix, le] = value
+    for labels in sorted(series):
+        values = series[labels]
+        total = 0
+        for le in metric.buckets:
+            total += values.get(('_bucket', le), 0)
+            lines.append(_sample(f'{metric.name}_bucket',
+                                 labels + (('le', _number(le)),), total))
+        lines.append(_sample(f'{metric.name}_sum', labels,
+                             values.get(('_sum', None), 0)))
+        lines.append(_sample(f'{metric.name}_count', labels,
+                             values.get(('_count', None), 0)))
+    return lines
+
+
+def exposition() -> str:
+    by_metric = defaultdict(dict)
+    for (name, labels, suffix, le), value in collect().items():
+        by_metric[name][suffix, le, labels] = value
+
+    lines = []
+    for name in sorted(_registry):
+        metric = _registry[name]
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        if isinstance(metric, Gauge):
+            for values, value in sorted(metric.collect().items()):
+                lines.append(_sample(
+                    name, tuple(zip(metric.labels, map(str, values))), value))
+        elif isinstance(metric, Histogram):
+            lines.extend(_histogram_lines(metric, by_metric[name]))
+        else:
+            samples = by_metric[name]
+            for suffix, le, labels in sorted(samples):
+                lines.append(_sample(f'{name}{suffix}', labels,
+                                     samples[suffix, le, labels]))
+    return '\n'.join(lines) + '\n'
+
+
+def cache_alias(cache) -> str:
+    """Имя кэша в settings.CACHES."""
+    if cache is default_cache:
+        return DEFAULT_CACHE_ALIAS
+    for alias in settings.CACHES:
+        if caches[alias] is cache:
+            return alias
+    return '?'
+
+
+# Метрики, общие для проекта
+
+VIEW_DURATION = Histogram(
+    'yatube_view_duration_seconds', 'Время ответа по представлениям',
+    ['view'])
+VIEW_QUERIES = Histogram(
+    'yatube_view_queries', 'SQL-запросов на один ответ', ['view'],
+    buckets=QUERY_BUCKETS)
+REQUESTS = Counter(
+    'yatube_requests', 'Ответы по представлениям и кодам', ['view', 'status'])
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests',
+    'Обращения к кэшу: hit, miss или stale (отдано старое значение)',
+    ['cache', 'name', 'result'])
+SESSION_LOADS = Counter(
+    'yatube_session_loads',
+    'Загрузки сессии по cookie: hit — найдена, miss — нет', ['result'])
+DB_CONNECTIONS = Counter(
+    'yatube_db_connections',
+    'Запросы с обращением к БД: reused — соединение осталось от '
+    'прошлого запроса, new — открыто заново', ['state'])
+
+
+def _view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unresolved>'
+
+
+class MetricsMiddleware:
+    """Ставится первым, чтобы время включало остальные middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        connected = connection.connection is not None
+        start = time.perf_counter()
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = _view_name(request)
+        VIEW_DURATION.observe(duration, view=view)
+        VIEW_QUERIES.observe(queries, view=view)
+        REQUESTS.inc(view=view, status=response.status_code)
+        if queries:
+            DB_CONNECTIONS.inc(state='reused' if connected else 'new')
+
+        session = getattr(request, 'session', None)
+        if (session is not None and session.accessed
+                and settings.SESSION_COOKIE_NAME in request.COOKIES):
+            SESSION_LOADS.inc(
+                result='hit' if session.session_key else 'miss')
+        return response
+
+
+def _flush_at_exit() -> None:
+    try:
+        flush()
+    except OSError:
+        pass
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, verbose_name='Адрес')),
+                ('user', models.CharField(max_length=150, verbose_name='Пользователь')),
+                ('duration', models.FloatField(verbose_name='Время, мс')),
+                ('summary', models.TextField(verbose_name='Сводка')),
+                ('stats', models.BinaryField(verbose_name='Профиль (pstats)')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_request_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedemail',
+            name='claim',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Захвачено'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import models
+
+
+class QueuedEmail(models.Model):
+    QUEUED = 'queued'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (SENT, 'Отправлено'),
+        (DEAD, 'Не доставлено'),
+    )
+
+    subject = models.CharField('Тема', max_length=255)
+    recipients = models.TextField('Получатели')
+    message = models.BinaryField('Письмо')
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    next_try_at = models.DateTimeField('Следующая попытка')
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    claim = models.CharField('Захвачено', max_length=32, blank=True)
+    created = models.DateTimeField('Создано', auto_now_add=True)
+    sent_at = models.DateTimeField('Отправлено', blank=True, null=True)
+
+    class Meta:
+        ordering = ('next_try_at',)
+        indexes = [
+            models.Index(fields=['status', 'next_try_at'],
+                         name='email_due_idx'),
+        ]
+        verbose_name = 'Письмо'
+        verbose_name_plural = 'Очередь писем'
+
+    def __str__(self):
+        return self.subject
+
+
+class RequestProfile(models.Model):
+    path = models.CharField('Адрес', max_length=500)
+    user = models.CharField('Пользователь', max_length=150)
+    duration = models.FloatField('Время, мс')
+    summary = models.TextField('Сводка')
+    stats = models.BinaryField('Профиль (pstats)')
+    created = models.DateTimeField('Создан', auto_now_add=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return self.path
@@ -0,0 +1,165 @@
+"""Профилирование запросов для сотрудников.
+
+Включается настройкой PROFILING_ENABLED. Запрос сотрудника с заголовком
+X-Profile или параметром ?profile выполняется под cProfile, профиль
+сохраняется в RequestProfile (последние PROFILING_KEEP штук) и
+скачивается из админки в формате pstats, номер приходит в заголовке
+X-Profile-Id.
+
+При PROFILING_SAMPLING фоновый поток раз в PROFILING_SAMPLE_INTERVAL
+секунд снимает стеки потоков, которые обрабатывают запросы, и копит их
+в формате collapsed stacks (flamegraph.pl, speedscope). Накопленное в
+процессе отдается из админки. Выборка почти не замедляет запросы, но
+относится только к своему процессу.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .models import RequestProfile
+
+FLAG = 'profile'
+HEADER = 'HTTP_X_PROFILE'
+SUMMARY_LINES = 40
+
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}.{frame.f_code.co_name}'
+
+
+def collapse(frame) -> str:
+    """Стек в виде корень;...;лист."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Статистический профилировщик потоков-обработчиков запросов."""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.threads = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def _run(self, interval: float) -> None:
+        own = threading.get_ident()
+        while True:
+            time.sleep(interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id in self.threads:
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own:
+                        self.stacks[collapse(frame)] += 1
+
+    def start(self, interval: float) -> None:
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self._run, args=(interval,),
+                name='profiling-sampler', daemon=True)
+        self.thread.start()
+
+    @contextmanager
+    def track(self):
+        thread_id = threading.get_ident()
+        with self.lock:
+            self.threads.add(thread_id)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.threads.discard(thread_id)
+
+    def collapsed(self) -> str:
+        with self.lock:
+            return ''.join(f'{stack} {count}\n'
+                           for stack, count in self.stacks.most_common())
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stacks.clear()
+
+
+sampler = Sampler()
+
+
+def _summary(stats: pstats.Stats) -> str:
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    return out.getvalue()
+
+
+def save(request, profile: cProfile.Profile,
+         duration: float) -> RequestProfile:
+    """Сохраняет профиль и удаляет вышедшие за PROFILING_KEEP."""
+    # Stats забирает данные у профиля; в файл пишется тот же словарь,
+    # что и в Stats.dump_stats
+    stats = pstats.Stats(profile)
+    record = RequestProfile.objects.create(
+        path=request.get_full_path()[:500],
+        user=request.user.get_username(),
+        duration=duration * 1000,
+        summary=_summary(stats),
+        stats=marshal.dumps(stats.stats),
+    )
+    stale = RequestProfile.objects.order_by('-id').values_list(
+        'id', flat=True)[settings.PROFILING_KEEP:]
+    RequestProfile.objects.filter(id__in=list(stale)).delete()
+    return record
+
+
+def wants_profile(request) -> bool:
+    return (
+        (FLAG in request.GET or HEADER in request.META)
+        and request.user.is_staff
+    )
+
+
+class ProfilingMiddleware:
+    """Ставится после AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+        if settings.PROFILING_SAMPLING:
+            sampler.start(settings.PROFILING_SAMPLE_INTERVAL)
+            with sampler.track():
+                return self.handle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        if not wants_profile(request):
+            return self.get_response(request)
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+            # Отрисовка ответов TemplateResponse откладывается до него
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        finally:
+            profile.disable()
+        record = save(request, profile, time.perf_counter() - start)
+        response['X-Profile-Id'] = str(record.id)
+        return response
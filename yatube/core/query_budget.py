@@ -0,0 +1,119 @@
+"""Бюджеты SQL-запросов для представлений.
+
+Декоратор query_budget задает, сколько запросов представлению можно
+сделать при холодном кэше. Бюджет складывается из запросов, которые
+представлению нужны по замыслу (сессия, объект страницы, запись и
+т. п.), и рядом с ним записан его состав, а не число из последнего
+замера. Бюджеты проверяет pytest-плагин
+tests/fixtures/fixture_query_budget.py, а QueryLog собирает запросы с
+местом вызова: строкой шаблона, если запрос сделан при отрисовке, или
+строкой кода проекта.
+"""
+import inspect
+import os
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.template.base import Node
+
+_budgets: Dict[str, int] = {}
+
+# Сессия и пользователь вошедшего; у гостя этих запросов нет
+AUTH = 2
+
+
+def _view_name(view) -> str:
+    view = getattr(view, 'view_class', view)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+def query_budget(limit: int):
+    """Не больше limit запросов на один вызов представления."""
+    def decorator(view):
+        _budgets[_view_name(view)] = limit
+        return view
+    return decorator
+
+
+def budget_for(view: Callable) -> Optional[int]:
+    return _budgets.get(_view_name(view))
+
+
+def budgets() -> Dict[str, int]:
+    return dict(_budgets)
+
+
+def _template_site(frame) -> Optional[str]:
+    node = frame.f_locals.get('self')
+    # Только узлы шаблона. type() вместо isinstance: isinstance
+    # вычисляет ленивые объекты вроде request.user, а с ними и запросы
+    if not issubclass(type(node), Node):
+        return None
+    token = getattr(node, 'token', None)
+    origin = getattr(node, 'origin', None)
+    if token is None or origin is None:
+        return None
+    return f'{origin.template_name}:{token.lineno}'
+
+
+def call_site() -> str:
+    """Ближайшая строка шаблона или кода проекта на стеке."""
+    project_site = None
+    frame = inspect.currentframe().f_back
+    while frame is not None:
+        site = _template_site(frame)
+        if site is not None:
+            return site
+        filename = frame.f_code.co_filename
+        if (project_site is None
+                and filename.startswith(settings.BASE_DIR)
+                and filename != __file__):
+            project_site = (
+                f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                f'{frame.f_lineno} ({frame.f_code.co_name})')
+        frame = frame.f_back
+    return project_site or '?'
+
+
+class QueryLog:
+    """Запоминает запросы и места их вызова.
+
+    with QueryLog() as log:
+        client.get(url)
+    """
+
+    def __init__(self):
+        self.queries: List[tuple] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((call_site(), sql))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def by_site(self) -> Dict[str, List[str]]:
+        sites = defaultdict(list)
+        for site, sql in self.queries:
+            sites[site].append(sql)
+        return dict(sites)
+
+    def report(self) -> str:
+        """Запросы, сгруппированные по месту вызова, частые первыми."""
+        lines = []
+        sites = sorted(self.by_site().items(), key=lambda item: -len(item[1]))
+        for site, queries in sites:
+            lines.append(f'{len(queries):>4} × {site}')
+            for sql in dict.fromkeys(queries):
+                lines.append(f'         {sql}')
+        return '\n'.join(lines)
@@ -0,0 +1,149 @@
+"""Кэш с защитой от одновременного пересчета.
+
+get_or_set хранит значение вместе с мягким сроком годности и временем
+вычисления. Незадолго до срока запись с растущей вероятностью считается
+истекшей (probabilistic early expiration, XFetch), поэтому пересчет
+обычно начинается раньше, чем ее захотят все запросы сразу. Пересчитывает
+только тот, кто взял короткую блокировку, остальные получают старое
+значение, которое держится в кэше еще CACHE_STALE_TIMEOUT секунд. Если
+старого значения нет или оно не прошло проверку valid (например,
+сброшено), они ждут результата не дольше CACHE_LOCK_TIMEOUT.
+
+Если результат не сохранили (store его отверг: 404, ответ с cookie),
+в кэше на timeout остается отметка, и следующие запросы считают значение
+сами, без блокировки и ожидания: сохраненного результата все равно не
+будет. Первый сохраненный результат отметку снимает.
+"""
+import math
+import random
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+from .metrics import CACHE_REQUESTS, cache_alias
+
+# Пауза между проверками, пока другой поток считает значение
+WAIT_INTERVAL = 0.05
+
+
+def _lock_key(key: str) -> str:
+    return f'{key}:lock'
+
+
+def _uncached_key(key: str) -> str:
+    return f'{key}:uncached'
+
+
+def _expired(entry: dict, beta: float) -> bool:
+    # 1 - random() лежит в (0, 1], логарифм от него не падает на нуле
+    early = -entry['delta'] * beta * math.log(1 - random.random())
+    return time.time() + early >= entry['expires']
+
+
+def _release(cache, key: str, token: str) -> None:
+    # Блокировка могла истечь и достаться другому
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+def _compute(cache, key: str, compute: Callable, timeout: Optional[int],
+             store: Callable[[Any], bool], uncached: bool = False) -> Any:
+    """uncached — в кэше стоит отметка о несохраненном результате."""
+    start = time.monotonic()
+    value = compute()
+    if not store(value):
+        if not uncached:
+            cache.set(_uncached_key(key), True, timeout)
+        return value
+    if uncached:
+        cache.delete(_uncached_key(key))
+    delta = time.monotonic() - start
+    if timeout is None:
+        cache.set(key, {'value': value, 'delta': delta,
+                        'expires': math.inf}, None)
+    else:
+        cache.set(key, {
+            'value': value,
+            'delta': delta,
+            'expires': time.time() + timeout,
+        }, timeout + settings.CACHE_STALE_TIMEOUT)
+    return value
+
+
+def _usable(entry: Optional[dict],
+            valid: Optional[Callable[[Any], bool]]) -> bool:
+    return entry is not None and (valid is None or valid(entry['value']))
+
+
+def _locked_compute(cache, key: str, entry: Optional[dict],
+                    compute: Callable, timeout: Optional[int],
+                    store: Callable[[Any], bool],
+                    valid: Optional[Callable[[Any], bool]],
+                    count: Callable[[str], None]) -> Any:
+    """Пересчет под блокировкой. Без блокировки — старое значение entry
+    или ожидание результата другого потока."""
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while True:
+        token = uuid.uuid4().hex
+        if cache.add(_lock_key(key), token, settings.CACHE_LOCK_TIMEOUT):
+            count('miss')
+            try:
+                return _compute(cache, key, compute, timeout, store)
+            finally:
+                _release(cache, key, token)
+
+        if entry is not None:
+            count('stale')
+            return entry['value']
+        if time.monotonic() >= deadline:
+            # Считающий поток завис, не ждем его дольше
+            count('miss')
+            return _compute(cache, key, compute, timeout, store)
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if _usable(entry, valid):
+            count('hit')
+            return entry['value']
+        if cache.get(_uncached_key(key)):
+            # Считавший поток результат не сохранил, ждать нечего
+            count('miss')
+            return _compute(cache, key, compute, timeout, store,
+                            uncached=True)
+        entry = None
+
+
+def get_or_set(key: str, compute: Callable[[], Any],
+               timeout: Optional[int], cache=None,
+               valid: Optional[Callable[[Any], bool]] = None,
+               store: Optional[Callable[[Any], bool]] = None,
+               beta: Optional[float] = None,
+               name: str = 'fragment') -> Any:
+    """Значение key из кэша или compute(), вычисленное одним потоком.
+
+    valid проверяет сохраненное значение: непрошедшее проверку не
+    отдается даже во время пересчета, его ждут как отсутствующее. store
+    решает, сохранять ли вычисленное значение. name — метка в метриках
+    кэша.
+    """
+    cache = cache or default_cache
+    store = store or (lambda value: True)
+    beta = settings.CACHE_EARLY_BETA if beta is None else beta
+
+    def count(result):
+        CACHE_REQUESTS.inc(cache=cache_alias(cache), name=name,
+                           result=result)
+
+    entry = cache.get(key)
+    if not _usable(entry, valid):
+        entry = None
+    if entry is not None and not _expired(entry, beta):
+        count('hit')
+        return entry['value']
+    if entry is None and cache.get(_uncached_key(key)):
+        count('miss')
+        return _compute(cache, key, compute, timeout, store, uncached=True)
+    return _locked_compute(cache, key, entry, compute, timeout, store,
+                           valid, count)
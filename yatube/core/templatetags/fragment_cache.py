@@ -0,0 +1,69 @@
+"""Тег {% cache %} с защитой от одновременного пересчета фрагмента.
+
+Синтаксис и ключи те же, что у django.templatetags.cache, фрагмент
+хранится через core.stampede.
+"""
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import (Library, TemplateSyntaxError,
+                             VariableDoesNotExist)
+from django.templatetags.cache import CacheNode, do_cache
+
+from core import stampede
+
+register = Library()
+
+
+class StampedeCacheNode(CacheNode):
+
+    def resolve_expire_time(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                f'"cache" tag got an unknown variable: '
+                f'{self.expire_time_var.var!r}')
+        if expire_time is None:
+            return None
+        try:
+            return int(expire_time)
+        except (ValueError, TypeError):
+            raise TemplateSyntaxError(
+                f'"cache" tag got a non-integer timeout value: '
+                f'{expire_time!r}')
+
+    def resolve_cache(self, context):
+        if not self.cache_name:
+            try:
+                return caches['template_fragments']
+            except InvalidCacheBackendError:
+                return caches['default']
+        try:
+            cache_name = self.cache_name.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                f'"cache" tag got an unknown variable: '
+                f'{self.cache_name.var!r}')
+        try:
+            return caches[cache_name]
+        except InvalidCacheBackendError:
+            raise TemplateSyntaxError(
+                f'Invalid cache name specified for cache tag: '
+                f'{cache_name!r}')
+
+    def render(self, context):
+        expire_time = self.resolve_expire_time(context)
+        fragment_cache = self.resolve_cache(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return stampede.get_or_set(
+            key, lambda: self.nodelist.render(context), expire_time,
+            cache=fragment_cache, name=self.fragment_name)
+
+
+@register.tag('cache')
+def do_stampede_cache(parser, token):
+    node = do_cache(parser, token)
+    return StampedeCacheNode(node.nodelist, node.expire_time_var,
+                             node.fragment_name, node.vary_on,
+                             node.cache_name)
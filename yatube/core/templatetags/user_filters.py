@@ -1,8 +1,46 @@
+import re
+
 from django import template
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts.models import HASHTAG, MENTION
+from posts.utils import ReverseMap
 
 register = template.Library()
 
+LINKS = re.compile(f'{HASHTAG.pattern}|{MENTION.pattern}')
+
 
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.filter
+def linkify(text, mentioned=()):
+    """Текст с #тегами и @упоминаниями в виде ссылок.
+
+    Ссылку на профиль получают только имена из mentioned — найденные
+    при сохранении текста (mentions.usernames), остальные @имя остаются
+    текстом. Разбирается исходный текст, как в extract_mentions, а
+    экранируются уже куски между ссылками.
+    """
+    urls = ReverseMap()
+    parts = []
+    end = 0
+    for match in LINKS.finditer(text):
+        tag, username = match.groups()
+        if tag:
+            url = urls.tag_url(tag.lower())
+        elif username in mentioned:
+            url = urls.profile_url(username)
+        else:
+            continue
+        parts += [
+            conditional_escape(text[end:match.start()]),
+            format_html('<a href="{}">{}</a>', url, match.group(0)),
+        ]
+        end = match.end()
+    parts.append(conditional_escape(text[end:]))
+    return mark_safe(''.join(parts))
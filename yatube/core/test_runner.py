@@ -0,0 +1,50 @@
+"""Запуск тестов проекта.
+
+Файловый кэш на время прогона переносится во временный каталог: тесты
+не видят кэш работающего сайта и прошлых прогонов. Буфер просмотров
+(posts.view_counter) очищается при создании и удалении тестовой базы:
+просмотры рабочей базы не попадают в тестовую, а тестовой — в рабочую
+при выходе. Раннер для manage.py test, фикстуры с тем же действием — в
+tests/conftest.py.
+"""
+import copy
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+from posts import view_counter
+
+
+@contextmanager
+def isolated_caches():
+    location = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = copy.deepcopy(settings.CACHES)
+    for params in caches.values():
+        if issubclass(import_string(params['BACKEND']), FileBasedCache):
+            params['LOCATION'] = location
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+
+    def run_tests(self, *args, **kwargs):
+        with isolated_caches():
+            return super().run_tests(*args, **kwargs)
+
+    def setup_databases(self, **kwargs):
+        view_counter.reset()
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        view_counter.reset()
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,538 @@
+import json
+import marshal
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.queue import run_pending
+
+from . import metrics, profiling, stampede, views
+from .mail import send_queued_mail
+from .cache_backends import SharedFileCache, TieredCache
+from .models import QueuedEmail, RequestProfile
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+User = get_user_model()
+
+
+class BrokenBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        raise SMTPException('сервер недоступен')
+
+
+class CountingHandler:
+    """Обработчик aiosmtpd: считает соединения и принятые письма."""
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname,
+                          responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    EMAIL_QUEUE_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    TASK_RETRY_DELAY=0,
+    EMAIL_QUEUE_MAX_ATTEMPTS=2,
+)
+class QueuedEmailTests(TestCase):
+
+    def send(self, count=1):
+        for number in range(count):
+            mail.send_mail(f'Письмо {number}', 'Текст',
+                           'from@yatube.ru', ['to@yatube.ru'])
+
+    def test_mail_is_sent_by_worker(self):
+        """Письмо уходит воркером, а не в запросе."""
+
+        self.send()
+        self.assertEqual(len(mail.outbox), 0)
+
+        run_pending(['mail'])
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Письмо 0')
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.SENT)
+
+    def test_password_reset_is_queued(self):
+        """Письмо для сброса пароля попадает в очередь."""
+
+        User.objects.create_user(
+            username='someone', email='to@yatube.ru', password='1234567')
+
+        self.client.post('/auth/password_reset/', {'email': 'to@yatube.ru'})
+
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+        run_pending(['mail'])
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_QUEUE_BACKEND='core.tests.BrokenBackend')
+    def test_dead_letter(self):
+        """После исчерпания попыток письмо помечается недоставленным."""
+
+        self.send()
+        run_pending(['mail'])
+
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.status, QueuedEmail.DEAD)
+        self.assertEqual(email.attempts, 2)
+        self.assertIn('сервер недоступен', email.last_error)
+
+    def test_claimed_mail_not_sent_twice(self):
+        """Письмо, захваченное другим воркером, не отправляется, пока
+        захват не истек."""
+
+        self.send()
+        QueuedEmail.objects.update(
+            claim='другой', next_try_at=timezone.now() + timedelta(minutes=5))
+        run_pending(['mail'])
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Воркер упал, захват истек
+        QueuedEmail.objects.update(next_try_at=timezone.now())
+        send_queued_mail.delay()
+        run_pending(['mail'])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.SENT)
+
+    @unittest.skipIf(Controller is None, 'нужен aiosmtpd')
+    def test_batch_uses_one_smtp_connection(self):
+        """Пачка писем уходит через одно SMTP-соединение."""
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        handler = CountingHandler()
+        controller = Controller(handler, hostname='127.0.0.1', port=port)
+        controller.start()
+        self.addCleanup(controller.stop)
+
+        with self.settings(
+                EMAIL_QUEUE_BACKEND=(
+                    'django.core.mail.backends.smtp.EmailBackend'),
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=port):
+            self.send(3)
+            run_pending(['mail'])
+
+        self.assertEqual(len(handler.messages), 3)
+        self.assertEqual(handler.connections, 1)
+
+
+class StampedeTests(SimpleTestCase):
+    THREADS = 10
+
+    def setUp(self):
+        cache.clear()
+        self.computed = 0
+        self.lock = threading.Lock()
+
+    def compute(self):
+        with self.lock:
+            self.computed += 1
+            value = self.computed
+        time.sleep(0.1)
+        return value
+
+    def run_concurrently(self, key, timeout, **kwargs):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def worker():
+            barrier.wait()
+            value = stampede.get_or_set(key, self.compute, timeout, **kwargs)
+            with self.lock:
+                results.append(value)
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_one_recompute_per_expiry(self):
+        """Истекшее значение пересчитывает один поток, остальные
+        получают старое."""
+
+        stampede.get_or_set('key', self.compute, 60)
+        entry = cache.get('key')
+        entry['expires'] = time.time() - 1
+        cache.set('key', entry)
+
+        results = self.run_concurrently('key', 60)
+        self.assertEqual(self.computed, 2)
+        self.assertEqual(sorted(set(results)), [1, 2])
+        self.assertEqual(stampede.get_or_set('key', self.compute, 60), 2)
+
+    def test_invalid_value_not_served(self):
+        """Значение, не прошедшее проверку, не отдается и во время
+        пересчета."""
+
+        stampede.get_or_set('key', self.compute, 60)
+        results = self.run_concurrently(
+            'key', 60, valid=lambda value: value > 1)
+        self.assertEqual(self.computed, 2)
+        self.assertEqual(results, [2] * self.THREADS)
+
+    def test_cold_key_computed_once(self):
+        """Без значения в кэше остальные потоки ждут первый."""
+
+        results = self.run_concurrently('cold', 60)
+        self.assertEqual(self.computed, 1)
+        self.assertEqual(results, [1] * self.THREADS)
+
+    def test_uncached_result_not_awaited(self):
+        """Несохраняемый результат потоки считают сами, не дожидаясь
+        блокировки."""
+
+        start = time.monotonic()
+        self.run_concurrently('uncached', 60, store=lambda value: False)
+        self.run_concurrently('uncached', 60, store=lambda value: False)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(self.computed, 2 * self.THREADS)
+
+        stampede.get_or_set('uncached', self.compute, 60)
+        self.assertIsNone(cache.get('uncached:uncached'))
+        self.assertEqual(
+            stampede.get_or_set('uncached', self.compute, 60),
+            2 * self.THREADS + 1)
+
+    def test_early_expiry(self):
+        """Незадолго до срока значение пересчитывается заранее."""
+
+        stampede.get_or_set('key', self.compute, 60)
+        entry = cache.get('key')
+        entry['delta'] = 10 ** 6
+        cache.set('key', entry)
+        self.assertEqual(stampede.get_or_set('key', self.compute, 60), 2)
+
+    def test_fragment_tag(self):
+        """Тег cache отдает сохраненный фрагмент."""
+
+        template = Template(
+            '{% load fragment_cache %}{% cache 60 fragment %}'
+            '{{ value }}{% endcache %}')
+        self.assertEqual(template.render(Context({'value': 'a'})), 'a')
+        self.assertEqual(template.render(Context({'value': 'b'})), 'a')
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-tests',
+    },
+})
+class TieredCacheTests(SimpleTestCase):
+
+    def make_cache(self, process, **options):
+        """Кэш отдельного процесса с общим L2."""
+        options = dict({'L2': 'shared', 'SYNC_INTERVAL': 0}, **options)
+        location = f'{self.id()}:{process}'
+        return TieredCache(location, {'OPTIONS': options})
+
+    def setUp(self):
+        self.first = self.make_cache('first')
+        self.second = self.make_cache('second')
+        self.first.clear()
+
+    def test_l1_serves_repeated_reads(self):
+        """Повторное чтение отдается из памяти процесса."""
+
+        self.first.set('key', 'value')
+        self.second.get('key')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.stats()['l1']['hits'], 1)
+        self.assertEqual(self.second.stats()['l2']['hits'], 1)
+
+    def test_invalidation_reaches_other_processes(self):
+        """Запись в одном процессе сбрасывает L1 другого."""
+
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+
+        self.first.set('key', 2)
+        self.assertEqual(self.second.get('key'), 2)
+
+        self.first.incr('key')
+        self.assertEqual(self.second.get('key'), 3)
+
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+        self.second.set_many({'a': 1, 'b': 2})
+        self.first.get_many(['a', 'b'])
+        self.second.clear()
+        self.assertEqual(self.first.get_many(['a', 'b']), {})
+
+    def test_l1_byte_limit(self):
+        """L1 вытесняет давно прочитанные значения сверх лимита байт."""
+
+        tiny = self.make_cache('tiny', MAX_BYTES=1000)
+        for i in range(10):
+            tiny.set(f'key{i}', 'x' * 200)
+        tiny.get('key0')
+
+        stats = tiny.stats()['l1']
+        self.assertLessEqual(stats['bytes'], 1000)
+        self.assertLess(stats['entries'], 10)
+        # Вытесненное из L1 читается из L2
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(tiny.get('key0'), 'x' * 200)
+
+
+def _incr_shared(location, times):
+    cache = SharedFileCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SharedFileCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.cache = SharedFileCache(self.location, {})
+
+    def test_incr_is_atomic_across_processes(self):
+        """Приращения из нескольких процессов не теряются."""
+
+        self.cache.set('counter', 0, None)
+        processes = [
+            multiprocessing.Process(target=_incr_shared,
+                                    args=(self.location, 100))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 400)
+
+    def test_incr_keeps_timeout(self):
+        """incr не продлевает и не сбрасывает срок жизни значения."""
+
+        self.cache.set('forever', 1, None)
+        self.cache.set('short', 1, 0.2)
+        self.cache.incr('forever')
+        self.cache.incr('short')
+        time.sleep(0.3)
+        self.assertEqual(self.cache.get('forever'), 2)
+        self.assertIsNone(self.cache.get('short'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('short')
+
+    def test_add_only_once(self):
+        """add не перезаписывает существующий ключ."""
+
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_KEEP=2)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('about:tech')
+
+    def test_staff_request_profiled(self):
+        """Запрос сотрудника с флагом профилируется и скачивается."""
+
+        self.client.force_login(ProfilingTests.staff)
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+        record = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(record.path, self.url)
+        self.assertIn('cumulative', record.summary)
+
+        response = self.client.get(
+            reverse('profile_download', kwargs={'pk': record.pk}))
+        stats = marshal.loads(b''.join(response))
+        self.assertTrue(stats)
+
+    def test_only_flagged_staff_requests(self):
+        """Без флага и для обычных пользователей профиль не снимается."""
+
+        self.client.force_login(ProfilingTests.staff)
+        self.client.get(self.url)
+        self.client.force_login(ProfilingTests.user)
+        response = self.client.get(self.url, {'profile': ''})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_keeps_last_profiles(self):
+        """Хранятся только последние PROFILING_KEEP профилей."""
+
+        self.client.force_login(ProfilingTests.staff)
+        ids = [self.client.get(self.url, {'profile': ''})['X-Profile-Id']
+               for _ in range(3)]
+        self.assertEqual(
+            sorted(RequestProfile.objects.values_list('id', flat=True)),
+            sorted(int(pk) for pk in ids[1:]))
+
+
+class SamplerTests(SimpleTestCase):
+
+    def test_collects_tracked_threads(self):
+        """Выборка собирает стеки только отслеживаемых потоков."""
+
+        sampler = profiling.Sampler()
+        sampler.start(0.001)
+
+        def busy_tracked():
+            with sampler.track():
+                deadline = time.monotonic() + 0.2
+                while time.monotonic() < deadline:
+                    pass
+
+        worker = threading.Thread(target=busy_tracked)
+        worker.start()
+        worker.join()
+        stacks = sampler.collapsed().splitlines()
+        self.assertTrue(stacks)
+        self.assertTrue(all('busy_tracked' in line for line in stacks))
+        stack, count = stacks[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def sample(self, text, line):
+        """Значение строки метрики из вывода /metrics."""
+        for row in text.splitlines():
+            name, _, value = row.rpartition(' ')
+            if name == line:
+                return float(value)
+        self.fail(f'{line} нет в выводе')
+
+    def test_views_and_cache_exposed(self):
+        """Время, запросы и обращения к кэшу видны в /metrics."""
+
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+
+        self.assertEqual(self.sample(
+            text, 'yatube_view_duration_seconds_count{view="posts:index"}'), 2)
+        self.assertEqual(self.sample(
+            text, 'yatube_view_duration_seconds_bucket'
+                  '{view="posts:index",le="+Inf"}'), 2)
+        self.assertEqual(self.sample(
+            text, 'yatube_requests_total{view="posts:index",status="200"}'), 2)
+        self.assertEqual(self.sample(
+            text, 'yatube_cache_requests_total'
+                  '{cache="default",name="page",result="hit"}'), 1)
+        self.assertIn('# TYPE yatube_thumbnail_backlog gauge', text)
+        self.assertEqual(self.sample(text, 'yatube_thumbnail_backlog'), 0)
+
+    def test_processes_aggregated(self):
+        """Счетчики других процессов складываются со своими."""
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            metrics.REQUESTS.inc(view='posts:index', status=200)
+            path = os.path.join(directory, 'metrics-1-abc.json')
+            with open(path, 'w') as f:
+                json.dump([['yatube_requests', [['view', 'posts:index'],
+                                                ['status', '200']],
+                            '_total', None, 4]], f)
+            text = metrics.exposition()
+            metrics.reset()
+        self.assertEqual(self.sample(
+            text, 'yatube_requests_total{view="posts:index",status="200"}'), 5)
+
+    def test_dead_processes_archived(self):
+        """Файлы завершившихся процессов переносятся в архив."""
+
+        process = multiprocessing.Process(target=int)
+        process.start()
+        process.join()
+        line = 'yatube_requests_total{view="posts:index",status="200"}'
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            for tag in ('a1', 'b2'):
+                name = f'metrics-{process.pid}-{tag}.json'
+                with open(os.path.join(directory, name), 'w') as f:
+                    json.dump([['yatube_requests', [['view', 'posts:index'],
+                                                    ['status', '200']],
+                                '_total', None, 3]], f)
+            first = metrics.exposition()
+            second = metrics.exposition()
+            files = sorted(os.listdir(directory))
+            metrics.reset()
+        self.assertEqual(self.sample(first, line), 6)
+        self.assertEqual(self.sample(second, line), 6)
+        self.assertNotIn(f'metrics-{process.pid}-a1.json', files)
+        self.assertIn(metrics.ARCHIVE_FILE, files)
+
+    def test_token_required(self):
+        """Без токена /metrics недоступен, в том числе с 127.0.0.1."""
+
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 404)
+        with override_settings(METRICS_TOKEN=''):
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 404)
+
+
+class ErrorPagesTests(TestCase):
+
+    def test_not_found_prerendered(self):
+        """Страница 404 отдается без запросов, адрес экранирован."""
+
+        self.client.get('/missing/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/missing/<b>/')
+        self.assertEqual(response.status_code, 404)
+        content = response.content.decode()
+        self.assertIn('/missing/&lt;b&gt;/', content)
+        self.assertNotIn(views.PATH_MARKER, content)
@@ -1,17 +1,97 @@
-from django.shortcuts import render
+import datetime
+import hmac
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.http import (Http404, HttpResponse, HttpResponseForbidden,
+                         HttpResponseNotFound, HttpResponseServerError,
+                         JsonResponse)
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+from . import metrics
+from .models import RequestProfile
+from .profiling import sampler
+
+
+# Страницы ошибок отрисовываются один раз на процесс и год, без запроса
+# и пользователя: шапка всегда гостевая, зато ответ не ходит ни в БД, ни
+# в шаблонизатор. Адрес в 404 подставляется на место маркера.
+PATH_MARKER = '9081726354-path'
+
+_error_pages = {}
+
+
+def _error_page(template: str) -> str:
+    year = datetime.date.today().year
+    body = _error_pages.get((template, year))
+    if body is None:
+        body = render_to_string(template, {'path': PATH_MARKER, 'year': year})
+        _error_pages[template, year] = body
+    return body
 
 
 def page_not_found(request, exception):
-    return render(request, 'core/404.html', {'path': request.path}, status=404)
+    body = _error_page('core/404.html').replace(
+        PATH_MARKER, escape(request.path))
+    return HttpResponseNotFound(body)
 
 
 def csrf_failure(request, reason=''):
-    return render(request, 'core/403csrf.html')
+    return HttpResponseForbidden(_error_page('core/403csrf.html'))
 
 
 def server_error(request):
-    return render(request, 'core/500.html', status=500)
+    return HttpResponseServerError(_error_page('core/500.html'))
 
 
 def permission_denied(request, exception):
-    return render(request, 'core/403.html', status=403)
+    return HttpResponseForbidden(_error_page('core/403.html'))
+
+
+@staff_member_required
+def cache_stats(request):
+    """Попадания по уровням кэшей этого процесса."""
+    stats = {
+        alias: caches[alias].stats()
+        for alias in settings.CACHES
+        if hasattr(caches[alias], 'stats')
+    }
+    return JsonResponse(stats)
+
+
+@staff_member_required
+def profile_download(request, pk):
+    """Профиль запроса для pstats, snakeviz и т. п."""
+    record = get_object_or_404(RequestProfile, pk=pk)
+    response = HttpResponse(bytes(record.stats),
+                            content_type='application/octet-stream')
+    response['Content-Disposition'] = (
+        f'attachment; filename="request-{record.pk}.prof"')
+    return response
+
+
+@staff_member_required
+def profile_samples(request):
+    """Стеки, накопленные выборкой в этом процессе, для flamegraph."""
+    if 'reset' in request.GET:
+        sampler.reset()
+    response = HttpResponse(sampler.collapsed(),
+                            content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="samples.txt"'
+    return response
+
+
+def metrics_view(request):
+    """Метрики для Prometheus по заголовку Authorization: Bearer
+    METRICS_TOKEN. Без токена в настройках /metrics выключен."""
+    token = settings.METRICS_TOKEN
+    # Адрес клиента за прокси всегда 127.0.0.1, поэтому нужен секрет
+    if not token or not hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(),
+            f'Bearer {token}'.encode()):
+        raise Http404
+    return HttpResponse(metrics.exposition(),
+                        content_type=metrics.CONTENT_TYPE)
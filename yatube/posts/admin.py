@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Mention, Post, Tag
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,3 +15,5 @@ admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
 admin.site.register(Comment)
 admin.site.register(Follow)
+admin.site.register(Tag)
+admin.site.register(Mention)
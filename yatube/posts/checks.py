@@ -0,0 +1,23 @@
+import sqlite3
+
+from django.core.checks import Error, register
+from django.db import connections
+
+# INSERT ... ON CONFLICT DO UPDATE в posts.ranking
+SQLITE_MIN_VERSION = (3, 24, 0)
+
+
+@register()
+def sqlite_version_check(app_configs, **kwargs):
+    """Версия SQLite, если база — SQLite."""
+    uses_sqlite = any(connections[alias].vendor == 'sqlite'
+                      for alias in connections)
+    if not uses_sqlite or sqlite3.sqlite_version_info >= SQLITE_MIN_VERSION:
+        return []
+    required = '.'.join(map(str, SQLITE_MIN_VERSION))
+    return [Error(
+        f'Нужен SQLite {required} или новее, '
+        f'установлен {sqlite3.sqlite_version}',
+        hint='Обновите библиотеку SQLite, с которой собран Python.',
+        id='posts.E001',
+    )]
@@ -0,0 +1,125 @@
+"""Канал уведомлений о новых постах для Server-Sent Events.
+
+Каждая публикация поста записывается в PostRelease, и канал хранит в
+кэше только номер последнего выпуска. Номера растут в порядке
+публикации, поэтому отложенный пост, выпущенный позже, тоже попадет в
+поток, хотя его id меньше уже опубликованных. Курсоры since и
+Last-Event-ID — номера выпусков.
+
+Долгие потоки событий обслуживает ASGI-приложение yatube.asgi:
+ожидающие клиенты там — корутины, а кэш раз в SSE_POLL_INTERVAL секунд
+проверяет один цикл на процесс. Запросы к БД делаются, только когда
+появились новые посты.
+
+WSGI-представление поток не держит: отвечает сразу, событием, если
+новые посты уже есть, и просит браузер переподключиться через
+SSE_POLL_RETRY. Так /events/posts/ работает и без ASGI-сервера, только
+опросом.
+"""
+import json
+from typing import Iterable, NamedTuple, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.template.loader import render_to_string
+
+from . import follow_graph
+from .models import Post, PostRelease
+from .utils import with_urls
+
+LATEST_KEY = 'events:posts:latest'
+
+
+class Subscription(NamedTuple):
+    """Параметры потока: посты, выпущенные после since, уже отправлено
+    до last_id.
+
+    authors ограничивает ленту подписками, render — прислать и разметку
+    новых постов.
+    """
+    since: int
+    last_id: int
+    authors: Optional[Set[int]]
+    render: bool
+
+
+def _last_release() -> int:
+    return PostRelease.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+
+def latest() -> int:
+    """Номер последнего выпуска поста."""
+    value = cache.get(LATEST_KEY)
+    if value is None:
+        value = _last_release()
+        cache.add(LATEST_KEY, value, None)
+    return value
+
+
+def publish(posts: Iterable[Post]) -> None:
+    """Записывает выпуск опубликованных постов."""
+    posts = list(posts)
+    if len(posts) == 1:
+        current = PostRelease.objects.create(post=posts[0]).id
+    else:
+        # bulk_create в SQLite не возвращает id
+        PostRelease.objects.bulk_create(
+            PostRelease(post=post) for post in posts)
+        current = _last_release()
+    if current > latest():
+        cache.set(LATEST_KEY, current, None)
+
+
+def subscribe(request) -> Optional[Subscription]:
+    """Параметры потока из запроса или None, если они неверны."""
+    try:
+        since = int(request.GET.get('since', 0))
+        last_id = int(request.META.get('HTTP_LAST_EVENT_ID') or since)
+    except ValueError:
+        return None
+
+    authors = None
+    if request.GET.get('feed') == 'follow':
+        if not request.user.is_authenticated:
+            return None
+        authors = follow_graph.following(request.user.id)
+    return Subscription(since, last_id, authors,
+                        bool(request.GET.get('render')))
+
+
+def _event(name: str, event_id: int, data: dict) -> str:
+    return (f'event: {name}\nid: {event_id}\n'
+            f'data: {json.dumps(data, ensure_ascii=False)}\n\n')
+
+
+def posts_event(request, subscription: Subscription,
+                current: int) -> str:
+    """Событие о постах, выпущенных после subscription.since, current —
+    его id."""
+    # Подзапрос, а не соединение: пост, выпущенный повторно, не
+    # посчитается дважды
+    new_posts = Post.objects.published().filter(
+        id__in=PostRelease.objects.filter(
+            id__gt=subscription.since).values('post_id'))
+    if subscription.authors is not None:
+        new_posts = new_posts.filter(author__in=subscription.authors)
+    data = {'count': new_posts.count()}
+    if subscription.render and data['count']:
+        posts = with_urls(new_posts.select_related('author', 'group')[
+            :settings.POSTS_ON_PAGE])
+        data['html'] = [
+            render_to_string('posts/includes/post.html', {'post': post},
+                             request)
+            for post in posts
+        ]
+    return _event('posts', current, data)
+
+
+def poll(request, subscription: Subscription) -> str:
+    """Ответ без ожидания: событие, если посты новее last_id уже есть."""
+    body = f'retry: {settings.SSE_POLL_RETRY}\n\n'
+    current = latest()
+    if current > subscription.last_id:
+        body += posts_event(request, subscription, current)
+    return body
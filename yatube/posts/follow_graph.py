@@ -0,0 +1,112 @@
+"""Граф подписок в кэше.
+
+Для каждого пользователя в кэше хранятся два множества id: на кого он
+подписан (following) и кто подписан на него (followers). Множества
+загружаются из БД при первом обращении и сбрасываются при изменении
+подписок (сигналы модели Follow и posts.follows), так что проверка
+подписки, список авторов и число подписчиков обычно не требуют запросов
+к БД.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow
+
+FOLLOWING_KEY = 'follow_graph:following:{}'
+FOLLOWERS_KEY = 'follow_graph:followers:{}'
+
+
+def _load(key_template: str, field: str, other: str,
+          user_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    """Достает множества из кэша, недостающие догружает одним запросом."""
+    user_ids = list(user_ids)
+    keys = {key_template.format(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys)
+    result = {keys[key]: value for key, value in cached.items()}
+
+    missing = [user_id for user_id in user_ids if user_id not in result]
+    if missing:
+        loaded = {user_id: set() for user_id in missing}
+        rows = Follow.objects.filter(
+            **{f'{field}__in': missing}
+        ).values_list(field, other)
+        for user_id, other_id in rows:
+            loaded[user_id].add(other_id)
+        cache.set_many(
+            {key_template.format(user_id): ids
+             for user_id, ids in loaded.items()},
+            settings.FOLLOW_GRAPH_TIMEOUT
+        )
+        result.update(loaded)
+
+    return result
+
+
+def following_many(user_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    return _load(FOLLOWING_KEY, 'user_id', 'author_id', user_ids)
+
+
+def followers_many(user_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    return _load(FOLLOWERS_KEY, 'author_id', 'user_id', user_ids)
+
+
+def following(user_id: int) -> Set[int]:
+    """Id авторов, на которых подписан пользователь."""
+    return following_many([user_id])[user_id]
+
+
+def followers(user_id: int) -> Set[int]:
+    """Id подписчиков автора."""
+    return followers_many([user_id])[user_id]
+
+
+def is_following(user_id: int, author_id: int) -> bool:
+    return author_id in following(user_id)
+
+
+def follower_count(author_id: int) -> int:
+    return len(followers(author_id))
+
+
+def invalidate(user_id: int, author_ids: Iterable[int]) -> None:
+    """Сбрасывает множества подписчика и авторов после записи в БД.
+
+    Множества не правятся на месте: чтение и запись множества — две
+    операции кэша, и два процесса, меняющие его одновременно, теряли бы
+    изменения друг друга.
+    """
+    cache.delete_many([FOLLOWING_KEY.format(user_id)] + [
+        FOLLOWERS_KEY.format(author_id) for author_id in author_ids])
+
+
+def suggestions(user_id: int, limit: int = 5) -> List[int]:
+    """Авторы, на которых подписаны авторы пользователя.
+
+    Кандидаты ранжируются по числу путей длины два, при равенстве —
+    по числу подписчиков.
+    """
+    followed = following(user_id)
+    if not followed:
+        return []
+
+    overlap = Counter()
+    for authors in following_many(followed).values():
+        overlap.update(authors)
+    for author_id in followed | {user_id}:
+        overlap.pop(author_id, None)
+    if not overlap:
+        return []
+
+    counts = {
+        author_id: len(ids)
+        for author_id, ids in followers_many(overlap).items()
+    }
+    ranked = sorted(
+        overlap,
+        key=lambda author_id: (-overlap[author_id], -counts[author_id],
+                               author_id)
+    )
+    return ranked[:limit]
@@ -0,0 +1,82 @@
+"""Подписка и отписка одним запросом.
+
+follow() вставляет пары одним INSERT с игнорированием конфликтов:
+повторы отсекает ограничение unique_follow, без блокировок и выборки
+существующих подписок. Новыми считаются столько пар, сколько строк
+вставил INSERT; если вставлены не все, это пары с наибольшими id.
+unfollow() удаляет подписки одним DELETE.
+
+Экземпляры Follow при этом не сохраняются и не удаляются по одному,
+сигналы post_save и post_delete не отправляются, поэтому граф подписок,
+рейтинг и кэш страниц обновляются здесь.
+"""
+from typing import Iterable, List
+
+from django.db import connections, router
+from django.db.models import sql
+
+from . import follow_graph, page_cache, ranking
+from .models import Follow
+
+
+def _purge(author_ids: List[int]) -> None:
+    # На странице автора показано число подписчиков
+    page_cache.purge(*(f'author-{author_id}' for author_id in author_ids))
+
+
+def _insert(follows: List[Follow]) -> int:
+    """bulk_create(ignore_conflicts=True), который возвращает число
+    вставленных строк."""
+    using = router.db_for_write(Follow)
+    connection = connections[using]
+    fields = [Follow._meta.get_field('user'),
+              Follow._meta.get_field('author')]
+    size = connection.ops.bulk_batch_size(fields, follows) or len(follows)
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(follows), size):
+            query = sql.InsertQuery(Follow, ignore_conflicts=True)
+            query.insert_values(fields, follows[start:start + size])
+            for statement, params in query.get_compiler(using).as_sql():
+                cursor.execute(statement, params)
+                inserted += cursor.rowcount
+    return inserted
+
+
+def follow(user_id: int, author_ids: Iterable[int]) -> List[int]:
+    """Подписывает на авторов, возвращает id новых подписок."""
+    author_ids = [author_id for author_id in dict.fromkeys(author_ids)
+                  if author_id != user_id]
+    if not author_ids:
+        return []
+    inserted = _insert([Follow(user_id=user_id, author_id=author_id)
+                        for author_id in author_ids])
+    if inserted == len(author_ids):
+        created = author_ids
+    elif inserted:
+        new = set(Follow.objects.filter(
+            user_id=user_id, author_id__in=author_ids
+        ).order_by('-id').values_list('author_id', flat=True)[:inserted])
+        created = [author_id for author_id in author_ids if author_id in new]
+    else:
+        created = []
+    if created:
+        follow_graph.invalidate(user_id, created)
+        ranking.record_follows(created)
+        _purge(created)
+    return created
+
+
+def unfollow(user_id: int, author_ids: Iterable[int]) -> int:
+    """Отписывает от авторов, возвращает число удаленных подписок."""
+    author_ids = list(dict.fromkeys(author_ids))
+    if not author_ids:
+        return 0
+    # QuerySet.delete() выбрал бы строки и отправил post_delete на каждую:
+    # до FOLLOW_BULK_LIMIT обновлений кэша вместо одного
+    follows = Follow.objects.filter(user_id=user_id, author_id__in=author_ids)
+    deleted = follows._raw_delete(follows.db)
+    if deleted:
+        follow_graph.invalidate(user_id, author_ids)
+        _purge(author_ids)
+    return deleted
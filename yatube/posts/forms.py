@@ -1,4 +1,6 @@
 from django import forms
+from django.conf import settings
+from django.utils import timezone
 
 from .models import Comment, Post
 
@@ -41,3 +43,50 @@ class PostForm(forms.ModelForm):
                 'required': 'поле должно быть заполнено',
             }
         }
+
+
+class FollowBulkForm(forms.Form):
+    usernames = forms.CharField(
+        label='Авторы',
+        help_text='Имена пользователей через пробел, запятую или с новой '
+                  'строки',
+        widget=forms.Textarea
+    )
+    unfollow = forms.BooleanField(label='Отписаться', required=False)
+
+    def clean_usernames(self):
+        usernames = list(dict.fromkeys(
+            self.cleaned_data['usernames'].replace(',', ' ').split()))
+        if len(usernames) > settings.FOLLOW_BULK_LIMIT:
+            raise forms.ValidationError(
+                f'не больше {settings.FOLLOW_BULK_LIMIT} авторов за раз')
+        return usernames
+
+
+class PublicationForm(forms.Form):
+    """Когда публиковать пост: сразу, в заданное время или не сейчас.
+
+    Отдельно от PostForm: у поста, который уже опубликован, этих полей
+    нет.
+    """
+    draft = forms.BooleanField(
+        label='Сохранить черновик',
+        help_text='Пост увидите только вы',
+        required=False
+    )
+    publish_at = forms.DateTimeField(
+        label='Опубликовать в',
+        help_text='Оставьте пустым, чтобы опубликовать сразу',
+        required=False,
+        input_formats=['%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M'],
+        widget=forms.DateTimeInput(attrs={'type': 'datetime-local'},
+                                   format='%Y-%m-%dT%H:%M')
+    )
+
+    def status(self) -> int:
+        if self.cleaned_data['draft']:
+            return Post.DRAFT
+        publish_at = self.cleaned_data['publish_at']
+        if publish_at is not None and publish_at > timezone.now():
+            return Post.SCHEDULED
+        return Post.PUBLISHED
@@ -0,0 +1,32 @@
+"""Общие заготовки для команд-бенчмарков."""
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from posts.models import Group, Post, make_preview
+
+User = get_user_model()
+
+
+def make_posts(count):
+    """Несохраненные посты: замеры отрисовки не зависят от БД."""
+    group = Group(id=1, title='Группа', slug='group', description='Описание')
+    posts = []
+    for i in range(1, count + 1):
+        author = User(id=i, username=f'author{i}', first_name='Имя')
+        post = Post(
+            id=i,
+            text='Текст поста ' * 20,
+            author=author,
+            group=group if i % 2 else None,
+            pub_date=timezone.now(),
+        )
+        post.preview, post.has_more = make_preview(post.text)
+        posts.append(post)
+    return posts
+
+
+def best_time(func, number):
+    """Лучшее из трех время одного вызова func, в секундах."""
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
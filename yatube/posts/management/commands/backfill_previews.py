@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from posts import repository
+from posts.models import Post, make_preview
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает начало текста постов для лент (Post.preview). '
+            'Нужно после смены POST_PREVIEW_LENGTH или '
+            'POST_PREVIEW_PARAGRAPHS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(Post.objects.filter(id__gt=last_id).order_by(
+                'id').only('id', 'text', 'preview', 'has_more')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            changed = []
+            for post in batch:
+                preview = make_preview(post.text)
+                if (post.preview, post.has_more) != preview:
+                    post.preview, post.has_more = preview
+                    changed.append(post)
+            if changed:
+                # bulk_update не шлет сигналов, кэш сбрасываем сами
+                Post.objects.bulk_update(changed, ['preview', 'has_more'])
+                repository.posts.invalidate_ids(
+                    [post.id for post in changed])
+                updated += len(changed)
+
+        self.stdout.write(f'Обновлено постов: {updated}')
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template import engines
+from django.template.backends.jinja2 import Jinja2
+from django.test import RequestFactory
+
+from posts.management.bench import best_time, make_posts
+from posts.utils import with_urls
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает Django и Jinja2 на шаблонах лент.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=100)
+
+    def contexts(self, posts):
+        page_obj = Paginator(with_urls(posts), len(posts) or 1).page(1)
+        author = SimpleNamespace(
+            username=posts[0].author.username,
+            get_full_name=posts[0].author.get_full_name,
+        )
+        return {
+            'index': ('posts/index.html', {
+                'index': True, 'page_obj': page_obj}),
+            'group_list': ('posts/group_list.html', {
+                'group': posts[0].group, 'page_obj': page_obj}),
+            'profile': ('posts/profile.html', {
+                'author': author, 'page_obj': page_obj,
+                'following': False, 'post_count': len(posts),
+                'follower_count': 0}),
+            'follow_index': ('posts/follow.html', {
+                'follow': True, 'page_obj': page_obj,
+                'suggested_authors': [author]}),
+        }
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = User(id=1, username='reader')
+        posts = make_posts(options['posts'])
+        backends = {
+            'django': engines['django'],
+            'jinja2': Jinja2({
+                key: value for key, value in settings.JINJA2_TEMPLATES.items()
+                if key != 'BACKEND'
+            }),
+        }
+
+        self.stdout.write(f'{"":<14}{"django":>10}{"jinja2":>10}  мс/стр.')
+        for view, (name, context) in self.contexts(posts).items():
+            results = []
+            for backend in backends.values():
+                template = backend.get_template(name)
+
+                def render():
+                    # Фрагменты {% cache %} не должны подменять отрисовку
+                    cache.clear()
+                    template.render(context, request)
+
+                results.append(best_time(render, options['repeat']) * 1e3)
+            self.stdout.write(
+                f'{view:<14}' + ''.join(f'{ms:>10.2f}' for ms in results))
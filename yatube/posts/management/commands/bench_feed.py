@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils import timezone
+
+from posts.feed import FollowFeed
+from posts.management.bench import best_time
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ленту подписок слиянием потоков с запросом '
+            'author__in. Данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, nargs='+',
+                            default=[10, 1000, 10000])
+        parser.add_argument('--posts-per-author', type=int, default=5)
+        parser.add_argument('--page', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def make_authors(self, count, posts_per_author):
+        start = User.objects.count()
+        User.objects.bulk_create(
+            User(username=f'bench-feed-{start + i}') for i in range(count))
+        author_ids = list(User.objects.order_by('-id').values_list(
+            'id', flat=True)[:count])
+        now = timezone.now()
+        Post.objects.bulk_create(
+            (Post(author_id=author_id, text='Пост',
+                  pub_date=now - timedelta(minutes=i * count + n))
+             for n, author_id in enumerate(author_ids)
+             for i in range(posts_per_author)),
+            batch_size=500,
+        )
+        return author_ids
+
+    def render_page(self, post_list, page):
+        page_obj = Paginator(post_list, settings.POSTS_ON_PAGE).page(page)
+        return [post.id for post in page_obj]
+
+    def handle(self, *args, **options):
+        page = options['page']
+        repeat = options['repeat']
+        self.stdout.write(
+            f'{"авторов":>8}{"запрос":>10}{"слияние":>10}'
+            f'{"холодное":>10}  мс/стр., страница {page}')
+        for count in options['authors']:
+            with transaction.atomic():
+                author_ids = self.make_authors(
+                    count, options['posts_per_author'])
+
+                def query():
+                    return self.render_page(
+                        Post.objects.select_related('author', 'group')
+                        .filter(author__in=author_ids), page)
+
+                def merge():
+                    return self.render_page(FollowFeed(author_ids), page)
+
+                def merge_cold():
+                    cache.clear()
+                    return merge()
+
+                assert query() == merge_cold(), 'ленты не совпадают'
+                results = [best_time(func, repeat) * 1e3
+                           for func in (query, merge, merge_cold)]
+                transaction.set_rollback(True)
+            cache.clear()
+            self.stdout.write(
+                f'{count:>8}' + ''.join(f'{ms:>10.2f}' for ms in results))
@@ -0,0 +1,85 @@
+import random
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import revisions
+from posts.management.bench import best_time
+from posts.models import Post, PostRevision
+
+User = get_user_model()
+
+WORDS = ('пост', 'текст', 'правка', 'группа', 'лента', 'автор', 'снимок',
+         'версия', 'запрос', 'кэш', 'индекс', 'страница')
+
+
+class Command(BaseCommand):
+    help = ('Правит пост много раз и печатает, сколько байт занимает '
+            'одна правка в истории и сколько стоит восстановить версию. '
+            'Данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edits', type=int, default=100)
+        parser.add_argument('--words', type=int, default=300,
+                            help='Слов в тексте поста')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    @staticmethod
+    def edit(rnd, words):
+        """Правка как у живого автора: слово заменено, дописано или убрано."""
+        position = rnd.randrange(len(words))
+        action = rnd.random()
+        if action < 0.6:
+            words[position] = rnd.choice(WORDS)
+        elif action < 0.85:
+            words.insert(position, rnd.choice(WORDS))
+        elif len(words) > 1:
+            del words[position]
+
+    def handle(self, *args, **options):
+        rnd = random.Random(0)
+        words = [rnd.choice(WORDS) for _ in range(options['words'])]
+        interval = settings.REVISION_SNAPSHOT_INTERVAL
+        with transaction.atomic():
+            author = User.objects.create(username='bench-revisions')
+            post = Post.objects.create(author=author, text=' '.join(words))
+            text_bytes = 0
+            for _ in range(options['edits']):
+                self.edit(rnd, words)
+                post.text = ' '.join(words)
+                post.save(update_fields=['text'])
+                text_bytes += len(post.text.encode())
+
+            rows = list(PostRevision.objects.filter(post=post).order_by(
+                'number')[1:])
+            deltas = [len(row.data) for row in rows if not row.snapshot]
+            snapshots = [len(row.data) for row in rows if row.snapshot]
+            stored = sum(deltas) + sum(snapshots)
+            self.stdout.write(
+                f'правок: {len(rows)}, снимков среди них: {len(snapshots)}\n'
+                f'текст целиком: {text_bytes / len(rows):.0f} Б на правку\n'
+                f'история:       {stored / len(rows):.0f} Б на правку '
+                f'(разница {sum(deltas) / len(deltas):.0f} Б, '
+                f'снимок {sum(snapshots) / max(len(snapshots), 1):.0f} Б)')
+
+            last = rows[-1].number
+            # Дороже всех версии прямо перед очередным снимком
+            worst = min(interval, last)
+            numbers = range(1, last + 1)
+            timings = {
+                'снимок': best_time(
+                    lambda: revisions.text(post.id, 1), options['repeat']),
+                'худшая': best_time(
+                    lambda: revisions.text(post.id, worst),
+                    options['repeat']),
+                'средняя': sum(
+                    best_time(lambda: revisions.text(post.id, number),
+                              options['repeat'])
+                    for number in numbers) / len(numbers),
+            }
+            transaction.set_rollback(True)
+        for name, seconds in timings.items():
+            self.stdout.write(
+                f'восстановление, {name}: {seconds * 1e3:.2f} мс')
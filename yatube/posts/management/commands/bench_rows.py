@@ -0,0 +1,67 @@
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.management.bench import best_time
+from posts.models import Group, Post
+from posts.rows import feed_rows
+from posts.utils import with_urls
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает выборку страницы ленты моделями и строками '
+            'posts.rows: время и пик памяти. Данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, nargs='+',
+                            default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def make_posts(self, count):
+        User.objects.bulk_create(
+            User(username=f'bench-rows-{i}', first_name='Имя',
+                 password='!' * 80)
+            for i in range(10))
+        # SQLite не возвращает id из bulk_create
+        authors = list(User.objects.filter(username__startswith='bench-rows-'))
+        group = Group.objects.create(
+            title='Группа', slug='bench-rows', description='Описание ' * 50)
+        Post.objects.bulk_create(
+            Post(author=authors[i % 10], group=group if i % 2 else None,
+                 text='Текст поста ' * 20)
+            for i in range(count))
+
+    @staticmethod
+    def peak_memory(func):
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"постов":>8}{"модели":>10}{"строки":>10}  мс'
+                          f'{"модели":>10}{"строки":>10}  КБ')
+        for count in options['posts']:
+            with transaction.atomic():
+                self.make_posts(count)
+
+                def models():
+                    return list(with_urls(Post.objects.select_related(
+                        'author', 'group')[:count]))
+
+                def rows():
+                    return list(feed_rows(Post.objects.all())[:count])
+
+                times = [best_time(func, options['repeat']) * 1e3
+                         for func in (models, rows)]
+                memory = [self.peak_memory(func) / 1024
+                          for func in (models, rows)]
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f'{count:>8}' + ''.join(f'{ms:>10.2f}' for ms in times)
+                + '    ' + ''.join(f'{kb:>10.0f}' for kb in memory))
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.test import RequestFactory
+
+from posts.management.bench import best_time, make_posts
+from posts.utils import with_urls
+
+# Прежняя схема: отдельный include на каждый пост, {% url %} и проверки
+# request.path внутри партиала.
+LEGACY_POST = """{% load thumbnail %}
+<article>
+  <ul>
+    {% if request.path == '/' or '/group' or '/follow' in request.path %}
+      <li>
+        Автор: {{ post.author.get_full_name }}
+        <a href="{% url 'posts:profile' post.author.username %}">
+          Все посты пользователя
+        </a>
+      </li>
+    {% endif %}
+    {% if post.group and '/group' not in request.path %}
+      <li>
+        Группа: {{ post.group }}
+      </li>
+    {% endif %}
+    <li>
+      Дата публикации: {{ post.pub_date|date:"d E Y" }}
+    </li>
+  </ul>
+  {% thumbnail post.image "960x339" crop="center" upscale=True as im %}
+    <img class="card-img my-2" src="{{ im.url }}">
+  {% endthumbnail %}
+  <p>{{ post.text }}</p>
+  <a href="{% url 'posts:post_detail' post.pk %}">подробная информация</a>
+</article>
+{% if post.group %}<a href="{% url 'posts:group_list' post.group.slug %}">\
+все записи группы</a>{% endif %}"""
+
+POST_LIST = """{% for post in page_obj %}
+  {% include post_template %}
+  {% if not forloop.last %}<hr>{% endif %}
+{% endfor %}"""
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает стоимость отрисовки поста в ленте до и после.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        engine = engines['django']
+        request = RequestFactory().get('/')
+        posts = make_posts(options['posts'])
+
+        post_list = engine.from_string(POST_LIST)
+        legacy_post = engine.from_string(LEGACY_POST).template
+        current_post = engine.get_template(
+            'posts/includes/post.html').template
+
+        def render_legacy():
+            post_list.render(
+                {'page_obj': posts, 'post_template': legacy_post}, request)
+
+        def render_current():
+            post_list.render(
+                {'page_obj': with_urls(posts), 'post_template': current_post},
+                request)
+
+        for name, func in (('include + url', render_legacy),
+                           ('ReverseMap', render_current)):
+            per_post = best_time(func, options['repeat']) / len(posts) * 1e6
+            self.stdout.write(f'{name:<16} {per_post:8.1f} мкс/пост')
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import follows
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Подписывает пользователя на авторов или отписывает от них '
+            'одним запросом. Имена авторов берутся из аргументов или из '
+            'файла, по одному на строку.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('authors', nargs='*')
+        parser.add_argument('--file', help='файл с именами, - для stdin')
+        parser.add_argument('--unfollow', action='store_true')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f'Нет пользователя {options["username"]}')
+
+        usernames = list(options['authors'])
+        if options['file']:
+            if options['file'] == '-':
+                usernames.extend(sys.stdin.read().split())
+            else:
+                with open(options['file']) as file:
+                    usernames.extend(file.read().split())
+        usernames = list(dict.fromkeys(usernames))
+
+        author_ids = list(User.objects.filter(
+            username__in=usernames).values_list('id', flat=True))
+        if options['unfollow']:
+            changed = follows.unfollow(user.id, author_ids)
+            self.stdout.write(f'Удалено подписок: {changed}')
+        else:
+            changed = len(follows.follow(user.id, author_ids))
+            self.stdout.write(f'Новых подписок: {changed}')
+        missing = len(usernames) - len(author_ids)
+        if missing:
+            self.stdout.write(f'Не найдено авторов: {missing}')
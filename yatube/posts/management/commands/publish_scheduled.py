@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import publishing
+
+
+class Command(BaseCommand):
+    help = ('Публикует запланированные посты, время которых наступило. '
+            'Без --once работает постоянно и проверяет очередь раз в '
+            'PUBLISH_POLL_INTERVAL секунд.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выпустить созревшие посты и выйти.')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        if not settings.CACHE_TIERED:
+            self.stderr.write(
+                'Кэш в памяти процесса (CACHE_TIERED=False): сайт не '
+                'узнает о выпущенных постах, пока не истекут его кэши')
+        if options['once']:
+            released = publishing.release_due(
+                batch_size=options['batch_size'])
+            self.stdout.write(f'Опубликовано постов: {released}')
+            return
+
+        self.stdout.write('Планировщик публикаций запущен')
+        try:
+            while True:
+                released = publishing.release_due(
+                    batch_size=options['batch_size'])
+                if released:
+                    self.stdout.write(f'Опубликовано постов: {released}')
+                time.sleep(settings.PUBLISH_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
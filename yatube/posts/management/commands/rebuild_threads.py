@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import page_cache, threads
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Заново вычисляет пути комментариев в ветках и счетчики '
+            'ответов пачками постов. Нужно после загрузки комментариев '
+            'в обход save(), например bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Постов в пачке')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        comments = 0
+        while True:
+            post_ids = list(Post.objects.filter(id__gt=last_id).order_by(
+                'id').values_list('id', flat=True)[:batch_size])
+            if not post_ids:
+                break
+            last_id = post_ids[-1]
+            comments += threads.rebuild(Comment.objects.filter(
+                post_id__in=post_ids).only('id', 'parent_id'))
+            page_cache.purge(*(f'comments-{post_id}' for post_id in post_ids))
+
+        self.stdout.write(f'Комментариев: {comments}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает индекс хэштегов постов пачками по id. Нужно '
+            'после миграции и после изменения правил разбора тегов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        posts = 0
+        entries = 0
+        while True:
+            batch = list(Post.objects.filter(id__gt=last_id).order_by(
+                'id').only('id', 'text', 'pub_date')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            entries += tags.index(batch)
+            posts += len(batch)
+
+        self.stdout.write(f'Постов: {posts}, записей индекса: {entries}')
@@ -0,0 +1,92 @@
+"""Упоминания @имя в постах и комментариях.
+
+Упоминания разбираются один раз, при сохранении текста: все имена
+текста находятся одним запросом username__in, найденные пользователи
+записываются в таблицу Mention. При отрисовке пользователей не ищут:
+ссылку на профиль (фильтр linkify) получают только имена, найденные в
+Mention для поста и комментариев к нему (usernames).
+
+Таблица Mention — входящие упоминания пользователя. Страница читается
+по ключу (created, id) индексом mention_inbox, как лента тега. При
+правке текста добавляются только новые упоминания, и повторно
+пользователь о том же упоминании не узнает.
+"""
+from typing import Dict, Iterable, Optional, Set
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Comment, Mention, Post, User, extract_mentions
+from .utils import KeysetPage, decode_cursor, encode_cursor
+
+
+def resolve(usernames: Iterable[str]) -> Dict[str, int]:
+    """id пользователей по именам, одним запросом."""
+    usernames = list(usernames)
+    if not usernames:
+        return {}
+    return dict(User.objects.filter(
+        username__in=usernames).values_list('username', 'id'))
+
+
+def record(author_id: int, post_id: int, text: str,
+           comment_id: Optional[int] = None, fresh: bool = False) -> None:
+    """Обновляет упоминания в тексте поста или комментария.
+
+    fresh — текст только что создан и упоминаний у него еще нет.
+    """
+    user_ids = set(resolve(extract_mentions(text)).values())
+    user_ids.discard(author_id)
+    if fresh and not user_ids:
+        return
+
+    mentions = Mention.objects.filter(post_id=post_id, comment_id=comment_id)
+    with transaction.atomic():
+        known = set()
+        if not fresh:
+            known = set(mentions.values_list('user_id', flat=True))
+            if known - user_ids:
+                mentions.filter(user_id__in=known - user_ids).delete()
+        Mention.objects.bulk_create(
+            Mention(user_id=user_id, author_id=author_id, post_id=post_id,
+                    comment_id=comment_id)
+            for user_id in user_ids - known
+        )
+
+
+def record_post(post: Post, fresh: bool = False) -> None:
+    record(post.author_id, post.id, post.text, fresh=fresh)
+
+
+def record_comment(comment: Comment, fresh: bool = False) -> None:
+    record(comment.author_id, comment.post_id, comment.text, comment.id,
+           fresh=fresh)
+
+
+def usernames(post_id: int) -> Set[str]:
+    """Имена пользователей, упомянутых в посте и комментариях к нему."""
+    return set(Mention.objects.filter(post_id=post_id).values_list(
+        'user__username', flat=True))
+
+
+def inbox(user_id: int, cursor: Optional[str] = None,
+          size: Optional[int] = None) -> KeysetPage:
+    """Упоминания пользователя от новых к старым после курсора."""
+    size = size or settings.POSTS_ON_PAGE
+    mentions = Mention.objects.filter(user_id=user_id)
+    after = decode_cursor(cursor)
+    if after is not None:
+        created, mention_id = after
+        mentions = mentions.filter(
+            Q(created__lt=created) | Q(created=created, id__lt=mention_id))
+    mentions = list(mentions.select_related(
+        'author', 'post', 'comment'
+    ).order_by('-created', '-id')[:size + 1])
+
+    next_cursor = None
+    if len(mentions) > size:
+        mentions = mentions[:size]
+        last = mentions[-1]
+        next_cursor = encode_cursor((last.created, last.id))
+    return KeysetPage(mentions, next_cursor, after is None)
@@ -0,0 +1,15 @@
+from . import repository
+
+
+class IdentityMapMiddleware:
+    """Карта идентичности repository на время одного запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        repository.begin()
+        try:
+            return self.get_response(request)
+        finally:
+            repository.end()
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:47
+
+from django.db import migrations, models
+
+from posts.models import make_preview
+
+BATCH_SIZE = 500
+
+
+def fill_previews(apps, schema_editor):
+    # Без этого ленты показывали бы пустое начало у всех старых постов
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.order_by('id').only('id', 'text')
+    last_id = 0
+    while True:
+        batch = list(posts.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for post in batch:
+            post.preview, post.has_more = make_preview(post.text)
+        Post.objects.bulk_update(batch, ['preview', 'has_more'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='has_more',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Текст длиннее начала'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='preview',
+            field=models.TextField(blank=True, editable=False, verbose_name='Начало текста'),
+        ),
+        migrations.RunPython(fill_previews, migrations.RunPython.noop),
+    ]
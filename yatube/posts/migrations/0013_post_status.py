@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_mention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='publish_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время публикации'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Черновик'), (2, 'Запланирован'), (3, 'Опубликован')], default=3, verbose_name='Статус'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-pub_date', '-id'], name='post_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'status', '-pub_date', '-id'], name='post_author_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'status', '-pub_date', '-id'], name='post_group_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'publish_at'], name='post_schedule'),
+        ),
+    ]
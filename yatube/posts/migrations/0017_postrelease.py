@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.core.management.color import no_style
+
+# Post.PUBLISHED
+PUBLISHED = 3
+
+
+def release_published(apps, schema_editor):
+    # Номер выпуска уже опубликованного поста — его id: курсоры since,
+    # выданные до миграции, остаются верными
+    Post = apps.get_model('posts', 'Post')
+    PostRelease = apps.get_model('posts', 'PostRelease')
+    post_ids = Post.objects.filter(status=PUBLISHED).order_by(
+        'id').values_list('id', flat=True)
+    PostRelease.objects.bulk_create(
+        (PostRelease(id=post_id, post_id=post_id)
+         for post_id in post_ids.iterator()),
+        batch_size=500)
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+                no_style(), [PostRelease]):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_trendingscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRelease',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='releases', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Выпуск поста',
+                'verbose_name_plural': 'Выпуски постов',
+            },
+        ),
+        migrations.RunPython(release_published, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,37 @@
+import re
+from typing import List, Tuple
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 
 User = get_user_model()
 
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+TAG_MAX_LENGTH = 64
+# #тег: буквы, цифры и подчеркивание, не в середине слова
+HASHTAG = re.compile(rf'(?<![\w#&])#(\w{{1,{TAG_MAX_LENGTH}}})(?!\w)')
+# @имя: символы имени пользователя Django, в конце — не точка и не дефис
+MENTION = re.compile(r'(?<![\w@.+-])@([\w.+-]*[\w+])')
+
+
+def make_preview(text: str) -> Tuple[str, bool]:
+    """Начало текста для лент и признак, что текст длиннее.
+
+    Берется не больше POST_PREVIEW_PARAGRAPHS абзацев и
+    POST_PREVIEW_LENGTH символов, обрезка идет по границе слова.
+    """
+    text = text.strip()
+    paragraphs = PARAGRAPH_BREAK.split(text)
+    preview = '\n\n'.join(paragraphs[:settings.POST_PREVIEW_PARAGRAPHS])
+    if len(preview) > settings.POST_PREVIEW_LENGTH:
+        preview = preview[:settings.POST_PREVIEW_LENGTH]
+        head, space, _ = preview.rpartition(' ')
+        if space:
+            preview = head
+        preview = preview.rstrip() + '…'
+    return preview, preview != text
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -26,6 +55,16 @@ class Follow(models.Model):
         ]
 
 
+def extract_tags(text: str) -> List[str]:
+    """Хэштеги текста в нижнем регистре, без повторов."""
+    return list(dict.fromkeys(tag.lower() for tag in HASHTAG.findall(text)))
+
+
+def extract_mentions(text: str) -> List[str]:
+    """Имена упомянутых пользователей без повторов."""
+    return list(dict.fromkeys(MENTION.findall(text)))
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
@@ -35,7 +74,25 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    def published(self):
+        return self.filter(status=Post.PUBLISHED)
+
+    def unpublished(self):
+        return self.exclude(status=Post.PUBLISHED)
+
+
 class Post(models.Model):
+    DRAFT = 1
+    SCHEDULED = 2
+    PUBLISHED = 3
+    STATUS_CHOICES = (
+        (DRAFT, 'Черновик'),
+        (SCHEDULED, 'Запланирован'),
+        (PUBLISHED, 'Опубликован'),
+    )
+
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -59,20 +116,113 @@ class Post(models.Model):
         verbose_name='Группа',
         help_text='Выберите группу'
     )
+    # Пока пост не опубликован, pub_date — время создания, при выпуске
+    # ее заменяет publish_at
+    status = models.PositiveSmallIntegerField(
+        'Статус',
+        choices=STATUS_CHOICES,
+        default=PUBLISHED
+    )
+    publish_at = models.DateTimeField(
+        'Время публикации',
+        blank=True,
+        null=True
+    )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
+    views = models.PositiveIntegerField(
+        'Просмотры',
+        default=0,
+        editable=False
+    )
+    # Ленты показывают только начало поста, см. make_preview
+    preview = models.TextField(
+        'Начало текста',
+        blank=True,
+        editable=False
+    )
+    has_more = models.BooleanField(
+        'Текст длиннее начала',
+        default=False,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        # status идет в индексы лент до pub_date: выборка опубликованных
+        # постов по порядку ленты читает индекс без сортировки
+        indexes = [
+            models.Index(fields=['status', '-pub_date', '-id'],
+                         name='post_feed'),
+            models.Index(fields=['author', 'status', '-pub_date', '-id'],
+                         name='post_author_feed'),
+            models.Index(fields=['group', 'status', '-pub_date', '-id'],
+                         name='post_group_feed'),
+            models.Index(fields=['status', 'publish_at'],
+                         name='post_schedule'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def is_published(self) -> bool:
+        return self.status == self.PUBLISHED
+
+    def save(self, *args, **kwargs):
+        self.preview, self.has_more = make_preview(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'preview', 'has_more'}
+        super().save(*args, **kwargs)
+
+
+class Tag(models.Model):
+    name = models.CharField('Тег', max_length=TAG_MAX_LENGTH, unique=True)
+
+    class Meta:
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Запись обратного индекса: пост с тегом.
+
+    Дата поста повторена здесь, чтобы лента тега читалась из одного
+    индекса (tag, pub_date, post) без соединения с постами.
+    """
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tag_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'tag'],
+                                    name='unique_post_tag')
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-pub_date', '-post'],
+                         name='post_tag_feed')
+        ]
+
 
 class Comment(models.Model):
     text = models.TextField(
@@ -94,11 +244,141 @@ class Comment(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies',
+        verbose_name='Ответ на'
+    )
+    # Путь в дереве обсуждения, см. posts.threads
+    path = models.CharField(max_length=255, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    ordinal = models.PositiveIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField('Ответов', default=0,
+                                              editable=False)
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['post', 'path'], name='comment_thread')
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
     def __str__(self):
         return self.text[:15]
+
+
+class Mention(models.Model):
+    """Упоминание пользователя в посте или в комментарии к нему."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Упомянутый'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        blank=True,
+        null=True
+    )
+    created = models.DateTimeField(
+        'Дата упоминания',
+        auto_now_add=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created', '-id'],
+                         name='mention_inbox')
+        ]
+        verbose_name = 'Упоминание'
+        verbose_name_plural = 'Упоминания'
+
+
+class PostRevision(models.Model):
+    """Версия текста поста, см. posts.revisions.
+
+    data — сжатый zlib текст целиком (snapshot) или разница с
+    предыдущей версией.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='revisions'
+    )
+    number = models.PositiveIntegerField('Номер версии')
+    snapshot = models.BooleanField('Текст целиком')
+    data = models.BinaryField()
+    length = models.PositiveIntegerField('Длина текста')
+    created = models.DateTimeField(
+        'Дата правки',
+        auto_now_add=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'number'],
+                                    name='unique_post_revision')
+        ]
+        verbose_name = 'Версия поста'
+        verbose_name_plural = 'Версии постов'
+
+
+class TrendingScore(models.Model):
+    """Оценка поста или группы в рейтинге популярного, см. posts.ranking."""
+    POST = 'post'
+    GROUP = 'group'
+    KINDS = (
+        (POST, 'Пост'),
+        (GROUP, 'Группа'),
+    )
+
+    kind = models.CharField('Рейтинг', max_length=5, choices=KINDS)
+    item_id = models.PositiveIntegerField('Id поста или группы')
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'item_id'],
+                                    name='unique_trending_item')
+        ]
+        indexes = [
+            models.Index(fields=['kind', '-score'], name='trending_top')
+        ]
+        verbose_name = 'Оценка популярности'
+        verbose_name_plural = 'Оценки популярности'
+
+
+class PostRelease(models.Model):
+    """Выпуск поста в ленты, см. posts.events.
+
+    id — номер выпуска: он растет в порядке публикации, а не создания, и
+    отложенный пост, выпущенный позже, получает номер больше уже
+    опубликованных постов.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='releases',
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        verbose_name = 'Выпуск поста'
+        verbose_name_plural = 'Выпуски постов'
@@ -0,0 +1,173 @@
+"""Кэш страниц целиком для анонимных посетителей.
+
+Представление помечает ответ суррогатными ключами (tag): посты, авторы
+и группы, из которых собрана страница. Ключи уходят и в заголовок
+Surrogate-Key, поэтому обратный прокси перед приложением может
+кэшировать и сбрасывать страницы так же.
+
+У каждого ключа в кэше есть версия. Страница запоминает версии своих
+ключей при сохранении и считается устаревшей, как только версия
+любого из них изменилась. purge() атомарно увеличивает счетчик сбросов
+и записывает его значение в версии ключей — без списка страниц, так
+что сбрасываются ровно страницы с этими ключами. Ключ с версией новее
+начала отрисовки сбросили во время нее, и такую копию не сохраняют.
+Сброшенную или истекшую страницу перерисовывает один запрос
+(core.stampede), сброшенную до этого никому не отдают.
+"""
+import functools
+import hashlib
+import time
+import urllib.request
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from core import stampede
+from tasks.queue import task
+
+HEADER = 'Surrogate-Key'
+# Счетчик всех сбросов, его значения становятся версиями ключей
+EPOCH_KEY = 'page_cache:epoch'
+
+
+def post_keys(post_list: Iterable) -> List[str]:
+    """Ключи страницы со списком постов."""
+    keys = []
+    for post in post_list:
+        keys += [f'post-{post.id}', f'author-{post.author_id}']
+        if post.group_id:
+            keys.append(f'group-{post.group_id}')
+    return keys
+
+
+def tag(response: HttpResponse, *keys: str) -> HttpResponse:
+    keys = dict.fromkeys(response.get(HEADER, '').split() + list(keys))
+    response[HEADER] = ' '.join(keys)
+    return response
+
+
+def _version_key(key: str) -> str:
+    return f'page_cache:tag:{key}'
+
+
+def _versions(keys: List[str]) -> dict:
+    version_keys = {_version_key(key): key for key in keys}
+    found = cache.get_many(version_keys)
+    return {key: found.get(version_key, 0)
+            for version_key, key in version_keys.items()}
+
+
+def _now() -> int:
+    # Вытесненный счетчик начинается заново с текущего времени в
+    # миллисекундах, чтобы не отстать от уже выданных версий.
+    return int(time.time() * 1000)
+
+
+def _epoch() -> int:
+    cache.add(EPOCH_KEY, _now(), None)
+    return cache.get(EPOCH_KEY, 0)
+
+
+def _next_epoch() -> int:
+    cache.add(EPOCH_KEY, _now(), None)
+    try:
+        return cache.incr(EPOCH_KEY)
+    except ValueError:
+        # Ключ вытеснили между add и incr
+        epoch = _now()
+        cache.set(EPOCH_KEY, epoch, None)
+        return epoch
+
+
+def purge(*keys: str) -> None:
+    epoch = _next_epoch()
+    cache.set_many({_version_key(key): epoch for key in keys}, None)
+    if settings.PAGE_CACHE_PURGE_URL and keys:
+        purge_proxy.delay(list(keys))
+
+
+@task()
+def purge_proxy(keys: List[str]) -> None:
+    """Сбрасывает страницы с ключами keys в обратном прокси."""
+    request = urllib.request.Request(
+        settings.PAGE_CACHE_PURGE_URL,
+        method='PURGE',
+        headers={HEADER: ' '.join(keys)}
+    )
+    urllib.request.urlopen(request, timeout=10).close()
+
+
+def _page_key(request) -> str:
+    url = request.build_absolute_uri()
+    return 'page_cache:page:' + hashlib.md5(url.encode()).hexdigest()
+
+
+def _cacheable(request) -> bool:
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def cache_anonymous(timeout: Optional[int] = None, on_hit=None):
+    """Кэширует ответы представления анонимным посетителям.
+
+    Кэшируются только ответы 200 без cookie, помеченные tag(), на
+    timeout секунд (по умолчанию PAGE_CACHE_TIMEOUT). on_hit вызывается
+    с аргументами представления, когда ответ отдан из кэша.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            rendered = {}
+
+            def render_page():
+                # Версии, выданные после этой отметки, значат сброс
+                # ключа страницы во время отрисовки: копия могла
+                # устареть, сохранять ее нельзя.
+                epoch = _epoch()
+                response = view(request, *args, **kwargs)
+                rendered['response'] = response
+                keys = response.get(HEADER, '').split()
+                if (response.status_code != 200 or not keys
+                        or response.cookies):
+                    return None
+                versions = _versions(keys)
+                if max(versions.values()) > epoch:
+                    return None
+                return {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'versions': versions,
+                }
+
+            # Истекшую страницу перерисовывает один запрос, остальные
+            # пока получают прежнюю копию. Сброшенную прежнюю копию не
+            # отдают: ждут перерисовки.
+            entry = stampede.get_or_set(
+                _page_key(request), render_page,
+                timeout or settings.PAGE_CACHE_TIMEOUT,
+                valid=lambda entry: (
+                    _versions(list(entry['versions'])) == entry['versions']),
+                store=lambda entry: entry is not None,
+                name='page'
+            )
+
+            response = rendered.get('response')
+            if response is not None:
+                response['X-Cache'] = 'MISS'
+                return response
+            if on_hit is not None:
+                on_hit(request, *args, **kwargs)
+            response = HttpResponse(
+                entry['content'], content_type=entry['content_type'])
+            response[HEADER] = ' '.join(entry['versions'])
+            response['X-Cache'] = 'HIT'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,93 @@
+"""Черновики и отложенная публикация постов.
+
+Неопубликованный пост (черновик или запланированный) виден только
+автору. Ленты выбирают status=PUBLISHED, а сигналы сохранения такой пост
+и комментарии к нему не добавляют ни в потоки подписок, ни в индекс
+тегов, ни в упоминания, ни в популярное, ни в канал событий. Потоки,
+теги, упоминания и события делает released() в момент выпуска.
+
+Запланированные посты выпускает команда publish_scheduled. Она берет
+пачку созревших постов по индексу (status, publish_at) и переводит ее в
+опубликованные одним UPDATE. pub_date при этом становится равной
+publish_at, и пост встает в ленты на запланированное время. UPDATE не
+отправляет сигналов, поэтому кэши обновляются здесь явно. Команда
+работает отдельным процессом, и ее сбросы доходят до сайта только через
+общий кэш (settings.CACHES).
+
+Выпуск записывается в канал событий (posts.events) с новым номером,
+поэтому ожидающие потоки получают и пост, созданный раньше уже
+опубликованных.
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import events, feed, mentions, page_cache, repository, tags
+from .models import Comment, Post
+
+
+def released(posts: Iterable[Post]) -> None:
+    """Обновляет ленты и кэши после выпуска постов."""
+    posts = list(posts)
+    if not posts:
+        return
+    feed.invalidate(*{post.author_id for post in posts})
+    tags.index(posts, fresh=True)
+    for post in posts:
+        mentions.record_post(post, fresh=True)
+    for comment in Comment.objects.filter(post__in=posts):
+        mentions.record_comment(comment, fresh=True)
+    repository.posts.invalidate_ids([post.id for post in posts])
+    page_cache.purge(*dict.fromkeys(['posts', *page_cache.post_keys(posts)]))
+    events.publish(posts)
+
+
+def publish_now(post: Post) -> None:
+    """Публикует черновик или запланированный пост сразу."""
+    now = timezone.now()
+    updated = Post.objects.filter(id=post.id).unpublished().update(
+        status=Post.PUBLISHED, pub_date=now, publish_at=now)
+    if updated:
+        post.status = Post.PUBLISHED
+        post.pub_date = post.publish_at = now
+        released([post])
+
+
+def release_due(now: Optional[datetime] = None,
+                batch_size: Optional[int] = None) -> int:
+    """Выпускает посты, время которых наступило, пачками.
+
+    Возвращает число выпущенных постов.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.PUBLISH_BATCH_SIZE
+    total = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked: параллельные воркеры берут разные пачки. На
+            # SQLite блокировки строк нет, и select_for_update ничего
+            # не делает
+            post_ids = list(
+                Post.objects.filter(status=Post.SCHEDULED,
+                                    publish_at__lte=now)
+                .order_by('publish_at', 'id')
+                .select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not post_ids:
+                return total
+            Post.objects.filter(id__in=post_ids).update(
+                status=Post.PUBLISHED, pub_date=F('publish_at'))
+        released(Post.objects.filter(id__in=post_ids).order_by())
+        total += len(post_ids)
+
+
+def drafts(author_id: int) -> List[Post]:
+    """Неопубликованные посты автора, ближайшие к выпуску первыми."""
+    return list(Post.objects.filter(author_id=author_id).unpublished()
+                .select_related('author', 'group')
+                .order_by(F('publish_at').asc(nulls_last=True), '-id'))
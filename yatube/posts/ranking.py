@@ -0,0 +1,139 @@
+"""Популярные посты и группы.
+
+Вес события экспоненциально затухает с периодом полураспада
+TRENDING_HALF_LIFE. Оценки хранятся в TrendingScore в логарифмической
+шкале относительно фиксированной эпохи: событие с весом w в момент t
+дает log2(w) + t / TRENDING_HALF_LIFE. Затухание одинаково для всех
+оценок, поэтому их порядок не зависит от момента чтения и хранимые
+значения не нужно пересчитывать.
+
+Событие прибавляется к оценке одним INSERT ... ON CONFLICT DO UPDATE
+(в SQLite — с версии 3.24, проверка posts.E001): одновременные события
+не теряются, как терялись бы при чтении и записи общего значения в
+кэше. LN и POWER есть не в каждой сборке SQLite, поэтому там оценки
+складывает функция log2_add на Python, которая регистрируется в каждом
+новом соединении. Раз в TRENDING_PRUNE_INTERVAL секунд удаляются
+элементы, которые затухли на TRENDING_PRUNE_HALF_LIVES периодов и
+больше не могут попасть в рейтинг.
+"""
+import math
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.models import OuterRef, Subquery
+from django.dispatch import receiver
+
+from .models import Comment, Follow, Post, TrendingScore
+
+POSTS = TrendingScore.POST
+GROUPS = TrendingScore.GROUP
+
+_last_prune = -math.inf
+
+
+def log2_add(a: float, b: float) -> float:
+    """log2(2**a + 2**b) без переполнения: от большей оценки."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+@receiver(connection_created)
+def _register_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('log2_add', 2, log2_add)
+
+
+def _log2_add_sql(a: str, b: str) -> str:
+    if connection.vendor == 'sqlite':
+        return f'log2_add({a}, {b})'
+    return (f'CASE WHEN {a} > {b} THEN {a} + LN(1 + POWER(2, {b} - {a})) '
+            f'/ LN(2) ELSE {b} + LN(1 + POWER(2, {a} - {b})) / LN(2) END')
+
+
+def _bump_sql() -> str:
+    table = connection.ops.quote_name(TrendingScore._meta.db_table)
+    return (
+        f'INSERT INTO {table} (kind, item_id, score) VALUES (%s, %s, %s) '
+        f'ON CONFLICT (kind, item_id) DO UPDATE SET score = '
+        + _log2_add_sql(f'{table}.score', 'excluded.score')
+    )
+
+
+def _prune(now: float) -> None:
+    global _last_prune
+
+    if time.monotonic() - _last_prune < settings.TRENDING_PRUNE_INTERVAL:
+        return
+    _last_prune = time.monotonic()
+    TrendingScore.objects.filter(
+        score__lt=now / settings.TRENDING_HALF_LIFE
+        - settings.TRENDING_PRUNE_HALF_LIVES
+    ).delete()
+
+
+def bump_many(kind: str, weights: Iterable[Tuple[int, float]],
+              now: Optional[float] = None) -> None:
+    """Прибавляет события к оценкам элементов, weights — пары (id, вес)."""
+    if now is None:
+        now = time.time()
+    params = [(kind, item_id,
+               math.log2(weight) + now / settings.TRENDING_HALF_LIFE)
+              for item_id, weight in weights]
+    if not params:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(_bump_sql(), params)
+    _prune(now)
+
+
+def bump(kind: str, item_id: int, weight: float,
+         now: Optional[float] = None) -> None:
+    bump_many(kind, [(item_id, weight)], now)
+
+
+def top(kind: str, limit: int) -> List[int]:
+    return list(TrendingScore.objects.filter(kind=kind).order_by(
+        '-score').values_list('item_id', flat=True)[:limit])
+
+
+def trending_post_ids(limit: int) -> List[int]:
+    return top(POSTS, limit)
+
+
+def hot_group_ids(limit: int) -> List[int]:
+    return top(GROUPS, limit)
+
+
+def _record(post_id: int, group_id: Optional[int], weight: float) -> None:
+    bump(POSTS, post_id, weight)
+    if group_id:
+        bump(GROUPS, group_id, weight)
+
+
+def record_comment(comment: Comment) -> None:
+    _record(comment.post_id, comment.post.group_id,
+            settings.TRENDING_COMMENT_WEIGHT)
+
+
+def record_follow(follow: Follow) -> None:
+    """Подписка засчитывается последнему посту автора."""
+    latest = Post.objects.published().filter(
+        author_id=follow.author_id).values_list('id', 'group_id').first()
+    if latest is not None:
+        _record(*latest, settings.TRENDING_FOLLOW_WEIGHT)
+
+
+def record_follows(author_ids: Iterable[int]) -> None:
+    """Подписки на нескольких авторов, последние посты одним запросом."""
+    latest = Post.objects.published().filter(
+        author_id=OuterRef('author_id')).values('id')[:1]
+    rows = list(Post.objects.filter(
+        author_id__in=list(author_ids), id=Subquery(latest)
+    ).values_list('id', 'group_id'))
+    weight = settings.TRENDING_FOLLOW_WEIGHT
+    bump_many(POSTS, [(post_id, weight) for post_id, _ in rows])
+    bump_many(GROUPS, [(group_id, weight) for _, group_id in rows
+                       if group_id])
@@ -0,0 +1,209 @@
+"""Кэшированные выборки постов, групп и пользователей.
+
+Объекты лежат в кэше по id, группы и пользователи дополнительно находятся
+по slug и username через ключ со ссылкой на id; в ключ попадает хэш
+значения, потому что slug и username могут быть не ASCII. Промахи по
+списку id добираются из БД одним запросом. Записи сбрасываются сигналами
+сохранения и удаления (posts.signals).
+
+Пользователи кэшируются только с полями, которые показывают шаблоны, без
+пароля и дат входа. Объекты из кэша годятся для чтения: то, что
+сохраняется, загружается из БД.
+
+Отсутствие объекта тоже кэшируется, на NEGATIVE_CACHE_TIMEOUT секунд:
+запросы ботов к несуществующим id, slug и username не доходят до БД.
+Такие записи лежат под теми же ключами и удаляются теми же сигналами,
+что и сами объекты, поэтому созданный объект виден сразу.
+
+Внутри запроса работает карта идентичности (IdentityMapMiddleware):
+повторная выборка того же объекта возвращает уже загруженный экземпляр и
+не ходит ни в кэш, ни в БД. Вне запроса карта не ведется.
+"""
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from core.metrics import CACHE_REQUESTS
+
+from .models import Group, Post, User
+
+_local = threading.local()
+
+# Значение в кэше для объекта, которого нет в БД
+MISSING = 'repo:missing'
+
+
+def begin() -> None:
+    _local.identity_map = {}
+
+
+def end() -> None:
+    _local.identity_map = None
+
+
+def _identity_map(prefix: str) -> Optional[dict]:
+    identity_map = getattr(_local, 'identity_map', None)
+    if identity_map is None:
+        return None
+    return identity_map.setdefault(prefix, {})
+
+
+class Repository:
+    """Cache-aside для одной модели.
+
+    lookup — уникальное поле, по которому объект ищут в урлах
+    (slug, username), fields — поля, которые кэшируются (по умолчанию
+    все).
+    """
+
+    def __init__(self, model, prefix: str, lookup: Optional[str] = None,
+                 fields: Iterable[str] = ()):
+        self.model = model
+        self.prefix = prefix
+        self.lookup = lookup
+        self.fields = tuple(fields)
+
+    def queryset(self):
+        queryset = self.model.objects.all()
+        if self.fields:
+            queryset = queryset.only(*self.fields)
+        return queryset
+
+    def key(self, pk) -> str:
+        return f'repo:{self.prefix}:{pk}'
+
+    def lookup_key(self, value) -> str:
+        digest = hashlib.md5(str(value).encode()).hexdigest()
+        return f'repo:{self.prefix}:{self.lookup}:{digest}'
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, object]:
+        ids = set(ids)
+        result = {}
+        identity_map = _identity_map(self.prefix)
+        if identity_map is not None:
+            result = {pk: identity_map[pk] for pk in ids if pk in identity_map}
+        missing = ids - result.keys()
+
+        if missing:
+            keys = {self.key(pk): pk for pk in missing}
+            cached = cache.get_many(keys)
+            found = {keys[key]: obj for key, obj in cached.items()
+                     if obj != MISSING}
+            missing -= {keys[key] for key in cached}
+            CACHE_REQUESTS.inc(len(found), cache='default',
+                               name=self.prefix, result='hit')
+            CACHE_REQUESTS.inc(len(cached) - len(found), cache='default',
+                               name=self.prefix, result='negative')
+            CACHE_REQUESTS.inc(len(missing), cache='default',
+                               name=self.prefix, result='miss')
+            if missing:
+                loaded = self.queryset().in_bulk(missing)
+                cache.set_many(
+                    {self.key(pk): obj for pk, obj in loaded.items()},
+                    settings.REPOSITORY_TIMEOUT
+                )
+                absent = missing - loaded.keys()
+                if absent:
+                    cache.set_many({self.key(pk): MISSING for pk in absent},
+                                   settings.NEGATIVE_CACHE_TIMEOUT)
+                found.update(loaded)
+            if identity_map is not None:
+                identity_map.update(found)
+            result.update(found)
+        return result
+
+    def _not_found(self, value) -> Http404:
+        return Http404(f'{self.model._meta.object_name} {value} не найден')
+
+    def get(self, pk: int):
+        """Объект по id, Http404 — если его нет."""
+        obj = self.get_many([pk]).get(pk)
+        if obj is None:
+            raise self._not_found(pk)
+        return obj
+
+    def get_by(self, value):
+        """Объект по полю lookup, Http404 — если его нет."""
+        key = self.lookup_key(value)
+        pk = cache.get(key)
+        if pk == MISSING:
+            raise self._not_found(value)
+        if pk is not None:
+            obj = self.get_many([pk]).get(pk)
+            # Поле могли переименовать, тогда ссылка устарела
+            if obj is not None and getattr(obj, self.lookup) == value:
+                return obj
+
+        pk = self.model.objects.filter(
+            **{self.lookup: value}).values_list('pk', flat=True).first()
+        if pk is None:
+            cache.set(key, MISSING, settings.NEGATIVE_CACHE_TIMEOUT)
+            raise self._not_found(value)
+        cache.set(key, pk, settings.REPOSITORY_TIMEOUT)
+        return self.get(pk)
+
+    def invalidate(self, obj) -> None:
+        keys = [self.key(obj.pk)]
+        if self.lookup:
+            keys.append(self.lookup_key(getattr(obj, self.lookup)))
+        cache.delete_many(keys)
+        identity_map = _identity_map(self.prefix)
+        if identity_map is not None:
+            identity_map.pop(obj.pk, None)
+
+    def invalidate_ids(self, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        cache.delete_many([self.key(pk) for pk in ids])
+        identity_map = _identity_map(self.prefix)
+        if identity_map is not None:
+            for pk in ids:
+                identity_map.pop(pk, None)
+
+
+posts = Repository(Post, 'post')
+groups = Repository(Group, 'group', lookup='slug')
+users = Repository(User, 'user', lookup='username',
+                   fields=('username', 'first_name', 'last_name'))
+
+
+def hydrate(post_list: Iterable[Post]) -> List[Post]:
+    """Подставляет авторов и группы постов из кэша.
+
+    В кэше посты хранятся без связанных объектов, поэтому каждый автор и
+    каждая группа загружаются не больше одного раза на весь список.
+    """
+    post_list = list(post_list)
+    authors = users.get_many(post.author_id for post in post_list)
+    post_groups = groups.get_many(
+        post.group_id for post in post_list if post.group_id)
+    for post in post_list:
+        post.author = authors[post.author_id]
+        if post.group_id:
+            # Группу могли удалить, а пост в кэше еще ссылается на нее
+            post.group = post_groups.get(post.group_id)
+    return post_list
+
+
+def get_post(post_id: int) -> Post:
+    """Пост с автором и группой, Http404 — если его нет."""
+    post = posts.get(post_id)
+    hydrate([post])
+    return post
+
+
+def get_posts(post_ids: Iterable[int]) -> Dict[int, Post]:
+    found = posts.get_many(post_ids)
+    hydrate(found.values())
+    return found
+
+
+def get_group(slug: str) -> Group:
+    return groups.get_by(slug)
+
+
+def get_user(username: str) -> User:
+    return users.get_by(username)
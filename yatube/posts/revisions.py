@@ -0,0 +1,170 @@
+"""История правок текста постов.
+
+Каждое сохранение, которое меняет текст, добавляет версию PostRevision.
+Первая версия и затем каждая REVISION_SNAPSHOT_INTERVAL-я хранят текст
+целиком (snapshot), остальные — разницу с предыдущей версией. Разница —
+список операций над словами предыдущего текста (слово — вместе с
+пробелами за ним): число n > 0 — оставить n слов, n < 0 — пропустить
+-n, строка — вставить ее. Сравниваются только слова между общими
+началом и концом двух текстов; если их больше REVISION_DIFF_MAX_TOKENS,
+версия тоже сохраняется целиком. И текст, и разница хранятся в виде
+JSON, сжатого zlib.
+
+Версия восстанавливается от ближайшего снимка не новее нее: к нему по
+порядку применяются разницы, не больше REVISION_SNAPSHOT_INTERVAL - 1.
+Снимок и разницы читаются одним запросом.
+
+Список версий листается по номеру версии, как ленты — по ключу.
+
+У постов, созданных до появления истории, первой версией станет текст
+после первой правки.
+"""
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+from typing import List, Optional, Union
+
+from django.conf import settings
+from django.db.models import Subquery
+
+from .models import Post, PostRevision
+from .utils import KeysetPage
+
+# Слово вместе с пробелами после него; пробелы в начале текста — отдельно
+TOKEN = re.compile(r'^\s+|\S+\s*')
+
+Ops = List[Union[int, str]]
+
+
+def _tokens(text: str) -> List[str]:
+    return TOKEN.findall(text)
+
+
+def diff(old: str, new: str) -> Optional[Ops]:
+    """Операции, которые превращают old в new.
+
+    None — измененная часть длиннее REVISION_DIFF_MAX_TOKENS слов, и
+    версию дешевле сохранить целиком.
+    """
+    a, b = _tokens(old), _tokens(new)
+    # Правка обычно меняет несколько мест в середине: общие начало и
+    # конец текста сравнивать незачем
+    limit = min(len(a), len(b))
+    head = 0
+    while head < limit and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+    a, b = a[head:len(a) - tail], b[head:len(b) - tail]
+    if len(a) + len(b) > settings.REVISION_DIFF_MAX_TOKENS:
+        return None
+
+    ops = [head] if head else []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b).get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(''.join(b[j1:j2]))
+    if tail:
+        ops.append(tail)
+    return ops
+
+
+def patch(old: str, ops: Ops) -> str:
+    tokens = _tokens(old)
+    position = 0
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.extend(tokens[position:position + op])
+            position += op
+        else:
+            position -= op
+    return ''.join(parts)
+
+
+def _pack(value) -> bytes:
+    return zlib.compress(json.dumps(
+        value, ensure_ascii=False, separators=(',', ':')).encode())
+
+
+def _unpack(data) -> Union[str, Ops]:
+    return json.loads(zlib.decompress(data))
+
+
+def _chain(post_id: int,
+           number: Optional[int] = None) -> List[PostRevision]:
+    """Версии от последнего снимка до number (до последней), по порядку."""
+    revisions = PostRevision.objects.filter(post_id=post_id)
+    if number is not None:
+        revisions = revisions.filter(number__lte=number)
+    start = revisions.filter(snapshot=True).order_by(
+        '-number').values('number')[:1]
+    return list(revisions.filter(number__gte=Subquery(start)).order_by(
+        'number'))
+
+
+def _rebuild(chain: List[PostRevision]) -> str:
+    text = _unpack(chain[0].data)
+    for revision in chain[1:]:
+        text = patch(text, _unpack(revision.data))
+    return text
+
+
+def text(post_id: int, number: int) -> Optional[str]:
+    """Текст версии number или None, если такой версии нет."""
+    chain = _chain(post_id, number)
+    if not chain or chain[-1].number != number:
+        return None
+    return _rebuild(chain)
+
+
+def record(post: Post, fresh: bool = False) -> Optional[PostRevision]:
+    """Добавляет версию, если текст поста изменился.
+
+    fresh — пост только что создан и версий у него нет.
+    """
+    chain = [] if fresh else _chain(post.id)
+    if chain:
+        previous = _rebuild(chain)
+        if previous == post.text:
+            return None
+    ops = None
+    if chain and len(chain) < settings.REVISION_SNAPSHOT_INTERVAL:
+        ops = diff(previous, post.text)
+    snapshot = ops is None
+    data = _pack(post.text if snapshot else ops)
+    return PostRevision.objects.create(
+        post_id=post.id,
+        number=chain[-1].number + 1 if chain else 1,
+        snapshot=snapshot,
+        data=data,
+        length=len(post.text)
+    )
+
+
+def history(post_id: int, before: Optional[str] = None,
+            size: Optional[int] = None) -> KeysetPage:
+    """Версии поста от новых к старым, без самих данных.
+
+    Курсор — номер последней показанной версии.
+    """
+    size = size or settings.REVISIONS_ON_PAGE
+    revisions = PostRevision.objects.filter(post_id=post_id)
+    first = not (before and before.isdigit())
+    if not first:
+        revisions = revisions.filter(number__lt=int(before))
+    revisions = list(revisions.defer('data').order_by('-number')[:size + 1])
+
+    next_cursor = None
+    if len(revisions) > size:
+        revisions = revisions[:size]
+        next_cursor = str(revisions[-1].number)
+    return KeysetPage(revisions, next_cursor, first)
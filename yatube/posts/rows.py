@@ -0,0 +1,150 @@
+"""Легкие строки постов для лент.
+
+Ленты показывают у поста только начало текста, дату, картинку, имя автора и
+группу, а select_related('author', 'group') тянет еще пароль, last_login,
+описание группы и остальные колонки и собирает из них три экземпляра
+моделей на пост. feed_rows выбирает нужные колонки через values_list и
+складывает их в объекты со __slots__, у которых те же атрибуты, что
+читают шаблоны: post.author.get_full_name, post.group.slug,
+post.image.url, адреса из ReverseMap. Автор и группа, повторяющиеся на
+странице, — один и тот же объект.
+"""
+from django.db.models import QuerySet
+from django.db.models.query import ValuesListIterable
+
+from .models import Post
+from .utils import ReverseMap
+
+FIELDS = (
+    'id', 'preview', 'has_more', 'pub_date', 'image', 'views',
+    'author_id', 'author__username', 'author__first_name',
+    'author__last_name',
+    'group_id', 'group__title', 'group__slug',
+)
+
+_image_field = Post._meta.get_field('image')
+
+
+class ImageName(str):
+    """Имя файла картинки с url, как у ImageFieldFile.
+
+    Строку принимает и sorl-thumbnail, ключи миниатюр те же.
+    """
+    __slots__ = ()
+
+    @property
+    def storage(self):
+        return _image_field.storage
+
+    @property
+    def url(self):
+        return self.storage.url(self)
+
+
+class AuthorRow:
+    __slots__ = ('id', 'username', 'first_name', 'last_name')
+
+    def __init__(self, id, username, first_name, last_name):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def get_username(self):
+        return self.username
+
+    def __str__(self):
+        return self.username
+
+
+class GroupRow:
+    __slots__ = ('id', 'title', 'slug')
+
+    def __init__(self, id, title, slug):
+        self.id = id
+        self.title = title
+        self.slug = slug
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.title
+
+
+class PostRow:
+    __slots__ = ('id', 'preview', 'has_more', 'pub_date', 'image', 'views',
+                 'author_id', 'author', 'group_id', 'group', 'detail_url',
+                 'profile_url', 'group_url')
+
+    def __init__(self, id, preview, has_more, pub_date, image, views,
+                 author, group):
+        self.id = id
+        self.preview = preview
+        self.has_more = has_more
+        self.pub_date = pub_date
+        self.image = ImageName(image)
+        self.views = views
+        self.author_id = author.id
+        self.author = author
+        self.group_id = group.id if group is not None else None
+        self.group = group
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        # Строка равна посту с тем же id, как экземпляры модели
+        if isinstance(other, (PostRow, Post)):
+            return self.id == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return self.preview[:15]
+
+
+class PostRowIterable(ValuesListIterable):
+    """Строки постов с адресами из одной ReverseMap на всю выборку."""
+
+    def __iter__(self):
+        reverse_map = ReverseMap()
+        authors = {}
+        groups = {}
+        for (post_id, preview, has_more, pub_date, image, views,
+             author_id, username, first_name, last_name,
+             group_id, title, slug) in super().__iter__():
+            author = authors.get(author_id)
+            if author is None:
+                author = authors[author_id] = AuthorRow(
+                    author_id, username, first_name, last_name)
+            group = None
+            if group_id is not None:
+                group = groups.get(group_id)
+                if group is None:
+                    group = groups[group_id] = GroupRow(group_id, title, slug)
+            yield reverse_map.attach(PostRow(
+                post_id, preview, has_more, pub_date, image, views, author,
+                group))
+
+
+def feed_rows(queryset: QuerySet) -> QuerySet:
+    """Выборка постов, которая при вычислении дает PostRow.
+
+    Остается QuerySet: ее можно фильтровать, считать и резать на
+    страницы, запрос выполнится только при обращении к строкам.
+    """
+    queryset = queryset.values_list(*FIELDS)
+    queryset._iterable_class = PostRowIterable
+    return queryset
@@ -0,0 +1,121 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (events, feed, follow_graph, mentions, page_cache, ranking,
+               repository, revisions, tags, threads)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        follow_graph.invalidate(instance.user_id, [instance.author_id])
+        ranking.record_follow(instance)
+        page_cache.purge(f'author-{instance.author_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follow_graph.invalidate(instance.user_id, [instance.author_id])
+    page_cache.purge(f'author-{instance.author_id}')
+
+
+@receiver(pre_save, sender=Comment)
+def comment_placed(sender, instance, **kwargs):
+    # Путь ответа известен до вставки, путь комментария верхнего
+    # уровня строится из id — после
+    if instance._state.adding and instance.parent_id and not instance.path:
+        threads.place(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created and not instance.path:
+        threads.place_root(instance)
+    if created:
+        page_cache.purge(f'comments-{instance.post_id}')
+    # Комментарий к черновику видит только автор поста: упоминания
+    # записываются при выпуске (posts.publishing)
+    if not instance.post.is_published:
+        return
+    if created:
+        ranking.record_comment(instance)
+    mentions.record_comment(instance, fresh=created)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    threads.removed(instance)
+    page_cache.purge(f'comments-{instance.post_id}')
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    # Неопубликованный пост попадет в ленты при выпуске (posts.publishing)
+    if created and instance.is_published:
+        feed.invalidate(instance.author_id)
+        events.publish([instance])
+
+
+@receiver(post_save, sender=Post)
+def post_text_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Сохранение без текста (например, только views) тегов не меняет
+    if update_fields is None or 'text' in update_fields:
+        tags.index([instance], fresh=created)
+        revisions.record(instance, fresh=created)
+        if instance.is_published:
+            mentions.record_post(instance, fresh=created)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    if instance.is_published:
+        feed.invalidate(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    repository.posts.invalidate(instance)
+    if not instance.is_published:
+        return
+    # Новый или удаленный пост меняет ленты автора и группы, правка —
+    # страницы, где он показан, и ленту его новой группы.
+    keys = ['posts', f'post-{instance.id}']
+    if kwargs.get('created', True):
+        keys.append(f'author-{instance.author_id}')
+    if instance.group_id:
+        keys.append(f'group-{instance.group_id}')
+    page_cache.purge(*keys)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    repository.groups.invalidate(instance)
+    page_cache.purge(f'group-{instance.id}')
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # Посты группы обнуляют group одним UPDATE без сигналов Post:
+    # запоминаем их, чтобы сбросить после удаления
+    instance.post_ids = list(Post.objects.filter(
+        group_id=instance.id).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    post_ids = getattr(instance, 'post_ids', [])
+    repository.posts.invalidate_ids(post_ids)
+    page_cache.purge('posts', *(f'post-{pk}' for pk in post_ids))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    repository.users.invalidate(instance)
+    # Вход пользователя меняет только last_login, страниц он не касается
+    if update_fields != frozenset({'last_login'}):
+        page_cache.purge(f'author-{instance.id}')
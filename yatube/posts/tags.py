@@ -0,0 +1,83 @@
+"""Хэштеги постов и ленты тегов.
+
+Теги из текста поста складываются в обратный индекс PostTag: для
+каждого тега — список его постов с датами, упорядоченный индексом
+(tag, pub_date, post). Индекс обновляется сигналом при сохранении
+поста, все посты переиндексирует команда reindex_tags.
+
+Лента тега листается по ключу (keyset): курсор страницы — дата и id
+последнего показанного поста, следующая страница начинается строго
+после него. В отличие от OFFSET, глубина страницы на стоимость запроса
+не влияет, а новые посты не сдвигают уже открытые страницы.
+"""
+from itertools import chain
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Post, PostTag, Tag, extract_tags
+from .rows import feed_rows
+from .utils import KeysetPage, decode_cursor, encode_cursor
+
+
+def _tag_ids(names: Iterable[str]) -> Dict[str, int]:
+    names = list(names)
+    if not names:
+        return {}
+    Tag.objects.bulk_create([Tag(name=name) for name in names],
+                            ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def index(posts: Iterable[Post], fresh: bool = False) -> int:
+    """Перестраивает записи индекса для постов, возвращает их число.
+
+    fresh — у постов еще нет записей: они только что созданы или
+    выпущены.
+    """
+    posts = list(posts)
+    # Неопубликованные посты в ленты тегов не попадают до выпуска
+    names = {post.id: extract_tags(post.text) if post.is_published else []
+             for post in posts}
+    with transaction.atomic():
+        if not fresh:
+            PostTag.objects.filter(post_id__in=list(names)).delete()
+        tag_ids = _tag_ids(set(chain.from_iterable(names.values())))
+        entries = [
+            PostTag(tag_id=tag_ids[name], post_id=post.id,
+                    pub_date=post.pub_date)
+            for post in posts
+            for name in names[post.id]
+        ]
+        PostTag.objects.bulk_create(entries)
+    return len(entries)
+
+
+def page(tag: Tag, cursor: Optional[str] = None,
+         size: Optional[int] = None) -> KeysetPage:
+    """Страница ленты тега после курсора: id из индекса, строки по id."""
+    size = size or settings.POSTS_ON_PAGE
+    entries = PostTag.objects.filter(tag=tag)
+    after = decode_cursor(cursor)
+    if after is not None:
+        pub_date, post_id = after
+        entries = entries.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, post_id__lt=post_id)
+        )
+    entries = list(entries.order_by('-pub_date', '-post_id').values_list(
+        'pub_date', 'post_id')[:size + 1])
+
+    next_cursor = None
+    if len(entries) > size:
+        entries = entries[:size]
+        next_cursor = encode_cursor(entries[-1])
+    post_ids = [post_id for _, post_id in entries]
+    posts = {}
+    if post_ids:
+        posts = {post.id: post for post in feed_rows(
+            Post.objects.filter(id__in=post_ids).order_by())}
+    return KeysetPage([posts[post_id] for post_id in post_ids
+                       if post_id in posts], next_cursor, after is None)
@@ -0,0 +1,34 @@
+from sorl.thumbnail import get_thumbnail
+
+from core.metrics import Gauge, Histogram
+from tasks.models import Task
+from tasks.queue import task
+
+from .models import Post
+
+# Миниатюра поста в лентах и на странице поста
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+THUMBNAIL_DURATION = Histogram(
+    'yatube_thumbnail_seconds', 'Время подготовки миниатюры')
+
+
+def _thumbnail_backlog():
+    return {(): Task.objects.filter(
+        queue='thumbnails', status__in=(Task.PENDING, Task.RUNNING)).count()}
+
+
+THUMBNAIL_BACKLOG = Gauge(
+    'yatube_thumbnail_backlog', 'Миниатюр в очереди на подготовку',
+    _thumbnail_backlog)
+
+
+@task(queue='thumbnails')
+def warm_thumbnail(post_id):
+    """Готовит миниатюру заранее, чтобы ее не строила первая лента."""
+    post = Post.objects.filter(id=post_id).only('image').first()
+    if post is not None and post.image:
+        with THUMBNAIL_DURATION.time():
+            get_thumbnail(post.image, POST_THUMBNAIL_GEOMETRY,
+                          **POST_THUMBNAIL_OPTIONS)
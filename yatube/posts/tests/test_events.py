@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from yatube import asgi
+
+from .. import events
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+def read_events(body):
+    """Разбирает поток SSE в список (событие, данные)."""
+    result = []
+    for block in body.split('\n\n'):
+        fields = dict(
+            line.split(': ', 1) for line in block.splitlines()
+            if ': ' in line and not line.startswith(':')
+        )
+        if 'event' in fields:
+            result.append((fields['event'], json.loads(fields['data'])))
+    return result
+
+
+class PostEventsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='someone')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostEventsTests.user)
+
+    def test_new_post_is_published(self):
+        """Создание поста сдвигает последний id канала."""
+
+        events.latest()
+        post = Post.objects.create(text='Новый', author=PostEventsTests.author)
+
+        self.assertEqual(events.latest(), post.releases.get().id)
+
+    def test_poll_reports_new_posts(self):
+        """Опрос сообщает число новых постов с момента загрузки ленты."""
+
+        since = events.latest()
+        post = Post.objects.create(text='Новый', author=PostEventsTests.author)
+
+        response = self.guest_client.get(
+            reverse('posts:post_events'), {'since': since, 'render': 1})
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        (name, data), = read_events(response.content.decode())
+        self.assertEqual(name, 'posts')
+        self.assertEqual(data['count'], 1)
+        self.assertIn(post.text, data['html'][0])
+
+    @override_settings(SSE_POLL_RETRY=30000)
+    def test_idle_poll_answers_at_once(self):
+        """Без новых постов опрос сразу отвечает долгим retry, без
+        запросов к БД."""
+
+        last_id = events.latest()
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(
+                reverse('posts:post_events'), HTTP_LAST_EVENT_ID=str(last_id))
+        body = response.content.decode()
+        self.assertIn('retry: 30000', body)
+        self.assertNotIn('event:', body)
+
+    def test_follow_poll_counts_followed_authors(self):
+        """Опрос ленты подписок считает только посты авторов подписок."""
+
+        Follow.objects.create(
+            user=PostEventsTests.user, author=PostEventsTests.author)
+        since = events.latest()
+        Post.objects.create(text='Чужой', author=PostEventsTests.stranger)
+        Post.objects.create(text='Свой', author=PostEventsTests.author)
+
+        response = self.authorized_client.get(
+            reverse('posts:post_events'), {'since': since, 'feed': 'follow'})
+
+        (name, data), = read_events(response.content.decode())
+        self.assertEqual(data['count'], 1)
+
+
+@override_settings(SSE_STREAM_TIMEOUT=0.5, SSE_HEARTBEAT=0.1,
+                   SSE_POLL_INTERVAL=0.05)
+class AsgiEventsTests(TransactionTestCase):
+    """Поток событий yatube.asgi. Запросы к БД приложение делает в пуле
+    потоков, поэтому данные теста должны быть сохранены в БД."""
+
+    def setUp(self):
+        cache.clear()
+        asgi.latest = asgi.Latest()
+        self.author = User.objects.create_user(username='author')
+
+    def request(self, path, query='', during=None):
+        """Тело и статус ответа; during выполняется в пуле потоков,
+        пока поток открыт."""
+        messages = []
+
+        async def receive():
+            await asyncio.sleep(60)
+
+        async def send(message):
+            messages.append(message)
+
+        async def main():
+            scope = {'type': 'http', 'method': 'GET', 'path': path,
+                     'query_string': query.encode(), 'headers': []}
+            response = asyncio.ensure_future(
+                asgi.application(scope, receive, send))
+            if during is not None:
+                await asyncio.sleep(0.15)
+                await asgi._sync(during)
+            await response
+
+        asyncio.run(main())
+        body = b''.join(message.get('body', b'') for message in messages)
+        return messages[0]['status'], body.decode()
+
+    def test_stream_waits_for_new_posts(self):
+        """Поток шлет heartbeat, пока постов нет, и событие о новом."""
+
+        since = events.latest()
+        status, body = self.request(
+            reverse('posts:post_events'), f'since={since}',
+            during=lambda: Post.objects.create(text='Новый',
+                                               author=self.author))
+        self.assertEqual(status, 200)
+        self.assertIn(': ping', body)
+        (name, data), = read_events(body)
+        self.assertEqual((name, data['count']), ('posts', 1))
+
+    def test_bad_requests(self):
+        """Неверные параметры — 400, другие адреса — 404."""
+
+        self.assertEqual(
+            self.request(reverse('posts:post_events'), 'since=x')[0], 400)
+        self.assertEqual(self.request('/')[0], 404)
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import feed
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(FEED_STREAM_SIZE=3)
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(3)]
+        now = timezone.now()
+        # Посты вперемешку по времени, часть с одинаковой датой
+        Post.objects.bulk_create(
+            Post(author=cls.authors[i % 3], text=f'Пост {i}',
+                 pub_date=now - timedelta(minutes=(i * 7) % 11))
+            for i in range(20)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_ids = [author.id for author in FollowFeedTests.authors]
+
+    def expected(self, start, stop):
+        return list(Post.objects.filter(author__in=self.author_ids).order_by(
+            '-pub_date', '-id').values_list('id', flat=True)[start:stop])
+
+    def page(self, start, stop):
+        return [post.id for post in
+                feed.FollowFeed(self.author_ids)[start:stop]]
+
+    def test_merge_matches_query(self):
+        """Слияние и запрос к БД дают одну и ту же ленту на всю глубину."""
+
+        self.assertEqual(len(feed.FollowFeed(self.author_ids)), 20)
+        for start in range(0, 20, 4):
+            self.assertEqual(self.page(start, start + 4),
+                             self.expected(start, start + 4))
+
+    def test_first_page_from_streams(self):
+        """Неглубокая страница с загруженными потоками — один запрос."""
+
+        self.page(0, 3)
+        with self.assertNumQueries(1):
+            page = self.page(0, 3)
+        self.assertEqual(page, self.expected(0, 3))
+
+    def test_new_posts_drop_stream(self):
+        """Новые посты сбрасывают поток автора: два поста подряд оба
+        попадают в ленту."""
+
+        self.page(0, 3)
+        author = FollowFeedTests.authors[2]
+        key = feed.STREAM_KEY.format(author.id)
+        self.assertIsNotNone(cache.get(key))
+
+        first = Post.objects.create(author=author, text='Первый')
+        self.assertIsNone(cache.get(key))
+        second = Post.objects.create(author=author, text='Второй')
+        self.assertEqual(self.page(0, 2), [second.id, first.id])
+        self.assertEqual(len(feed.FollowFeed(self.author_ids)), 22)
+
+    def test_new_and_deleted_posts(self):
+        """Новый пост попадает в ленту, удаление сбрасывает поток."""
+
+        self.page(0, 3)
+        post = Post.objects.create(author=FollowFeedTests.authors[1],
+                                   text='Новый пост')
+        self.assertEqual(self.page(0, 3)[0], post.id)
+        self.assertEqual(len(feed.FollowFeed(self.author_ids)), 21)
+
+        post.delete()
+        self.assertEqual(self.page(0, 3), self.expected(0, 3))
+        self.assertEqual(len(feed.FollowFeed(self.author_ids)), 20)
+
+    @override_settings(FEED_COLD_STREAMS=2)
+    def test_cold_feed_from_query(self):
+        """Если потоков в кэше недостает, лента берется из БД, а потоки
+        догружаются по FEED_COLD_STREAMS за запрос."""
+
+        cold = feed.FollowFeed(self.author_ids)
+        self.assertTrue(cold.cold)
+        self.assertEqual(len(cold), 20)
+        self.assertEqual([post.id for post in cold[0:3]],
+                         self.expected(0, 3))
+        self.assertEqual(len(feed.streams_many(self.author_ids, 0)), 2)
+
+        self.assertEqual(self.page(4, 8), self.expected(4, 8))
+        self.assertFalse(feed.FollowFeed(self.author_ids).cold)
+        expected = self.expected(0, 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.page(0, 3), expected)
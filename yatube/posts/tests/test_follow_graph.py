@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follow_graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='someone')
+        cls.author = User.objects.create_user(username='author')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.other = User.objects.create_user(username='other')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FollowGraphTests.user)
+
+    def test_graph_follows_database(self):
+        """Граф обновляется при подписке и отписке."""
+
+        user = FollowGraphTests.user
+        author = FollowGraphTests.author
+
+        self.assertFalse(follow_graph.is_following(user.id, author.id))
+        self.assertEqual(follow_graph.follower_count(author.id), 0)
+
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}))
+
+        self.assertTrue(follow_graph.is_following(user.id, author.id))
+        self.assertEqual(follow_graph.following(user.id), {author.id})
+        self.assertEqual(follow_graph.follower_count(author.id), 1)
+
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': author.username}))
+
+        self.assertFalse(follow_graph.is_following(user.id, author.id))
+        self.assertEqual(follow_graph.follower_count(author.id), 0)
+
+    def test_graph_reads_without_queries(self):
+        """Загруженный граф отвечает без запросов к БД."""
+
+        user = FollowGraphTests.user
+        author = FollowGraphTests.author
+        Follow.objects.create(user=user, author=author)
+
+        follow_graph.following(user.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(user.id, author.id))
+
+    def test_change_drops_cached_sets(self):
+        """Подписка сбрасывает множества в кэше, а не правит их."""
+
+        user = FollowGraphTests.user
+        author = FollowGraphTests.author
+        # Множество в кэше успел изменить другой процесс
+        cache.set(follow_graph.FOLLOWING_KEY.format(user.id),
+                  {FollowGraphTests.other.id})
+
+        Follow.objects.create(user=user, author=author)
+
+        self.assertEqual(follow_graph.following(user.id), {author.id})
+
+    def test_suggestions(self):
+        """Предлагаются авторы, на которых подписаны авторы пользователя."""
+
+        user = FollowGraphTests.user
+        Follow.objects.create(user=user, author=FollowGraphTests.author)
+        Follow.objects.create(user=user, author=FollowGraphTests.friend)
+        Follow.objects.create(
+            user=FollowGraphTests.author, author=FollowGraphTests.other)
+        Follow.objects.create(
+            user=FollowGraphTests.friend, author=FollowGraphTests.other)
+        Follow.objects.create(
+            user=FollowGraphTests.author, author=user)
+
+        self.assertEqual(
+            follow_graph.suggestions(user.id), [FollowGraphTests.other.id])
+
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['suggested_authors']),
+            [FollowGraphTests.other])
@@ -0,0 +1,131 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import follow_graph, follows
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FollowsTests.user)
+
+    def author_ids(self):
+        return [author.id for author in FollowsTests.authors]
+
+    def followed(self):
+        return set(Follow.objects.filter(
+            user=FollowsTests.user).values_list('author_id', flat=True))
+
+    def test_follow_is_one_insert(self):
+        """Подписка пишет в БД одним INSERT, повторная ничего не создает."""
+
+        user = FollowsTests.user
+        author_ids = self.author_ids()
+        follow_graph.following(user.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            created = follows.follow(user.id, author_ids + [user.id])
+        writes = [query['sql'] for query in queries.captured_queries
+                  if not query['sql'].startswith(
+                      ('SELECT', 'SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+        self.assertEqual(created, author_ids)
+        self.assertEqual(self.followed(), set(author_ids))
+        self.assertEqual(follow_graph.following(user.id), set(author_ids))
+
+        self.assertEqual(follows.follow(user.id, author_ids), [])
+        self.assertEqual(Follow.objects.filter(user=user).count(), 3)
+
+    def test_follow_ignores_stale_graph(self):
+        """Новые подписки определяются по БД, а не по графу в кэше."""
+
+        user = FollowsTests.user
+        author_id = self.author_ids()[0]
+        follows.follow(user.id, [author_id])
+        # Граф в кэше отстал от БД
+        cache.set(follow_graph.FOLLOWING_KEY.format(user.id), set())
+
+        self.assertEqual(follows.follow(user.id, [author_id]), [])
+
+    def test_follow_reports_only_new(self):
+        """Из частично существующих подписок новыми считаются только
+        вставленные."""
+
+        user = FollowsTests.user
+        author_ids = self.author_ids()
+        follows.follow(user.id, [author_ids[1]])
+
+        self.assertEqual(follows.follow(user.id, author_ids),
+                         [author_ids[0], author_ids[2]])
+        self.assertEqual(self.followed(), set(author_ids))
+
+    def test_unfollow_is_one_delete(self):
+        """Отписка — один DELETE, граф в кэше обновляется."""
+
+        user = FollowsTests.user
+        author_ids = self.author_ids()
+        follows.follow(user.id, author_ids)
+        follow_graph.followers(author_ids[0])
+
+        with self.assertNumQueries(1):
+            deleted = follows.unfollow(user.id, author_ids[:2])
+        self.assertEqual(deleted, 2)
+        self.assertEqual(self.followed(), {author_ids[2]})
+        self.assertEqual(follow_graph.following(user.id), {author_ids[2]})
+        self.assertEqual(follow_graph.follower_count(author_ids[0]), 0)
+
+        self.assertEqual(follows.unfollow(user.id, author_ids[:2]), 0)
+
+    def test_bulk_endpoint(self):
+        """Подписка и отписка списком имен через follow_bulk."""
+
+        url = reverse('posts:follow_bulk')
+        usernames = ' '.join(author.username for author in
+                             FollowsTests.authors) + ' nobody'
+
+        response = self.authorized_client.post(url, {'usernames': usernames})
+        self.assertEqual(response.json(),
+                         {'found': 3, 'not_found': 1, 'changed': 3})
+        self.assertEqual(self.followed(), set(self.author_ids()))
+
+        response = self.authorized_client.post(
+            url, {'usernames': 'author0, author1', 'unfollow': 'on'})
+        self.assertEqual(response.json()['changed'], 2)
+        self.assertEqual(self.followed(), {self.author_ids()[2]})
+
+        self.assertEqual(self.authorized_client.get(url).status_code, 405)
+        self.assertEqual(
+            self.authorized_client.post(url, {}).status_code, 400)
+
+    def test_bulk_command(self):
+        """Команда follow_bulk подписывает и отписывает."""
+
+        out = StringIO()
+        call_command('follow_bulk', 'reader', 'author0', 'author1',
+                     stdout=out)
+        self.assertIn('Новых подписок: 2', out.getvalue())
+        self.assertEqual(self.followed(), set(self.author_ids()[:2]))
+
+        call_command('follow_bulk', 'reader', 'author0', '--unfollow',
+                     stdout=out)
+        self.assertEqual(self.followed(), {self.author_ids()[1]})
@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    TEMPLATES=[*settings.TEMPLATES, settings.JINJA2_TEMPLATES],
+    FEED_TEMPLATE_ENGINE='jinja2',
+)
+class Jinja2FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='someone')
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        cls.post = Post.objects.create(
+            text='Текст поста в Jinja2',
+            author=cls.author,
+            group=cls.group,
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=small_gif,
+                content_type='image/gif'
+            )
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(Jinja2FeedTests.user)
+
+    def test_feed_pages_render(self):
+        """Ленты отрисовываются шаблонами Jinja2."""
+
+        post = Jinja2FeedTests.post
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': post.group.slug}),
+            reverse('posts:profile', kwargs={'username': post.author}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                html = response.content.decode()
+
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(post.text, html)
+                self.assertIn('Лев Толстой', html)
+                self.assertIn(reverse(
+                    'posts:post_detail', args=[post.pk]), html)
+                self.assertIn('<img class="card-img my-2"', html)
+                self.assertIn(reverse('users:logout'), html)
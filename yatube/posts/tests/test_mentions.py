@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import mentions
+from ..models import Comment, Mention, Post, extract_mentions
+
+User = get_user_model()
+
+
+class MentionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.friend = User.objects.create_user(username='friend.1')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(MentionsTests.reader)
+
+    def mentioned(self, post, comment=None):
+        return set(Mention.objects.filter(
+            post=post, comment=comment).values_list('user__username',
+                                                    flat=True))
+
+    def test_extract_mentions(self):
+        """Имена без завершающей точки, без адресов почты и повторов."""
+
+        self.assertEqual(
+            extract_mentions('@reader, @friend.1. a@b.c @reader @x-y-'),
+            ['reader', 'friend.1', 'x-y'])
+
+    def test_mentions_resolved_in_one_query(self):
+        """Все имена текста ищутся одним запросом, автор не упоминается."""
+
+        with self.assertNumQueries(1):
+            users = mentions.resolve(['reader', 'friend.1', 'nobody'])
+        self.assertEqual(set(users), {'reader', 'friend.1'})
+
+        post = Post.objects.create(
+            author=MentionsTests.author,
+            text='@reader и @friend.1, а еще @nobody и @author')
+        self.assertEqual(self.mentioned(post), {'reader', 'friend.1'})
+
+    def test_edit_keeps_existing_mentions(self):
+        """Правка удаляет пропавшие упоминания и не повторяет старые."""
+
+        post = Post.objects.create(author=MentionsTests.author,
+                                   text='@reader привет')
+        first = Mention.objects.get(post=post)
+
+        post.text = '@reader и @friend.1'
+        post.save()
+        self.assertEqual(self.mentioned(post), {'reader', 'friend.1'})
+        self.assertTrue(Mention.objects.filter(id=first.id).exists())
+
+        post.text = 'без упоминаний'
+        post.save()
+        self.assertEqual(self.mentioned(post), set())
+
+    @override_settings(POSTS_ON_PAGE=2)
+    def test_inbox_pages(self):
+        """Входящие упоминания листаются по курсору от новых к старым."""
+
+        post = Post.objects.create(author=MentionsTests.author, text='Пост')
+        comments = [
+            Comment.objects.create(author=MentionsTests.author, post=post,
+                                   text=f'@reader, комментарий {i}')
+            for i in range(5)
+        ]
+        self.assertEqual(self.mentioned(post, comments[0]), {'reader'})
+
+        url = reverse('posts:mentions')
+        seen = []
+        cursor = None
+        while True:
+            response = self.reader_client.get(
+                url, {'before': cursor} if cursor else {})
+            page = response.context['page']
+            seen += [mention.comment_id for mention in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [comment.id for comment in comments[::-1]])
+
+    def test_mentions_link_to_profiles(self):
+        """Ссылку на профиль получают только найденные пользователи."""
+
+        post = Post.objects.create(author=MentionsTests.author,
+                                   text='Спасибо @friend.1 и #всем')
+        Comment.objects.create(author=MentionsTests.author, post=post,
+                               text="<b>@reader's</b> & @nobody")
+        response = self.reader_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(
+            response,
+            f'<a href="{reverse("posts:profile", args=["friend.1"])}">'
+            f'@friend.1</a>')
+        self.assertContains(
+            response,
+            f'<a href="{reverse("posts:tag_feed", args=["всем"])}">'
+            f'#всем</a>')
+        self.assertContains(
+            response,
+            f'&lt;b&gt;<a href="{reverse("posts:profile", args=["reader"])}">'
+            f'@reader</a>&#39;s&lt;/b&gt; &amp; @nobody')
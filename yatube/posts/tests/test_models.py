@@ -1,7 +1,12 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 
-from ..models import Group, Post
+from ..models import Group, Post, make_preview
 
 User = get_user_model()
 
@@ -57,3 +62,50 @@ class PostsModelsTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+@override_settings(POST_PREVIEW_LENGTH=20, POST_PREVIEW_PARAGRAPHS=2)
+class PostPreviewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_make_preview(self):
+        """Начало обрезается по абзацам и по границе слова."""
+        cases = {
+            'Короткий пост': ('Короткий пост', False),
+            'Первый\n\nВторой\n \nТретий': ('Первый\n\nВторой', True),
+            'Очень длинное предложение поста': ('Очень длинное…', True),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(make_preview(text), expected)
+
+    def test_preview_saved_and_backfilled(self):
+        """Начало пишется при сохранении и заполняется командой."""
+        post = Post.objects.create(
+            author=PostPreviewTest.user, text='Короткий пост')
+        post.text = 'Очень длинное предложение поста'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.preview, 'Очень длинное…')
+        self.assertTrue(post.has_more)
+
+        Post.objects.filter(id=post.id).update(preview='', has_more=False)
+        out = StringIO()
+        call_command('backfill_previews', stdout=out)
+        self.assertIn('Обновлено постов: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.preview, 'Очень длинное…')
+
+    def test_preview_filled_by_migration(self):
+        """Миграция заполняет начало у постов, созданных до нее."""
+        migration = import_module('posts.migrations.0009_post_preview')
+        post = Post.objects.create(
+            author=PostPreviewTest.user,
+            text='Очень длинное предложение поста')
+        Post.objects.filter(id=post.id).update(preview='', has_more=False)
+        migration.fill_previews(apps, None)
+        post.refresh_from_db()
+        self.assertEqual(post.preview, 'Очень длинное…')
+        self.assertTrue(post.has_more)
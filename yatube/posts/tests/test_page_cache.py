@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import page_cache, view_counter
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        view_counter.reset()
+        self.guest_client = Client()
+
+    def test_anonymous_pages_cached_with_keys(self):
+        """Повторный запрос гостя отдается из кэша с ключами в заголовке."""
+
+        post = PageCacheTests.post
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        keys = response['Surrogate-Key'].split()
+        self.assertIn(f'group-{post.group_id}', keys)
+        self.assertIn(f'post-{post.id}', keys)
+        self.assertIn(f'author-{post.author_id}', keys)
+
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response['Surrogate-Key'].split(), keys)
+
+    def test_authorized_not_cached(self):
+        """Авторизованным страницы не кэшируются."""
+
+        client = Client()
+        client.force_login(PageCacheTests.user)
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        client.get(url)
+        response = client.get(url)
+        self.assertNotIn('X-Cache', response)
+        self.assertIsNotNone(response.context)
+
+    def test_purge_evicts_only_affected_pages(self):
+        """Запись сбрасывает ровно страницы со своими ключами."""
+
+        post = PageCacheTests.post
+        group_url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        other_url = reverse('posts:group_list', kwargs={'slug': 'other-slug'})
+        detail_url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        for url in (group_url, other_url, detail_url):
+            self.guest_client.get(url)
+
+        Comment.objects.create(post=post, author=post.author, text='Ого')
+
+        self.assertEqual(self.guest_client.get(detail_url)['X-Cache'], 'MISS')
+        self.assertEqual(self.guest_client.get(group_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.guest_client.get(other_url)['X-Cache'], 'HIT')
+
+        Post.objects.create(
+            author=post.author, group=PageCacheTests.other_group, text='x')
+
+        self.assertEqual(self.guest_client.get(other_url)['X-Cache'], 'MISS')
+        # Страница группы показывает автора нового поста
+        self.assertEqual(self.guest_client.get(group_url)['X-Cache'], 'MISS')
+
+    def get_purging(self, url, key):
+        """Запрос, во время отрисовки которого сбрасывают ключ key."""
+
+        purged = []
+
+        def purge(execute, sql, params, many, context):
+            if not purged:
+                purged.append(key)
+                page_cache.purge(key)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(purge):
+            return self.guest_client.get(url)
+
+    def test_purge_during_render(self):
+        """Страницу, ключ которой сбросили во время отрисовки, не
+        сохраняют, а сброс чужого ключа ей не мешает."""
+
+        post = PageCacheTests.post
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+
+        response = self.get_purging(url, f'post-{post.id}')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self.guest_client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.guest_client.get(url)['X-Cache'], 'HIT')
+
+        cache.clear()
+        self.get_purging(url, f'group-{PageCacheTests.other_group.id}')
+        self.assertEqual(self.guest_client.get(url)['X-Cache'], 'HIT')
+
+    def test_cached_detail_counts_views(self):
+        """Просмотр закэшированной страницы поста засчитывается."""
+
+        post = PageCacheTests.post
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        self.guest_client.get(url)
+        self.guest_client.get(url)
+        self.assertEqual(view_counter.pending(post.id), 2)
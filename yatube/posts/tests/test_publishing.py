@@ -0,0 +1,165 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import events, feed, publishing, repository
+from ..models import Follow, Mention, Post, PostTag
+from ..rows import feed_rows
+
+User = get_user_model()
+
+
+class PublishingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(PublishingTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(PublishingTests.reader)
+
+    def index_ids(self):
+        response = self.client.get(reverse('posts:index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def create(self, text, **publication):
+        data = {'text': text}
+        data.update({f'publication-{key}': value
+                     for key, value in publication.items()})
+        self.author_client.post(reverse('posts:post_create'), data)
+        return Post.objects.get(text=text)
+
+    def test_draft_is_hidden(self):
+        """Черновик не попадает в ленты и виден только автору."""
+
+        post = self.create('Черновик #тайна', draft='on')
+        self.assertEqual(post.status, Post.DRAFT)
+        self.assertNotIn(post.id, self.index_ids())
+        self.assertFalse(PostTag.objects.filter(post=post).exists())
+
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        self.assertEqual(self.reader_client.get(url).status_code, 404)
+        self.assertEqual(self.author_client.get(url).status_code, 200)
+        response = self.author_client.get(reverse('posts:drafts'))
+        self.assertEqual([draft.id for draft in response.context['posts']],
+                         [post.id])
+
+    def test_scheduled_post_released_when_due(self):
+        """Запланированный пост выходит при выпуске со своей датой."""
+
+        publish_at = timezone.now() + timedelta(hours=1)
+        post = self.create('Позже #анонс', publish_at=publish_at.strftime(
+            '%Y-%m-%dT%H:%M'))
+        self.assertEqual(post.status, Post.SCHEDULED)
+
+        # Поток автора уже в кэше: выпуск должен его дополнить
+        self.assertEqual(feed.streams_many([post.author_id])[
+            post.author_id]['count'], 0)
+        self.assertEqual(publishing.release_due(), 0)
+
+        released = publishing.release_due(
+            now=publish_at + timedelta(minutes=1), batch_size=1)
+        self.assertEqual(released, 1)
+        post.refresh_from_db()
+        self.assertTrue(post.is_published)
+        self.assertEqual(post.pub_date, post.publish_at)
+        self.assertIn(post.id, self.index_ids())
+        self.assertTrue(PostTag.objects.filter(post=post).exists())
+        self.assertEqual(events.latest(), post.releases.get().id)
+
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual([row.id for row in response.context['page_obj']],
+                         [post.id])
+
+    def test_released_post_reaches_events(self):
+        """Отложенный пост, выпущенный после более новых, попадает в
+        поток событий."""
+
+        publish_at = timezone.now() + timedelta(hours=1)
+        scheduled = self.create('Позже', publish_at=publish_at.strftime(
+            '%Y-%m-%dT%H:%M'))
+        newer = self.create('Сразу')
+        self.assertGreater(newer.id, scheduled.id)
+        since = events.latest()
+
+        publishing.release_due(now=publish_at + timedelta(minutes=1))
+        response = self.client.get(
+            reverse('posts:post_events'), {'since': since})
+        self.assertIn('"count": 1', response.content.decode())
+        self.assertGreater(events.latest(), since)
+
+    def test_publish_draft_from_edit(self):
+        """Черновик, сохраненный без отметки, публикуется сразу."""
+
+        post = self.create('Черновик', draft='on')
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            {'text': 'Готово'})
+        post.refresh_from_db()
+        self.assertTrue(post.is_published)
+        self.assertEqual(post.text, 'Готово')
+        self.assertEqual(self.index_ids(), [post.id])
+
+    def test_draft_comments_stay_private(self):
+        """Комментарий к черновику не попадает в популярное и упоминания
+        до выпуска поста."""
+
+        post = self.create('Черновик', draft='on')
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            {'text': '@reader глянь'})
+        response = self.client.get(reverse('posts:trending'))
+        self.assertNotContains(response, 'Черновик')
+        self.assertFalse(Mention.objects.exists())
+
+        publishing.publish_now(post)
+        self.assertTrue(Mention.objects.filter(
+            user=PublishingTests.reader, comment__isnull=False).exists())
+
+    def test_edit_does_not_restore_cached_fields(self):
+        """Правка не возвращает поля из устаревшей копии в кэше."""
+
+        publish_at = timezone.now() + timedelta(hours=1)
+        post = self.create('Позже', publish_at=publish_at.strftime(
+            '%Y-%m-%dT%H:%M'))
+        repository.get_post(post.id)
+        # Выпуск и просмотры мимо кэша этого процесса
+        Post.objects.filter(id=post.id).update(
+            status=Post.PUBLISHED, views=10)
+
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            {'text': 'Уже вышел'})
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PUBLISHED)
+        self.assertEqual(post.views, 10)
+        self.assertEqual(post.text, 'Уже вышел')
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+    def test_feed_queries_use_indexes(self):
+        """Ленты выбирают опубликованные посты по индексу без сортировки."""
+
+        querysets = {
+            'post_feed': Post.objects.published(),
+            'post_author_feed': PublishingTests.author.posts.published(),
+            'post_group_feed': Post.objects.published().filter(group_id=1),
+        }
+        for index, queryset in querysets.items():
+            with self.subTest(index=index):
+                sql, params = feed_rows(queryset)[:10].query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertIn(f'USING INDEX {index}', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
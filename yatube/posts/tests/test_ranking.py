@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import checks, ranking
+from ..models import Comment, Follow, Group, Post, TrendingScore
+
+User = get_user_model()
+
+HOUR = 60 * 60
+
+
+@override_settings(TRENDING_HALF_LIFE=HOUR, TRENDING_SIZE=2)
+class RankingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='someone')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.quiet_post = Post.objects.create(
+            text='Тихий пост', author=cls.user)
+        cls.hot_post = Post.objects.create(
+            text='Горячий пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_comments_and_follows_rank_posts(self):
+        """Комментарии и подписки поднимают пост и его группу."""
+
+        Comment.objects.create(
+            text='Комментарий', author=RankingTests.user,
+            post=RankingTests.quiet_post)
+        Follow.objects.create(
+            user=RankingTests.user, author=RankingTests.author)
+
+        response = self.guest_client.get(reverse('posts:trending'))
+
+        self.assertEqual(
+            response.context['post_list'],
+            [RankingTests.hot_post, RankingTests.quiet_post])
+        self.assertEqual(
+            response.context['hot_groups'], [RankingTests.group])
+
+    def test_old_activity_decays(self):
+        """Старая активность весит меньше свежей."""
+
+        now = 1_000_000 * HOUR
+        for _ in range(3):
+            ranking.bump(ranking.POSTS, 1, 1, now=now - HOUR)
+        ranking.bump(ranking.POSTS, 2, 1, now=now)
+
+        self.assertEqual(ranking.trending_post_ids(2), [1, 2])
+
+        ranking.bump(ranking.POSTS, 2, 1, now=now)
+
+        self.assertEqual(ranking.trending_post_ids(2), [2, 1])
+
+    @override_settings(TRENDING_PRUNE_INTERVAL=0,
+                       TRENDING_PRUNE_HALF_LIVES=10)
+    def test_decayed_items_pruned(self):
+        """Затухшие элементы удаляются из рейтинга."""
+
+        now = 1_000_000 * HOUR
+        ranking.bump(ranking.POSTS, 1, 1, now=now - 20 * HOUR)
+        ranking.bump(ranking.POSTS, 2, 1, now=now - HOUR)
+        ranking.bump(ranking.POSTS, 3, 1, now=now)
+
+        self.assertEqual(ranking.trending_post_ids(10), [3, 2])
+        self.assertFalse(TrendingScore.objects.filter(item_id=1).exists())
+
+    @override_settings(TRENDING_PRUNE_INTERVAL=HOUR)
+    def test_concurrent_bumps_add_up(self):
+        """События из разных процессов складываются, а не затирают друг
+        друга: каждое — одна запись в БД."""
+
+        now = 1_000_000 * HOUR
+        ranking.bump(ranking.POSTS, 1, 1, now=now)
+        with self.assertNumQueries(1):
+            ranking.bump(ranking.POSTS, 1, 1, now=now)
+        score = TrendingScore.objects.get(kind=ranking.POSTS, item_id=1)
+        self.assertAlmostEqual(score.score, 1 + now / HOUR)
+
+    def test_old_sqlite_reported(self):
+        """Слишком старый SQLite — ошибка проверки posts.E001."""
+
+        with mock.patch.object(checks.sqlite3, 'sqlite_version_info',
+                               (3, 22, 0)):
+            errors = checks.sqlite_version_check(None)
+        self.assertEqual([error.id for error in errors], ['posts.E001'])
+        self.assertEqual(checks.sqlite_version_check(None), [])
@@ -0,0 +1,166 @@
+import warnings
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.http import Http404
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import repository
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class RepositoryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_lookup_without_queries(self):
+        """Повторная выборка поста берется из кэша вместе со связями."""
+
+        repository.get_post(RepositoryTests.post.id)
+        repository.get_group('test-slug')
+        repository.get_user('auth')
+        with self.assertNumQueries(0):
+            post = repository.get_post(RepositoryTests.post.id)
+            self.assertEqual(post.author.username, 'auth')
+            self.assertEqual(post.group.slug, 'test-slug')
+            self.assertEqual(repository.get_group('test-slug'),
+                             RepositoryTests.group)
+            self.assertEqual(repository.get_user('auth'),
+                             RepositoryTests.user)
+
+    def test_get_many_single_query(self):
+        """Промахи списка добираются одним запросом."""
+
+        posts = [Post.objects.create(author=RepositoryTests.user, text='x')
+                 for _ in range(3)]
+        cache.clear()
+        repository.posts.get_many([posts[0].id])
+
+        with self.assertNumQueries(1):
+            found = repository.posts.get_many(post.id for post in posts)
+        self.assertEqual(set(found), {post.id for post in posts})
+
+    def test_invalidated_on_save_and_delete(self):
+        """Сохранение и удаление сбрасывают кэш."""
+
+        group = Group.objects.get(slug='test-slug')
+        repository.get_group(group.slug)
+
+        group.slug = 'renamed'
+        group.save()
+        self.assertEqual(repository.get_group('renamed').slug, 'renamed')
+        with self.assertRaises(Http404):
+            repository.get_group('test-slug')
+
+        post = Post.objects.create(author=RepositoryTests.user, text='x')
+        repository.get_post(post.id)
+        post.delete()
+        with self.assertRaises(Http404):
+            repository.get_post(post.id)
+
+    def test_missing_cached_until_created(self):
+        """Отсутствие объекта кэшируется и сбрасывается при создании."""
+
+        with self.assertRaises(Http404):
+            repository.get_group('new-slug')
+        with self.assertNumQueries(0), self.assertRaises(Http404):
+            repository.get_group('new-slug')
+
+        group = Group.objects.create(title='Новая', slug='new-slug')
+        self.assertEqual(repository.get_group('new-slug'), group)
+
+        post_id = RepositoryTests.post.id + 100
+        with self.assertRaises(Http404):
+            repository.get_post(post_id)
+        with self.assertNumQueries(0):
+            response = Client().get(
+                reverse('posts:post_detail', kwargs={'post_id': post_id}))
+        self.assertEqual(response.status_code, 404)
+
+        Post.objects.create(id=post_id, author=RepositoryTests.user, text='x')
+        self.assertEqual(repository.get_post(post_id).id, post_id)
+
+    def test_cached_user_without_secrets(self):
+        """Пользователь лежит в кэше без пароля и дат входа."""
+
+        repository.get_user('auth')
+        cached = cache.get(repository.users.key(RepositoryTests.user.id))
+        self.assertEqual(cached.username, 'auth')
+        self.assertNotIn('password', cached.__dict__)
+        self.assertNotIn('last_login', cached.__dict__)
+
+    def test_lookup_key_any_value(self):
+        """Ключ поиска годится для memcached при любом значении поля."""
+
+        group = Group.objects.create(title='Группа', slug='группа дня')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            self.assertEqual(repository.get_group('группа дня'), group)
+            self.assertEqual(repository.get_group('группа дня'), group)
+
+    def test_identity_map(self):
+        """В пределах запроса объект загружается один раз."""
+
+        repository.begin()
+        try:
+            first = repository.get_user('auth')
+            with self.assertNumQueries(0):
+                self.assertIs(repository.users.get(first.id), first)
+        finally:
+            repository.end()
+
+    def test_post_detail_after_group_deleted(self):
+        """После удаления группы страница ее поста открывается без
+        группы."""
+
+        group = Group.objects.create(title='Удаляемая', slug='deleted')
+        post = Post.objects.create(author=RepositoryTests.user, group=group,
+                                   text='Пост удаляемой группы')
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        self.client.get(url)
+
+        group.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['post'].group)
+
+        # Пост в кэше со ссылкой на удаленную группу тоже не ломает
+        # страницу
+        stale = Post.objects.get(id=post.id)
+        stale.group_id = group.id
+        cache.set(repository.posts.key(post.id), stale)
+        self.assertIsNone(repository.get_post(post.id).group)
+
+    def test_post_detail_from_cache(self):
+        """Страница поста не загружает пост, автора и группу повторно."""
+
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': RepositoryTests.post.id})
+        client = Client()
+        client.force_login(RepositoryTests.user)
+        client.get(url)
+        # Остаются сессия, пользователь, число постов автора, комментарии
+        # и упомянутые
+        with self.assertNumQueries(5):
+            response = client.get(url)
+        self.assertEqual(response.context['post'], RepositoryTests.post)
@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import revisions
+from ..models import Post, PostRevision
+
+User = get_user_model()
+
+
+class RevisionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(author=RevisionsTests.author,
+                                        text='Первая версия поста')
+
+    def edit(self, *texts):
+        for text in texts:
+            self.post.text = text
+            self.post.save()
+
+    def test_diff_roundtrip(self):
+        """patch(old, diff(old, new)) дает new, пробелы сохраняются."""
+
+        pairs = [
+            ('', 'новый текст'),
+            ('старый  текст\nв две строки', ''),
+            ('один два три четыре', 'один три  пять четыре\n'),
+            ('  отступ и слово', '\tотступ, слово  '),
+        ]
+        for old, new in pairs:
+            with self.subTest(old=old, new=new):
+                self.assertEqual(
+                    revisions.patch(old, revisions.diff(old, new)), new)
+
+    @override_settings(REVISION_DIFF_MAX_TOKENS=10)
+    def test_diff_skips_common_ends(self):
+        """Общие начало и конец не сравниваются; правка, меняющая больше
+        REVISION_DIFF_MAX_TOKENS слов, сохраняется целиком."""
+
+        words = [f'слово{i}' for i in range(100)]
+        old = ' '.join(words)
+        new = ' '.join(words[:50] + ['правка'] + words[51:])
+        self.assertEqual(revisions.diff(old, new), [50, -1, 'правка ', 49])
+
+        rewritten = ' '.join(reversed(words))
+        self.assertIsNone(revisions.diff(old, rewritten))
+        self.edit(old, new, rewritten)
+        self.assertEqual(
+            list(self.post.revisions.values_list('snapshot', flat=True)
+                 .order_by('number')), [True, True, False, True])
+        self.assertEqual(revisions.text(self.post.id, 3), new)
+        self.assertEqual(revisions.text(self.post.id, 4), rewritten)
+
+    @override_settings(REVISION_SNAPSHOT_INTERVAL=3)
+    def test_snapshots_bound_rebuild(self):
+        """Снимок раз в REVISION_SNAPSHOT_INTERVAL версий, любая версия
+        восстанавливается одним запросом."""
+
+        texts = [f'Версия {i} поста, правка номер {i}' for i in range(2, 9)]
+        self.edit(*texts)
+        snapshots = list(PostRevision.objects.filter(
+            post=self.post, snapshot=True).values_list('number', flat=True))
+        self.assertEqual(snapshots, [1, 4, 7])
+
+        texts.insert(0, 'Первая версия поста')
+        for number, text in enumerate(texts, 1):
+            with self.subTest(number=number), self.assertNumQueries(1):
+                self.assertEqual(revisions.text(self.post.id, number), text)
+        self.assertIsNone(revisions.text(self.post.id, len(texts) + 1))
+
+    def test_unchanged_text_not_recorded(self):
+        """Сохранение без смены текста версию не добавляет."""
+
+        self.post.views = 5
+        self.post.save()
+        self.post.save(update_fields=['views'])
+        self.assertEqual(self.post.revisions.count(), 1)
+
+    @override_settings(REVISIONS_ON_PAGE=2)
+    def test_history_pages(self):
+        """История листается от новых версий к старым, видна только автору."""
+
+        self.edit('Вторая', 'Третья', 'Четвертая', 'Пятая')
+        url = reverse('posts:post_history', kwargs={'post_id': self.post.id})
+
+        reader = Client()
+        reader.force_login(RevisionsTests.reader)
+        self.assertEqual(reader.get(url).status_code, 404)
+
+        client = Client()
+        client.force_login(RevisionsTests.author)
+        seen = []
+        cursor = None
+        while True:
+            response = client.get(url, {'before': cursor} if cursor else {})
+            page = response.context['page']
+            seen += [revision.number for revision in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [5, 4, 3, 2, 1])
+
+        response = client.get(reverse(
+            'posts:post_revision',
+            kwargs={'post_id': self.post.id, 'number': 3}))
+        self.assertEqual(response.context['text'], 'Третья')
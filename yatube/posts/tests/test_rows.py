@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..rows import PostRow, feed_rows
+
+User = get_user_model()
+
+
+class PostRowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(
+            username='auth', first_name='Имя', last_name='Фамилия')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='С группой',
+            image='posts/small.gif')
+        Post.objects.create(author=cls.user, text='Без группы')
+
+    def test_rows_match_models(self):
+        """Строки отдают те же значения, что читают шаблоны у моделей."""
+
+        rows = list(feed_rows(Post.objects.all()))
+        posts = list(Post.objects.select_related('author', 'group'))
+        self.assertEqual(rows, posts)
+        for row, post in zip(rows, posts):
+            with self.subTest(post=post.text):
+                self.assertIsInstance(row, PostRow)
+                self.assertEqual(row.preview, post.text)
+                self.assertEqual(row.pub_date, post.pub_date)
+                self.assertEqual(row.author.get_full_name(),
+                                 post.author.get_full_name())
+                self.assertEqual(str(row.group), str(post.group))
+                self.assertEqual(row.image, post.image.name)
+                self.assertEqual(row.detail_url, reverse(
+                    'posts:post_detail', args=[post.id]))
+        self.assertEqual(rows[1].image.url, PostRowTests.post.image.url)
+        self.assertEqual(rows[1].group.slug, 'test-slug')
+        # Автор один на всю страницу
+        self.assertIs(rows[0].author, rows[1].author)
+
+    def test_lazy_queryset(self):
+        """Выборка остается ленивой, считается и режется на страницы."""
+
+        rows = feed_rows(Post.objects.all())
+        with self.assertNumQueries(1):
+            self.assertEqual(rows.count(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(rows[:1])), 1)
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import tags
+from ..models import Post, PostTag, Tag, extract_tags
+
+User = get_user_model()
+
+
+class ExtractTagsTest(TestCase):
+
+    def test_extract_tags(self):
+        """Теги в нижнем регистре, без повторов и без #внутри слов."""
+
+        self.assertEqual(
+            extract_tags('#Привет, мир! #python #PYTHON a#b ##x &#39; #t_1.'),
+            ['привет', 'python', 't_1'])
+
+
+@override_settings(POSTS_ON_PAGE=3)
+class TagFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        now = timezone.now()
+        # Одинаковые даты: порядок внутри них задает id
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост {i} #общий #tag{i % 2}',
+                 pub_date=now - timedelta(minutes=i // 2))
+            for i in range(8)
+        )
+        call_command('reindex_tags', stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def expected(self, name):
+        return list(Post.objects.filter(
+            tag_entries__tag__name=name).order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+
+    def walk(self, name):
+        """id постов ленты тега, страница за страницей по курсору."""
+        tag = Tag.objects.get(name=name)
+        post_ids = []
+        cursor = None
+        while True:
+            page = tags.page(tag, cursor)
+            post_ids += [post.id for post in page]
+            if not page.has_next:
+                return post_ids
+            cursor = page.next_cursor
+
+    def test_keyset_pages_match_query(self):
+        """Курсорные страницы дают ту же ленту, что и запрос к постам."""
+
+        self.assertEqual(self.walk('общий'), self.expected('общий'))
+        self.assertEqual(self.walk('tag1'), self.expected('tag1'))
+
+    def test_index_follows_post_text(self):
+        """Индекс обновляется при создании и правке поста."""
+
+        post = Post.objects.create(author=TagFeedTests.author,
+                                   text='Новый #Свежий пост')
+        self.assertEqual(self.walk('свежий'), [post.id])
+
+        post.text = 'Без тегов'
+        post.save()
+        self.assertFalse(PostTag.objects.filter(post=post).exists())
+
+    def test_tag_feed_page(self):
+        """Страница тега, переход по курсору и 404 для неизвестного тега."""
+
+        url = reverse('posts:tag_feed', kwargs={'name': 'Общий'})
+        response = self.client.get(url)
+        page = response.context['page']
+        self.assertEqual(len(page), 3)
+        self.assertContains(response, f'?before={page.next_cursor}')
+
+        response = self.client.get(url, {'before': page.next_cursor})
+        self.assertEqual(
+            [post.id for post in response.context['page']],
+            self.expected('общий')[3:6])
+
+        response = self.client.get(
+            reverse('posts:tag_feed', kwargs={'name': 'нет'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_hashtags_link_to_feed(self):
+        """В тексте поста теги ведут на ленты тегов."""
+
+        post = Post.objects.get(text__startswith='Пост 0 ')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(
+            response,
+            f'<a href="{reverse("posts:tag_feed", args=["tag0"])}">'
+            f'#tag0</a>')
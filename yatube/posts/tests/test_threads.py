@@ -0,0 +1,187 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import threads
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class ThreadsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(ThreadsTests.author)
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(author=ThreadsTests.author,
+                                      post=ThreadsTests.post, text=text,
+                                      parent=parent)
+
+    def test_thread_in_tree_order(self):
+        """Ветка читается одним запросом: ответ сразу под родителем,
+        ответы от старых к новым, счетчики ответов растут."""
+
+        root = self.comment('корень')
+        first = self.comment('первый', root)
+        second = self.comment('второй', root)
+        nested = self.comment('ответ первому', first)
+        self.comment('другая ветка')
+
+        with self.assertNumQueries(1):
+            comments = threads.thread(root)
+        self.assertEqual([comment.text for comment in comments],
+                         ['корень', 'первый', 'ответ первому', 'второй'])
+        self.assertEqual([comment.depth for comment in comments],
+                         [0, 1, 2, 1])
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 2)
+        self.assertEqual(threads.root_id(nested), root.id)
+
+        second.delete()
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 1)
+
+    @override_settings(COMMENT_MAX_DEPTH=1)
+    def test_deep_reply_goes_to_grandparent(self):
+        """Ответ глубже COMMENT_MAX_DEPTH становится ответом выше."""
+
+        root = self.comment('корень')
+        reply = self.comment('ответ', root)
+        deep = self.comment('ответ на ответ', reply)
+        self.assertEqual(deep.parent_id, root.id)
+        self.assertEqual(deep.depth, 1)
+        self.assertEqual(deep.ordinal, 2)
+
+    @override_settings(COMMENTS_ON_PAGE=2, COMMENT_REPLIES_SHOWN=1)
+    def test_page_shows_first_replies(self):
+        """Обсуждения идут от новых к старым, под каждым — первые ответы."""
+
+        roots = [self.comment(f'обсуждение {i}') for i in range(3)]
+        for root in roots:
+            reply = self.comment(f'ответ 1 на {root.text}', root)
+            self.comment(f'ответ 2 на {root.text}', root)
+            self.comment('глубже', reply)
+
+        with self.assertNumQueries(1):
+            page = threads.page(ThreadsTests.post.id)
+        self.assertEqual([root.id for root in page],
+                         [roots[2].id, roots[1].id])
+        self.assertEqual(
+            [[reply.text for reply in root.shown_replies] for root in page],
+            [['ответ 1 на обсуждение 2'], ['ответ 1 на обсуждение 1']])
+
+        page = threads.page(ThreadsTests.post.id, page.next_cursor)
+        self.assertEqual([root.id for root in page], [roots[0].id])
+        self.assertFalse(page.has_next)
+
+    def test_rebuild_matches_incremental(self):
+        """rebuild() после bulk_create дает те же пути и счетчики."""
+
+        root = self.comment('корень')
+        reply = self.comment('ответ', root)
+        self.comment('ответ на ответ', reply)
+        fields = ('id', 'path', 'depth', 'ordinal', 'reply_count')
+        placed = list(Comment.objects.order_by('id').values_list(*fields))
+
+        Comment.objects.update(path='', depth=0, ordinal=0, reply_count=0)
+        threads.rebuild(Comment.objects.all())
+        self.assertEqual(
+            list(Comment.objects.order_by('id').values_list(*fields)), placed)
+
+    def test_reply_view(self):
+        """Ответ из формы ветки попадает в ветку, чужой пост — 404."""
+
+        root = self.comment('корень')
+        response = self.client.post(
+            reverse('posts:add_reply', kwargs={
+                'post_id': ThreadsTests.post.id, 'parent_id': root.id}),
+            {'text': 'ответ'})
+        reply = Comment.objects.get(text='ответ')
+        thread_url = reverse('posts:comment_thread', kwargs={
+            'post_id': ThreadsTests.post.id, 'comment_id': root.id})
+        self.assertRedirects(response, f'{thread_url}#comment-{reply.id}')
+        self.assertEqual(reply.parent_id, root.id)
+        self.assertEqual(
+            list(self.client.get(thread_url).context['comments']),
+            [root, reply])
+
+        other = Post.objects.create(author=ThreadsTests.author, text='Другой')
+        response = self.client.post(
+            reverse('posts:add_reply', kwargs={
+                'post_id': other.id, 'parent_id': root.id}),
+            {'text': 'мимо'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_reply_to_deleted_comment(self):
+        """Ответ на удаленный за это время комментарий — 404."""
+
+        root = self.comment('корень')
+        table = connection.ops.quote_name(Comment._meta.db_table)
+
+        def delete_parent(execute, sql, params, many, context):
+            # Комментарий удаляют между проверкой в представлении и
+            # увеличением счетчика ответов
+            if sql.startswith('UPDATE') and 'reply_count' in sql:
+                context['cursor'].execute(
+                    f'DELETE FROM {table} WHERE id = %s', [root.id])
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(delete_parent):
+            response = self.client.post(
+                reverse('posts:add_reply', kwargs={
+                    'post_id': ThreadsTests.post.id, 'parent_id': root.id}),
+                {'text': 'ответ'})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Comment.objects.filter(text='ответ').exists())
+
+    def test_failed_reply_keeps_count(self):
+        """Неудачная вставка ответа не увеличивает счетчик родителя."""
+
+        root = self.comment('корень')
+
+        def fail_insert(execute, sql, params, many, context):
+            if sql.startswith('INSERT') and 'ответ' in params:
+                raise DatabaseError('вставка не удалась')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(fail_insert), \
+                self.assertRaises(DatabaseError):
+            self.client.post(
+                reverse('posts:add_reply', kwargs={
+                    'post_id': ThreadsTests.post.id, 'parent_id': root.id}),
+                {'text': 'ответ'})
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 0)
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+    def test_queries_use_thread_index(self):
+        """Ветка и страница обсуждений читаются диапазоном индекса."""
+
+        root = self.comment('корень')
+        querysets = {
+            'thread': Comment.objects.filter(
+                post_id=root.post_id, path__gte=root.path,
+                path__lt=root.path + threads.PATH_END).order_by('path'),
+            'page': Comment.objects.filter(
+                post_id=root.post_id, path__gte=root.path).order_by('path'),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(name=name):
+                sql, params = queryset.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertIn('USING INDEX comment_thread', plan)
+                self.assertIn('path>?', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..utils import pagination
+
+User = get_user_model()
+
+
+class ReverseMapTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='some.one+1@-_')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(text='С группой', author=cls.user, group=cls.group)
+        Post.objects.create(text='Без группы', author=cls.user)
+
+    def test_urls_match_reverse(self):
+        """Адреса постов на странице совпадают с reverse()."""
+
+        page_obj = pagination(None, Post.objects.select_related(
+            'author', 'group'))
+
+        for post in page_obj:
+            with self.subTest(post=post):
+                self.assertEqual(post.detail_url, reverse(
+                    'posts:post_detail', args=[post.pk]))
+                self.assertEqual(post.profile_url, reverse(
+                    'posts:profile', args=[post.author.username]))
+                self.assertEqual(post.group_url, reverse(
+                    'posts:group_list', args=[post.group.slug])
+                    if post.group else '')
@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import view_counter
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(VIEW_COUNTER_FLUSH_EVERY=5,
+                   VIEW_COUNTER_FLUSH_INTERVAL=60 * 60)
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='someone')
+        cls.post = Post.objects.create(text='Первый', author=cls.user)
+        cls.other_post = Post.objects.create(text='Второй', author=cls.user)
+
+    def setUp(self):
+        view_counter.reset()
+        # Гостям страница отдается из кэша страниц
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ViewCounterTests.user)
+
+    def test_views_are_buffered(self):
+        """Просмотры не пишутся в БД на каждом запросе."""
+
+        post = ViewCounterTests.post
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+
+        for expected in range(1, 4):
+            response = self.authorized_client.get(url)
+            self.assertEqual(response.context['views'], expected)
+
+        post.refresh_from_db()
+        self.assertEqual(post.views, 0)
+        self.assertEqual(view_counter.pending(post.id), 3)
+
+    def test_flush_writes_deltas_in_one_update(self):
+        """Накопленные просмотры записываются одним UPDATE."""
+
+        post = ViewCounterTests.post
+        other_post = ViewCounterTests.other_post
+        for _ in range(3):
+            view_counter.record_view(post.id)
+        view_counter.record_view(other_post.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            view_counter.flush()
+        self.assertEqual(
+            [query['sql'].split()[0] for query in queries
+             if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))],
+            ['UPDATE'])
+
+        post.refresh_from_db()
+        other_post.refresh_from_db()
+        self.assertEqual((post.views, other_post.views), (3, 1))
+        self.assertEqual(view_counter.pending(post.id), 0)
+
+    def test_flush_after_threshold(self):
+        """Буфер сбрасывается, когда набирается порог просмотров."""
+
+        post = ViewCounterTests.post
+        for _ in range(5):
+            view_counter.record_view(post.id)
+
+        post.refresh_from_db()
+        self.assertEqual(post.views, 5)
+
+    def test_failed_flush_keeps_views(self):
+        """Ошибка БД при сбросе не ломает страницу, просмотры ждут
+        следующего сброса."""
+
+        def locked(execute, sql, params, many, context):
+            if sql.startswith('UPDATE'):
+                raise OperationalError('database is locked')
+            return execute(sql, params, many, context)
+
+        post = ViewCounterTests.post
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        with connection.execute_wrapper(locked), \
+                self.assertLogs('posts.view_counter', 'WARNING'):
+            for _ in range(5):
+                response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(view_counter.pending(post.id), 5)
+
+        view_counter.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.views, 5)
@@ -8,14 +8,36 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_list, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('tag/<str:name>/', views.tag_feed, name='tag_feed'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
+    path('drafts/', views.drafts, name='drafts'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/history/',
+        views.post_history, name='post_history'
+    ),
+    path(
+        'posts/<int:post_id>/history/<int:number>/',
+        views.post_revision, name='post_revision'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment, name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comment/<int:parent_id>/',
+        views.add_comment, name='add_reply'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/',
+        views.comment_thread, name='comment_thread'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path('mentions/', views.mentions_inbox, name='mentions'),
+    path('trending/', views.trending, name='trending'),
+    path('events/posts/', views.post_events, name='post_events'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,16 +1,143 @@
-from typing import List, Tuple, Union
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple, Union
+from urllib.parse import quote
 
+from django.conf import settings
 from django.core.paginator import Page, Paginator
 from django.db.models import QuerySet
+from django.db.models.query import ModelIterable
+from django.urls import reverse
 
 from yatube.settings import POSTS_ON_PAGE
 
 from .models import Post
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Курсор постраничного вывода по ключу: дата и id последней строки
+Cursor = Tuple[datetime, int]
+
+# RFC 3986 sub-delims и символы, которые reverse() не экранирует в пути
+URL_SAFE_CHARS = "!$&'()*+,;=/~:@"
+
+
+class ReverseMap:
+    """Адреса постов, авторов и групп, вычисленные один раз на страницу.
+
+    reverse() вызывается по разу на маршрут с маркером вместо аргумента,
+    адрес конкретного объекта получается подстановкой значения.
+    """
+    MARKER = '9081726354'
+
+    def __init__(self):
+        self.detail = self._template('posts:post_detail')
+        self.profile = self._template('posts:profile')
+        self.group = self._template('posts:group_list')
+        self.tag = self._template('posts:tag_feed')
+
+    def _template(self, viewname: str) -> Tuple[str, str]:
+        url = reverse(viewname, args=[self.MARKER])
+        prefix, _, suffix = url.rpartition(self.MARKER)
+        return prefix, suffix
+
+    @staticmethod
+    def _format(template: Tuple[str, str], value) -> str:
+        prefix, suffix = template
+        return prefix + quote(str(value), safe=URL_SAFE_CHARS) + suffix
+
+    def profile_url(self, username: str) -> str:
+        return self._format(self.profile, username)
+
+    def tag_url(self, name: str) -> str:
+        return self._format(self.tag, name)
+
+    def attach(self, post: Post) -> Post:
+        """Проставляет посту detail_url, profile_url и group_url."""
+        post.detail_url = self._format(self.detail, post.pk)
+        post.profile_url = self.profile_url(post.author.username)
+        post.group_url = (
+            self._format(self.group, post.group.slug)
+            if post.group_id else ''
+        )
+        return post
+
+
+class ReverseMapIterable(ModelIterable):
+    """Выдает посты с адресами из одной ReverseMap на всю выборку."""
+
+    def __iter__(self):
+        reverse_map = ReverseMap()
+        for post in super().__iter__():
+            yield reverse_map.attach(post)
+
+
+def with_urls(post_list: Union[QuerySet, List[Post], Tuple[Post]]
+              ) -> Union[QuerySet, List[Post]]:
+    """Посты получат адреса при вычислении выборки.
+
+    Для QuerySet это происходит лениво, поэтому страница, отданная из
+    кэша шаблона, не выполняет запрос.
+    """
+    if isinstance(post_list, QuerySet):
+        # Строки лент (posts.rows) получают адреса сами
+        if not issubclass(post_list._iterable_class, ModelIterable):
+            return post_list
+        post_list = post_list._chain()
+        post_list._iterable_class = ReverseMapIterable
+        return post_list
+    reverse_map = ReverseMap()
+    return [reverse_map.attach(post) for post in post_list]
+
 
 def pagination(page_number: int,
                post_list: Union[QuerySet, List[Post], Tuple[Post]],
                posts_on_page: int = POSTS_ON_PAGE) -> Page:
 
-    paginator = Paginator(post_list, posts_on_page)
+    paginator = Paginator(with_urls(post_list), posts_on_page)
     return paginator.get_page(page_number)
+
+
+def feed_engine(view_name: str) -> str:
+    """Имя движка шаблонов для представления ленты."""
+    return settings.FEED_TEMPLATE_ENGINES.get(
+        view_name, settings.FEED_TEMPLATE_ENGINE)
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    moment, row_id = cursor
+    # Целые микросекунды: float потерял бы точность даты
+    return f'{(moment - EPOCH) // timedelta(microseconds=1)}-{row_id}'
+
+
+def decode_cursor(value: Optional[str]) -> Optional[Cursor]:
+    try:
+        micros, row_id = map(int, value.split('-'))
+        return EPOCH + timedelta(microseconds=micros), row_id
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+class KeysetPage:
+    """Страница, выбранная по ключу: строки и курсор следующей страницы.
+
+    first — страница открыта без курсора, то есть самая новая.
+    """
+
+    def __init__(self, items: list, next_cursor: Optional[str],
+                 first: bool):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.first = first
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
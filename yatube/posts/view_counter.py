@@ -0,0 +1,108 @@
+"""Счетчики просмотров постов с отложенной записью.
+
+Просмотры копятся в памяти процесса и сбрасываются в Post.views одним
+UPDATE на пачку постов, когда набралось VIEW_COUNTER_FLUSH_EVERY
+просмотров или прошло VIEW_COUNTER_FLUSH_INTERVAL секунд, а также при
+завершении процесса. При аварийном падении воркера теряется не больше
+одной такой порции. Если БД не приняла UPDATE (например, занята
+блокировкой), просмотры остаются в буфере до следующего сброса, а
+страница, на которой сработал сброс, отдается как обычно.
+
+Буфер не знает, к какой БД относится: тестовые раннеры
+(core.test_runner, tests/conftest.py) очищают его вокруг тестовой базы.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import repository
+from .models import Post
+
+# Постов в одном UPDATE
+FLUSH_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+_pending = Counter()
+_last_flush = time.monotonic()
+
+logger = logging.getLogger(__name__)
+
+
+def record_view(post_id: int) -> None:
+    with _lock:
+        _pending[post_id] += 1
+        due = (
+            sum(_pending.values()) >= settings.VIEW_COUNTER_FLUSH_EVERY
+            or time.monotonic() - _last_flush
+            >= settings.VIEW_COUNTER_FLUSH_INTERVAL
+        )
+    if due:
+        try:
+            flush()
+        except DatabaseError:
+            logger.warning('Просмотры не записаны, повторим позже',
+                           exc_info=True)
+
+
+def pending(post_id: int) -> int:
+    """Просмотры поста, еще не записанные в БД."""
+    return _pending.get(post_id, 0)
+
+
+def _write(deltas: Dict[int, int]) -> None:
+    post_ids = list(deltas)
+    for start in range(0, len(post_ids), FLUSH_BATCH_SIZE):
+        batch = post_ids[start:start + FLUSH_BATCH_SIZE]
+        Post.objects.filter(id__in=batch).update(views=F('views') + Case(
+            *[When(id=post_id, then=Value(deltas[post_id]))
+              for post_id in batch],
+            default=Value(0),
+            output_field=IntegerField()
+        ))
+        repository.posts.invalidate_ids(batch)
+
+
+def flush() -> None:
+    """Записывает накопленные просмотры в БД."""
+    global _last_flush
+
+    with _lock:
+        deltas = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not deltas:
+        return
+
+    try:
+        # Пачки пишутся вместе: иначе после ошибки на второй пачке
+        # первая вернулась бы в буфер и записалась дважды
+        with transaction.atomic():
+            _write(deltas)
+    except DatabaseError:
+        # Вернем просмотры в буфер, запишем их при следующем сбросе
+        with _lock:
+            _pending.update(deltas)
+        raise
+
+
+def reset() -> None:
+    """Отбрасывает незаписанные просмотры."""
+    with _lock:
+        _pending.clear()
+
+
+def _flush_at_exit() -> None:
+    try:
+        flush()
+    except DatabaseError:
+        pass
+
+
+atexit.register(_flush_at_exit)
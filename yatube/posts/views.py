@@ -1,31 +1,61 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         JsonResponse)
 from django.shortcuts import get_object_or_404, redirect, render
-
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import pagination
-
-
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+from core.query_budget import AUTH, query_budget
+
+from . import (events, feed, follow_graph, follows, mentions, page_cache,
+               publishing, ranking, repository, revisions, tags, threads,
+               view_counter)
+from .forms import CommentForm, FollowBulkForm, PostForm, PublicationForm
+from .models import Comment, Post, Tag, User
+from .rows import feed_rows
+from .tasks import warm_thumbnail
+from .utils import feed_engine, pagination, with_urls
+
+# Слагаемые бюджетов запросов (core.query_budget) при холодном кэше
+PAGE = 2  # COUNT и строки страницы ленты
+POST = 3  # пост из кэша с автором и группой (posts.repository)
+LOOKUP = 2  # группа или автор по slug или username: id и сам объект
+RANKING = 2  # оценки поста и группы в популярном
+ATOMIC = 2  # начало и конец транзакции (в тестах — точки сохранения)
+
+
+# Страница не переживает фрагмент index_page из шаблона. Лента и номер
+# канала событий
+@query_budget(AUTH + PAGE + 1)
+@page_cache.cache_anonymous(timeout=5)
 def index(request):
     template = 'posts/index.html'
 
     page_number = request.GET.get('page')
-    post_list = Post.objects.select_related('author', 'group')
+    post_list = feed_rows(Post.objects.published())
     page_obj = pagination(page_number, post_list)
 
     context = {
         'index': True,
         'page_obj': page_obj,
+        'events_since': events.latest(),
     }
 
-    return render(request, template, context)
+    response = render(request, template, context,
+                      using=feed_engine('index'))
+    return page_cache.tag(response, 'posts')
 
 
+@query_budget(AUTH + LOOKUP + PAGE)
+@page_cache.cache_anonymous()
 def group_list(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
+    group = repository.get_group(slug)
 
-    post_list = group.posts.select_related('author')
+    post_list = feed_rows(group.posts.published())
     page_number = request.GET.get('page')
     page_obj = pagination(page_number, post_list)
 
@@ -34,37 +64,96 @@ def group_list(request, slug):
         'page_obj': page_obj
     }
 
-    return render(request, template, context)
+    response = render(request, template, context,
+                      using=feed_engine('group_list'))
+    return page_cache.tag(response, f'group-{group.id}',
+                          *page_cache.post_keys(page_obj))
 
 
+# Автор, его лента, подписки читателя и подписчики автора
+@query_budget(AUTH + LOOKUP + PAGE + 2)
+@page_cache.cache_anonymous()
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = repository.get_user(username)
 
     following = False
     if request.user.is_authenticated:
-        following = Follow.objects.filter(user=request.user,
-                                          author=author).exists()
+        following = follow_graph.is_following(request.user.id, author.id)
 
-    post_list = author.posts.select_related('group')
+    post_list = feed_rows(author.posts.published())
     page_number = request.GET.get('page')
     page_obj = pagination(page_number, post_list)
 
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        'post_count': page_obj.paginator.count,
+        'follower_count': follow_graph.follower_count(author.id)
     }
 
-    return render(request, template, context)
+    response = render(request, template, context,
+                      using=feed_engine('profile'))
+    return page_cache.tag(response, f'author-{author.id}',
+                          *page_cache.post_keys(page_obj))
+
+
+# Тег, страница индекса тега и строки постов
+@query_budget(AUTH + 3)
+@page_cache.cache_anonymous()
+def tag_feed(request, name):
+    template = 'posts/tag.html'
+    tag = get_object_or_404(Tag, name=name.lower())
+    page = tags.page(tag, request.GET.get('before'))
+
+    context = {
+        'tag': tag,
+        'page': page,
+    }
+
+    response = render(request, template, context)
+    # Любой новый пост может попасть в ленту тега
+    return page_cache.tag(response, 'posts', *page_cache.post_keys(page))
+
+
+# Упоминания с авторами одним запросом
+@query_budget(AUTH + 1)
+@login_required
+def mentions_inbox(request):
+    template = 'posts/mentions.html'
+    page = mentions.inbox(request.user.id, request.GET.get('before'))
+    return render(request, template, {'page': page})
+
+
+def _check_visible(request, post):
+    """Неопубликованный пост видит только автор."""
+    if not post.is_published and post.author_id != request.user.id:
+        raise Http404
+    return post
+
+
+def _get_visible_post(request, post_id):
+    """Пост по id из кэша, для чтения."""
+    return _check_visible(request, repository.get_post(post_id))
+
 
+def _count_cached_view(request, post_id):
+    view_counter.record_view(post_id)
 
+
+# Пост, страница обсуждений, упомянутые и число постов автора
+@query_budget(AUTH + POST + 3)
+@page_cache.cache_anonymous(on_hit=_count_cached_view)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = _get_visible_post(request, post_id)
     author = post.author
 
-    comments = post.comments.select_related()
+    views = post.views + view_counter.pending(post.id) + 1
+    view_counter.record_view(post.id)
+
+    comments = threads.page(post.id, request.GET.get('comments'))
 
     form = CommentForm(request.POST or None)
 
@@ -75,46 +164,122 @@ def post_detail(request, post_id):
     context = {
         'author': author,
         'post': post,
+        'views': views,
         'user_can_edit': user_can_edit,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'mentioned': mentions.usernames(post.id),
     }
 
-    return render(request, template, context)
+    response = render(request, template, context)
+    return page_cache.tag(
+        response, f'comments-{post.id}', *page_cache.post_keys([post]),
+        *_comment_author_keys(
+            comment
+            for root in comments
+            for comment in (root, *root.shown_replies)))
+
+
+def _comment_author_keys(comments):
+    return dict.fromkeys(f'author-{comment.author_id}'
+                         for comment in comments)
+
+
+# Пост, корень ветки, ветка целиком и упомянутые
+@query_budget(AUTH + POST + 3)
+@page_cache.cache_anonymous()
+def comment_thread(request, post_id, comment_id):
+    template = 'posts/comment_thread.html'
+    post = _get_visible_post(request, post_id)
+    comment = get_object_or_404(Comment, id=comment_id, post_id=post.id)
+    comments = threads.thread(comment)
+
+    context = {
+        'post': post,
+        'comments': comments,
+        'form': CommentForm(auto_id=False),
+        'mentioned': mentions.usernames(post.id),
+    }
+
+    response = render(request, template, context)
+    return page_cache.tag(
+        response, f'comments-{post.id}', *page_cache.post_keys([post]),
+        *_comment_author_keys(comments))
 
 
+# Список групп формы
+@query_budget(AUTH + 1)
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
+    publication = PublicationForm(request.POST or None, prefix='publication')
 
-    if form.is_valid():
+    if form.is_valid() and publication.is_valid():
         post = form.save(commit=False)
         post.author = request.user
+        post.status = publication.status()
+        post.publish_at = publication.cleaned_data['publish_at']
         post.save()
+        if post.image:
+            warm_thumbnail.enqueue(
+                [post.id], key=f'thumbnail:{post.image.name}')
+        if not post.is_published:
+            return redirect('posts:drafts')
         return redirect('posts:profile', username=request.user.username)
 
-    return render(request, template, {'form': form})
+    context = {
+        'form': form,
+        'publication': publication
+    }
+
+    return render(request, template, context)
 
 
+# Пост из БД и список групп формы
+@query_budget(AUTH + 2)
 @login_required
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
+    # Правится строка из БД, а не копия из кэша: сохранение не должно
+    # вернуть старые status, views или image
     post = get_object_or_404(Post, id=post_id)
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
         instance=post)
 
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id=post_id)
 
-    if form.is_valid():
-        post.save()
+    # Опубликованный пост в черновики не возвращается
+    publication = None
+    if not post.is_published:
+        publication = PublicationForm(
+            request.POST or None, prefix='publication',
+            initial={'draft': post.status == Post.DRAFT,
+                     'publish_at': post.publish_at})
+
+    if form.is_valid() and (publication is None or publication.is_valid()):
+        publish = False
+        if publication is not None:
+            status = publication.status()
+            publish = status == Post.PUBLISHED
+            # Выпуск делает publish_now, до него пост остается закрытым
+            post.status = Post.DRAFT if publish else status
+            post.publish_at = publication.cleaned_data['publish_at']
+        post.save(update_fields=[*PostForm.Meta.fields, 'status',
+                                 'publish_at'])
+        if publish:
+            publishing.publish_now(post)
+        if post.image:
+            warm_thumbnail.enqueue(
+                [post.id], key=f'thumbnail:{post.image.name}')
         return redirect('posts:post_detail', post_id=post_id)
 
     context = {
         'form': form,
+        'publication': publication,
         'user_can_edit': True,
         'post_id': post_id
     }
@@ -122,54 +287,191 @@ def post_edit(request, post_id):
     return render(request, template, context)
 
 
+def _get_history_post(request, post_id):
+    """Пост по id; историю правок видят автор и персонал."""
+    post = repository.get_post(post_id)
+    if post.author_id != request.user.id and not request.user.is_staff:
+        raise Http404
+    return post
+
+
+# Пост и страница версий
+@query_budget(AUTH + POST + 1)
 @login_required
-def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+def post_history(request, post_id):
+    template = 'posts/post_history.html'
+    post = _get_history_post(request, post_id)
+    context = {
+        'post': post,
+        'page': revisions.history(post.id, request.GET.get('before')),
+    }
+    return render(request, template, context)
+
+
+# Пост и версии от последнего снимка одним запросом
+@query_budget(AUTH + POST + 1)
+@login_required
+def post_revision(request, post_id, number):
+    template = 'posts/post_revision.html'
+    post = _get_history_post(request, post_id)
+    text = revisions.text(post.id, number)
+    if text is None:
+        raise Http404
+    context = {
+        'post': post,
+        'number': number,
+        'text': text,
+    }
+    return render(request, template, context)
+
+
+# Черновики с авторами и группами одним запросом
+@query_budget(AUTH + 1)
+@login_required
+def drafts(request):
+    template = 'posts/drafts.html'
+    context = {
+        'posts': with_urls(publishing.drafts(request.user.id)),
+    }
+    return render(request, template, context)
+
+
+# Пост и родитель, счетчик ответов родителя (или путь комментария
+# верхнего уровня) и INSERT в одной транзакции, рейтинг. Без упоминаний
+@query_budget(AUTH + 2 + ATOMIC + 2 + RANKING)
+@login_required
+def add_comment(request, post_id, parent_id=None):
+    # Комментарий ссылается на пост: берем его из БД, не из кэша
+    post = _check_visible(request, get_object_or_404(Post, id=post_id))
+    parent = None
+    if parent_id is not None:
+        parent = get_object_or_404(Comment, id=parent_id, post_id=post.id)
     form = CommentForm(request.POST or None)
 
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        comment.parent = parent
+        try:
+            # Номер ответа занимается в одной транзакции со вставкой:
+            # неудачная вставка не оставит лишнего ответа в счетчике
+            with transaction.atomic():
+                comment.save()
+        except Comment.DoesNotExist:
+            # Родителя удалили, пока на него отвечали
+            raise Http404
+        if parent is not None:
+            url = reverse('posts:comment_thread', kwargs={
+                'post_id': post.id, 'comment_id': threads.root_id(comment)})
+            return redirect(f'{url}#comment-{comment.id}')
 
     return redirect('posts:post_detail', post_id=post_id)
 
 
+# Подписки читателя, граф для рекомендаций (2) и рекомендованные
+# авторы, потоки авторов и строки постов, номер канала событий
+@query_budget(AUTH + 7)
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
 
-    follows = request.user.follower.select_related()
-    authors = User.objects.filter(following__in=follows)
-    post_list = Post.objects.filter(author__in=authors)
+    authors = follow_graph.following(request.user.id)
+    paginator = Paginator(feed.FollowFeed(authors), settings.POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
 
-    page_number = request.GET.get('page')
-    page_obj = pagination(page_number, post_list)
+    suggested_authors = User.objects.filter(id__in=follow_graph.suggestions(
+        request.user.id, settings.FOLLOW_SUGGESTIONS))
 
     context = {
         'follow': True,
         'page_obj': page_obj,
+        'suggested_authors': suggested_authors,
+        'events_since': events.latest(),
+    }
+
+    return render(request, template, context,
+                  using=feed_engine('follow_index'))
+
+
+# Популярные посты и группы (2), посты с авторами (2), группы постов и
+# популярные группы (2)
+@query_budget(AUTH + 6)
+def trending(request):
+    template = 'posts/trending.html'
+
+    post_ids = ranking.trending_post_ids(settings.TRENDING_SIZE)
+    posts = repository.get_posts(post_ids)
+    post_list = with_urls(
+        [posts[post_id] for post_id in post_ids
+         if post_id in posts and posts[post_id].is_published])
+
+    group_ids = ranking.hot_group_ids(settings.TRENDING_SIZE)
+    groups = repository.groups.get_many(group_ids)
+    hot_groups = [groups[group_id] for group_id in group_ids
+                  if group_id in groups]
+
+    context = {
+        'trending': True,
+        'post_list': post_list,
+        'hot_groups': hot_groups,
     }
 
     return render(request, template, context)
 
 
+# Подписки, номер последнего выпуска, число новых постов и сами посты
+@query_budget(AUTH + 4)
+def post_events(request):
+    """Опрос канала событий. Поток без опроса отдает yatube.asgi."""
+    subscription = events.subscribe(request)
+    if subscription is None:
+        return HttpResponseBadRequest()
+
+    response = HttpResponse(events.poll(request, subscription),
+                            content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+# Автор, INSERT подписки, последний пост автора и рейтинг
+@query_budget(AUTH + LOOKUP + 2 + RANKING)
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if request.user != author:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author
-        )
-        return redirect('posts:follow_index')
+    author = repository.get_user(username)
+    follows.follow(request.user.id, [author.id])
     return redirect('posts:follow_index')
 
 
+# Автор и DELETE подписки
+@query_budget(AUTH + LOOKUP + 1)
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    follow = get_object_or_404(Follow, user=request.user, author=author)
-    follow.delete()
+    author = repository.get_user(username)
+    follows.unfollow(request.user.id, [author.id])
     return redirect('posts:follow_index')
+
+
+# Авторы по именам, INSERT подписок, выборка новых, если вставлены не
+# все, последние посты авторов и рейтинг
+@query_budget(AUTH + 4 + RANKING)
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Подписка или отписка от списка авторов, например при импорте."""
+    form = FollowBulkForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    usernames = form.cleaned_data['usernames']
+    author_ids = list(User.objects.filter(
+        username__in=usernames).values_list('id', flat=True))
+    if form.cleaned_data['unfollow']:
+        changed = follows.unfollow(request.user.id, author_ids)
+    else:
+        changed = len(follows.follow(request.user.id, author_ids))
+    return JsonResponse({
+        'found': len(author_ids),
+        'not_found': len(usernames) - len(author_ids),
+        'changed': changed,
+    })
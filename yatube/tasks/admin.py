@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'queue', 'status', 'attempts', 'run_at')
+    search_fields = ('name', 'key')
+    list_filter = ('status', 'queue')
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.queue import Worker, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в БД.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Очередь для обработки, можно указать несколько раз. '
+                 'По умолчанию все очереди из TASK_QUEUES.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить созревшие задачи в текущем потоке и выйти.')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or list(settings.TASK_QUEUES)
+        unknown = set(queues) - set(settings.TASK_QUEUES)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные очереди: {", ".join(sorted(unknown))}')
+
+        if options['once']:
+            done = run_pending(queues)
+            self.stdout.write(f'Выполнено задач: {done}')
+            return
+
+        limits = {queue: settings.TASK_QUEUES[queue] for queue in queues}
+        self.stdout.write(f'Воркер запущен: {limits}')
+        try:
+            Worker(limits).run_forever(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,208 @@
+"""Очередь фоновых задач в БД.
+
+Задача объявляется декоратором task и ставится в очередь вызовом
+delay() или enqueue(). Воркер (manage.py run_tasks) забирает созревшие
+задачи условным UPDATE, поэтому брокер не нужен, а несколько воркеров
+не возьмут одну задачу дважды. Упавшая задача повторяется с
+экспоненциальной задержкой, пока не исчерпает max_attempts.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class TaskFunction:
+    """Функция, которую можно выполнить в фоне."""
+
+    def __init__(self, func, queue: str, max_attempts: Optional[int]):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts or settings.TASK_MAX_ATTEMPTS
+        self.name = f'{func.__module__}.{func.__qualname__}'
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs) -> Optional[Task]:
+        return self.enqueue(args, kwargs)
+
+    def enqueue(self, args: Iterable = (), kwargs: Optional[dict] = None,
+                key: Optional[str] = None,
+                countdown: int = 0) -> Optional[Task]:
+        """Ставит задачу в очередь.
+
+        Повторный вызов с тем же key не создает новую задачу, а
+        возвращает существующую. В режиме TASKS_EAGER задача
+        выполняется сразу.
+        """
+        args, kwargs = list(args), kwargs or {}
+        if settings.TASKS_EAGER:
+            self.func(*args, **kwargs)
+            return None
+
+        fields = {
+            'name': self.name,
+            'queue': self.queue,
+            'payload': json.dumps({'args': args, 'kwargs': kwargs}),
+            'max_attempts': self.max_attempts,
+            'run_at': timezone.now() + timedelta(seconds=countdown),
+        }
+        if key is None:
+            return Task.objects.create(**fields)
+        task, _ = Task.objects.get_or_create(key=key, defaults=fields)
+        return task
+
+
+def task(queue: str = 'default', max_attempts: Optional[int] = None):
+    def decorator(func):
+        task_function = TaskFunction(func, queue, max_attempts)
+        _registry[task_function.name] = task_function
+        return task_function
+    return decorator
+
+
+def resolve(name: str) -> TaskFunction:
+    task_function = _registry.get(name)
+    if task_function is None:
+        task_function = import_string(name)
+    if not isinstance(task_function, TaskFunction):
+        raise ImportError(f'{name} не объявлена как задача')
+    return task_function
+
+
+def retry_delay(attempts: int) -> int:
+    return min(settings.TASK_RETRY_DELAY * 2 ** (attempts - 1),
+               settings.TASK_RETRY_MAX_DELAY)
+
+
+def _claimable(now) -> Q:
+    stale = now - timedelta(seconds=settings.TASK_LOCK_TIMEOUT)
+    return (
+        Q(status=Task.PENDING)
+        | Q(status=Task.RUNNING, locked_at__lt=stale)
+    )
+
+
+def claim(queue: str, limit: int) -> List[Task]:
+    """Забирает до limit созревших задач очереди.
+
+    Задачи, зависшие в работе дольше TASK_LOCK_TIMEOUT (воркер упал),
+    забираются повторно.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        _claimable(now), queue=queue, run_at__lte=now
+    ).values_list('id', flat=True)[:limit]
+
+    claimed = [
+        task_id for task_id in candidates
+        if Task.objects.filter(_claimable(now), id=task_id).update(
+            status=Task.RUNNING,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+    ]
+    return list(Task.objects.filter(id__in=claimed))
+
+
+def execute(task: Task) -> bool:
+    """Выполняет забранную задачу и записывает результат."""
+    try:
+        payload = json.loads(task.payload)
+        resolve(task.name).func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s (%s) упала', task.pk, task.name)
+        update = {'locked_at': None, 'last_error': traceback.format_exc()}
+        if task.attempts >= task.max_attempts:
+            update['status'] = Task.FAILED
+        else:
+            update['status'] = Task.PENDING
+            update['run_at'] = timezone.now() + timedelta(
+                seconds=retry_delay(task.attempts))
+        Task.objects.filter(id=task.id).update(**update)
+        return False
+
+    Task.objects.filter(id=task.id).update(
+        status=Task.DONE, locked_at=None, last_error='')
+    return True
+
+
+def run_pending(queues: Optional[Iterable[str]] = None) -> int:
+    """Выполняет все созревшие задачи в текущем потоке.
+
+    Нужна тестам и однократным прогонам; возвращает число выполненных
+    задач.
+    """
+    queues = list(queues or settings.TASK_QUEUES)
+    done = 0
+    while True:
+        tasks = [task for queue in queues for task in claim(queue, 100)]
+        if not tasks:
+            return done
+        for task in tasks:
+            execute(task)
+            done += 1
+
+
+class Worker:
+    """Пул потоков с ограничением числа задач на очередь."""
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = limits
+        self.running = Counter()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=sum(limits.values()),
+            thread_name_prefix='tasks'
+        )
+
+    def _run(self, task: Task) -> None:
+        try:
+            execute(task)
+        finally:
+            connection.close()
+            with self.lock:
+                self.running[task.queue] -= 1
+
+    def run_once(self) -> int:
+        """Раздает потокам созревшие задачи, сколько позволяют лимиты."""
+        submitted = 0
+        for queue, limit in self.limits.items():
+            with self.lock:
+                free = limit - self.running[queue]
+            if free <= 0:
+                continue
+            for task in claim(queue, free):
+                with self.lock:
+                    self.running[queue] += 1
+                self.executor.submit(self._run, task)
+                submitted += 1
+        return submitted
+
+    def run_forever(self, poll_interval: float) -> None:
+        try:
+            while True:
+                if not self.run_once():
+                    time.sleep(poll_interval)
+        finally:
+            self.executor.shutdown(wait=True)
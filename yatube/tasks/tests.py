@@ -0,0 +1,73 @@
+from django.test import TestCase, override_settings
+
+from .models import Task
+from .queue import claim, run_pending, task
+
+calls = []
+
+
+@task()
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(TASK_QUEUES={'default': 2}, TASK_RETRY_DELAY=0)
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_task_runs_from_queue(self):
+        """Поставленная задача выполняется воркером."""
+
+        remember.delay('first')
+        self.assertEqual(calls, [])
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, ['first'])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_idempotency_key(self):
+        """Задача с тем же ключом ставится один раз."""
+
+        first = remember.enqueue(['once'], key='remember:once')
+        second = remember.enqueue(['once'], key='remember:once')
+        run_pending()
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(calls, ['once'])
+
+    def test_retries_then_fails(self):
+        """Упавшая задача повторяется до max_attempts."""
+
+        explode.delay()
+        run_pending()
+
+        failed = Task.objects.get()
+        self.assertEqual(failed.status, Task.FAILED)
+        self.assertEqual(failed.attempts, 2)
+        self.assertIn('ValueError: boom', failed.last_error)
+
+    def test_claim_respects_limit(self):
+        """Воркер забирает не больше свободных слотов очереди."""
+
+        for value in range(3):
+            remember.delay(value)
+
+        self.assertEqual(len(claim('default', 2)), 2)
+        self.assertEqual(len(claim('default', 2)), 1)
+        self.assertEqual(claim('default', 2), [])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode(self):
+        """В режиме TASKS_EAGER задача выполняется сразу."""
+
+        remember.delay('now')
+
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Task.objects.exists())
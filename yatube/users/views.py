@@ -1,9 +1,12 @@
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 
+from core.query_budget import query_budget
+
 from .forms import CreationForm
 
 
+@query_budget(0)
 class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
@@ -0,0 +1,181 @@
+"""
+ASGI-приложение для потока событий о новых постах (/events/posts/).
+
+Django 2.2 не умеет асинхронные представления, а поток Server-Sent
+Events в WSGI занимает рабочий поток сервера на все время подключения.
+Здесь ожидающие клиенты — корутины одного цикла событий. Id последнего
+поста из кэша раз в SSE_POLL_INTERVAL секунд читает одна задача на
+процесс, а события с запросами к БД собираются в пуле потоков, только
+когда появились новые посты.
+
+Приложение отвечает только на адрес потока, остальное — 404. Прокси
+направляет /events/ на ASGI-сервер, например
+
+    uvicorn yatube.asgi:application
+
+а остальные адреса — на WSGI (yatube.wsgi).
+"""
+
+import asyncio
+import io
+import logging
+import os
+from importlib import import_module
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import reverse
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+django.setup(set_prefix=False)
+
+from posts import events  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+async def _sync(func, *args):
+    """Вызывает func в пуле потоков, соединение с БД закрывается."""
+    def call():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return await asyncio.get_running_loop().run_in_executor(None, call)
+
+
+class Latest:
+    """Id последнего поста: один опрос кэша на все потоки процесса."""
+
+    def __init__(self):
+        self.value = None
+        self.changed = None
+        self.task = None
+
+    async def poll(self):
+        while True:
+            try:
+                value = await _sync(events.latest)
+            except Exception:
+                logger.exception('Не удалось прочитать последний пост')
+            else:
+                if value != self.value:
+                    self.value = value
+                    changed, self.changed = self.changed, asyncio.Event()
+                    changed.set()
+            await asyncio.sleep(settings.SSE_POLL_INTERVAL)
+
+    async def wait(self, last_id: int, timeout: float) -> int:
+        """Ждет поста новее last_id не дольше timeout секунд."""
+        if self.task is None:
+            self.changed = asyncio.Event()
+            self.task = asyncio.ensure_future(self.poll())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.value is None or self.value <= last_id:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return last_id if self.value is None else self.value
+
+
+latest = Latest()
+
+
+def _request(scope) -> WSGIRequest:
+    """Запрос Django с сессией и пользователем по области ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin-1')
+        environ[name] = (f'{environ[name]},{value}' if name in environ
+                         else value)
+    request = WSGIRequest(environ)
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    request.user = get_user(request)
+    return request
+
+
+async def _respond(send, status: int):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain')]})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _stream(scope, receive, send):
+    request = await _sync(_request, scope)
+    subscription = await _sync(events.subscribe, request)
+    if subscription is None:
+        await _respond(send, 400)
+        return
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]})
+    disconnected = asyncio.ensure_future(_disconnect(receive))
+    try:
+        await send({'type': 'http.response.body', 'more_body': True,
+                    'body': f'retry: {settings.SSE_RETRY}\n\n'.encode()})
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SSE_STREAM_TIMEOUT
+        last_id = subscription.last_id
+        while not disconnected.done():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            current = await latest.wait(
+                last_id, min(remaining, settings.SSE_HEARTBEAT))
+            if current <= last_id:
+                body = ': ping\n\n'
+            else:
+                last_id = current
+                body = await _sync(
+                    events.posts_event, request, subscription, current)
+            await send({'type': 'http.response.body', 'more_body': True,
+                        'body': body.encode()})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            await send({'type': f'{message["type"]}.complete'})
+            if message['type'] == 'lifespan.shutdown':
+                return
+    if scope['type'] != 'http':
+        return
+    if scope['path'] != reverse('posts:post_events'):
+        await _respond(send, 404)
+        return
+    await _stream(scope, receive, send)
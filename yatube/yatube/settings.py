@@ -17,6 +17,122 @@ DEBUG = True
 
 POSTS_ON_PAGE = 10
 
+# Начало поста в лентах: не больше стольких символов и абзацев
+POST_PREVIEW_LENGTH = 500
+POST_PREVIEW_PARAGRAPHS = 3
+
+# Время жизни множеств подписок в кэше, секунды
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+# Время жизни постов, групп и пользователей в кэше и записей об их
+# отсутствии, секунды
+REPOSITORY_TIMEOUT = 60 * 60
+NEGATIVE_CACHE_TIMEOUT = 60
+
+# Защита кэша от одновременного пересчета (core.stampede): сколько
+# держится блокировка пересчета, сколько после срока годности можно
+# отдавать старое значение и насколько рано начинать пересчет
+CACHE_LOCK_TIMEOUT = 10
+CACHE_STALE_TIMEOUT = 60
+CACHE_EARLY_BETA = 1.0
+
+# Кэш страниц для анонимных посетителей, секунды. Число просмотров на
+# закэшированной странице поста обновляется не чаще этого срока.
+PAGE_CACHE_TIMEOUT = 60 * 5
+# Адрес обратного прокси для запросов PURGE с заголовком Surrogate-Key
+PAGE_CACHE_PURGE_URL = os.getenv('PAGE_CACHE_PURGE_URL')
+
+# Профилирование запросов сотрудников (core.profiling): cProfile по
+# заголовку X-Profile или параметру ?profile, сколько профилей хранить,
+# фоновая выборка стеков и ее интервал, секунды
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_KEEP = 50
+PROFILING_SAMPLING = os.getenv('PROFILING_SAMPLING', 'False') == 'True'
+PROFILING_SAMPLE_INTERVAL = 0.005
+
+# Метрики (core.metrics): каталог, через который процессы складывают
+# счетчики (без него /metrics видит только свой процесс), как часто
+# процесс пишет туда свои значения, секунды, и токен, с которым можно
+# забирать /metrics (заголовок Authorization: Bearer <токен>; без токена
+# /metrics выключен)
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Лента подписок (posts.feed): сколько последних постов автора держать
+# в кэше для слияния и время жизни этих списков, секунды. Если в кэше
+# нет больше FEED_COLD_STREAMS списков, лента берется из БД, а списки
+# догружаются по FEED_COLD_STREAMS за запрос
+FEED_STREAM_SIZE = 100
+FEED_STREAM_TIMEOUT = 60 * 60 * 24
+FEED_COLD_STREAMS = 50
+
+# Сколько авторов предлагать на странице подписок
+FOLLOW_SUGGESTIONS = 5
+
+# Сколько запланированных постов выпускать за один UPDATE и как часто
+# publish_scheduled проверяет, не пора ли, секунды
+PUBLISH_BATCH_SIZE = 100
+PUBLISH_POLL_INTERVAL = 10
+
+# История правок (posts.revisions): каждая REVISION_SNAPSHOT_INTERVAL-я
+# версия хранит текст целиком, остальные — разницу с предыдущей
+REVISION_SNAPSHOT_INTERVAL = 10
+# Если между общими началом и концом старого и нового текста больше
+# слов, версия сохраняется целиком: поиск разницы растет квадратично
+REVISION_DIFF_MAX_TOKENS = 4000
+REVISIONS_ON_PAGE = 20
+
+# Ветки комментариев (posts.threads): обсуждений на странице поста,
+# ответов, показанных под каждым, и наибольшая глубина ответа
+COMMENTS_ON_PAGE = 20
+COMMENT_REPLIES_SHOWN = 3
+COMMENT_MAX_DEPTH = 8
+
+# Сколько авторов можно подписать или отписать одним запросом
+FOLLOW_BULK_LIMIT = 1000
+
+# Сброс счетчиков просмотров в БД: после стольких просмотров
+# или через столько секунд с прошлого сброса
+VIEW_COUNTER_FLUSH_EVERY = 100
+VIEW_COUNTER_FLUSH_INTERVAL = 10
+
+# Server-Sent Events о новых постах (yatube.asgi): время жизни потока и
+# интервал heartbeat, как часто проверять кэш на новые посты (секунды) и
+# через сколько браузеру переподключаться (мс). Без ASGI-сервера
+# WSGI-представление отвечает сразу и просит переподключиться через
+# SSE_POLL_RETRY (мс)
+SSE_STREAM_TIMEOUT = 60
+SSE_HEARTBEAT = 15
+SSE_POLL_INTERVAL = 2
+SSE_RETRY = 3000
+SSE_POLL_RETRY = 30000
+
+# Популярное: период полураспада активности (секунды), размер рейтинга
+# и веса событий. Раз в TRENDING_PRUNE_INTERVAL секунд удаляются оценки,
+# затухшие на TRENDING_PRUNE_HALF_LIVES периодов
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_SIZE = 20
+TRENDING_COMMENT_WEIGHT = 1
+TRENDING_FOLLOW_WEIGHT = 2
+TRENDING_PRUNE_INTERVAL = 60
+TRENDING_PRUNE_HALF_LIVES = 30
+
+# Фоновые задачи: очереди и число одновременных задач в каждой
+TASK_QUEUES = {
+    'default': 2,
+    'thumbnails': 1,
+    'mail': 1,
+}
+TASK_MAX_ATTEMPTS = 5
+# Задержка перед повтором, секунды: удваивается с каждой попыткой
+TASK_RETRY_DELAY = 10
+TASK_RETRY_MAX_DELAY = 60 * 60
+# Через сколько секунд задача «в работе» считается брошенной
+TASK_LOCK_TIMEOUT = 5 * 60
+# Выполнять задачи сразу при постановке, без воркера
+TASKS_EAGER = False
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -31,7 +147,14 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма ставятся в очередь и отправляются воркером задач (очередь
+# mail) через EMAIL_QUEUE_BACKEND. Захваченную пачку воркер должен
+# отправить за EMAIL_QUEUE_LEASE секунд, иначе ее заберет другой
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+EMAIL_QUEUE_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_QUEUE_BATCH_SIZE = 50
+EMAIL_QUEUE_MAX_ATTEMPTS = 5
+EMAIL_QUEUE_LEASE = 5 * 60
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 INSTALLED_APPS = [
@@ -45,28 +168,46 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
-    'about.apps.AboutConfig'
+    'about.apps.AboutConfig',
+    'tasks.apps.TasksConfig'
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.IdentityMapMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+# Продакшн-профиль шаблонов: скомпилированные шаблоны кэшируются между
+# запросами. По умолчанию включен, когда выключен DEBUG.
+TEMPLATES_CACHED = os.getenv('TEMPLATES_CACHED', str(not DEBUG)) == 'True'
+
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATES_CACHED:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -78,8 +219,32 @@ TEMPLATES = [
     },
 ]
 
+# Движок шаблонов лент (index, group_list, profile, follow_index):
+# 'django' или 'jinja2'. Для Jinja2 нужен пакет Jinja2.
+FEED_TEMPLATE_ENGINE = os.getenv('FEED_TEMPLATE_ENGINE', 'django')
+# Движок для отдельных представлений, например {'index': 'jinja2'}
+FEED_TEMPLATE_ENGINES = {}
+
+JINJA2_TEMPLATES = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'NAME': 'jinja2',
+    'DIRS': [os.path.join(BASE_DIR, 'jinja2')],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'core.jinja2_env.environment',
+        'context_processors': [
+            'django.contrib.auth.context_processors.auth',
+            'core.context_processors.year.year'
+        ],
+    },
+}
+if 'jinja2' in {FEED_TEMPLATE_ENGINE, *FEED_TEMPLATE_ENGINES.values()}:
+    TEMPLATES.append(JINJA2_TEMPLATES)
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -91,11 +256,46 @@ DATABASES = {
     }
 }
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Кэш общий для всех процессов сайта: воркеры, publish_scheduled и
+# run_tasks видят одни и те же ленты, графы подписок и сбросы страниц.
+# Двухуровневый кэш (core.cache_backends.TieredCache) держит горячие
+# ключи в памяти процесса перед общим кэшем 'shared'. По умолчанию
+# 'shared' — файловый кэш с атомарными add и incr для одной машины; для
+# нескольких машин направьте его на memcached или redis.
+# CACHE_TIERED=False — кэш в памяти одного процесса, только для
+# разработки под runserver.
+CACHE_TIERED = os.getenv('CACHE_TIERED', 'True') == 'True'
+if CACHE_TIERED:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TieredCache',
+            'OPTIONS': {
+                'L2': 'shared',
+                'MAX_BYTES': 32 * 1024 * 1024,
+                'L1_TIMEOUT': 5,
+                'SYNC_INTERVAL': 1,
+            },
+        },
+        'shared': {
+            'BACKEND': os.getenv(
+                'CACHE_SHARED_BACKEND', 'core.cache_backends.SharedFileCache'),
+            'LOCATION': os.getenv(
+                'CACHE_SHARED_LOCATION', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv('CACHE_SHARED_MAX_ENTRIES',
+                                             100000)),
+            },
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+            },
+        }
     }
-}
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -3,12 +3,20 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import (cache_stats, metrics_view, profile_download,
+                        profile_samples)
+
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('metrics', metrics_view, name='metrics'),
+    path('admin/cache-stats/', cache_stats, name='cache_stats'),
+    path('admin/profiles/<int:pk>/download/', profile_download,
+         name='profile_download'),
+    path('admin/profiles/samples/', profile_samples, name='profile_samples'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),